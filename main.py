@@ -1,16 +1,38 @@
+import asyncio
 import uvicorn
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
+from src.core.config import settings
 from src.db.connection import close_db_pool, get_db_pool
+from src.db.migrate import run_migrations
+from src.api.dependencies.auth import require_admin_token
+from src.api.middleware.compression import CompressionMiddleware
+from src.api.middleware.deadline import DeadlineMiddleware
+from src.core.deadline import DeadlineExceeded
+from src.api.middleware.profiling import ProfilingMiddleware
+from src.services.profiler import profiler
+from src.services.warmup_service import run_warmup, check_readiness
+from src.services.single_flight import single_flight_stats
+from src.services.recommendation_stream import stream_stats
+from src.services import notifications
+from src.services.forecast_window import window_stats
+from src.services.score_store import store_stats, score_refresh_loop
+from src.services.partition_service import partition_maintenance_loop, maintenance_stats
+from src.services.daily_summary_service import refresh_daily_summaries, summary_stats
+from src.services.user_context import context_stats
+from src.services.alert_service import evaluate_alerts, alert_stats
 
 # Importa cada 'router' diretamente do seu arquivo e dá um apelido (alias)
 from src.api.routes.profile import router as profile_router
-from src.api.routes.spots import router as spots_router
+from src.api.routes.spots import router as spots_router, catalog_cache_version
 from src.api.routes.preferences import router as preferences_router
 from src.api.routes.presets import router as presets_router
-from src.api.routes.recommendations import router as recommendations_router
-from src.api.routes.forecasts import router as forecasts_router
+from src.api.routes.recommendations import router as recommendations_router, recommendations_limiter
+from src.api.routes.forecasts import router as forecasts_router, spot_forecast_cache_version, daily_cache_version
+from src.api.routes.admin import router as admin_router
+from src.api.routes.alerts import router as alerts_router
 
 app = FastAPI(
     title="The Check API",
@@ -26,13 +48,64 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Comprime respostas grandes; as rotas públicas (iguais para todos os usuários) ficam
+# em cache, já comprimidas, enquanto a versão dos dados que leem não muda.
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    cached_routes=[
+        (r"^/spots/?$", catalog_cache_version),
+        (r"^/forecasts/spot/(?P<spot_id>\d+)$", spot_forecast_cache_version),
+        (r"^/forecasts/spot/\d+/daily$", daily_cache_version),
+        (r"^/forecasts/daily$", daily_cache_version),
+    ],
+    cache_max_entries=settings.COMPRESSION_CACHE_MAX_ENTRIES,
+)
+
+# Orçamento de tempo por requisição: cancela o handler (e suas queries) se o cliente
+# desconectar ou se o prazo estourar. O stream SSE é de longa duração e fica de fora.
+app.add_middleware(
+    DeadlineMiddleware,
+    budget_seconds=settings.REQUEST_DEADLINE_SECONDS,
+    grace_seconds=settings.REQUEST_DEADLINE_GRACE_SECONDS,
+    excluded_paths=[r"^/recommendations/stream$", r"^/admin/"],
+)
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request, exc):
+    return JSONResponse(status_code=504, content={"detail": "Request deadline exceeded."})
+
+# Profiler sob demanda: só é instalado quando habilitado, então desligado não custa nada.
+if settings.PROFILING_ENABLED:
+    app.add_middleware(
+        ProfilingMiddleware,
+        profiler=profiler,
+        admin_token=settings.ADMIN_TOKEN,
+        sample_rate=settings.PROFILING_SAMPLE_RATE,
+    )
+
+_background_tasks = set()
+
 @app.on_event("startup")
 async def startup_event():
     await get_db_pool()
     print("API iniciada e pool de conexões pronto.")
+    # As migrações rodam antes de tudo: o warm-up já prepara statements no schema final
+    if settings.MIGRATIONS_ENABLED:
+        await run_migrations(max_table_mb=settings.MIGRATIONS_STARTUP_MAX_TABLE_MB)
+    await notifications.start_listener()
+    # O warm-up roda em segundo plano: /health já responde, mas /ready só fica
+    # pronto quando a instância estiver aquecida.
+    for job in (run_warmup(), partition_maintenance_loop(), score_refresh_loop(after_refresh=[refresh_daily_summaries, evaluate_alerts])):
+        task = asyncio.create_task(job)
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    for task in list(_background_tasks):
+        task.cancel()
+    await notifications.stop_listener()
     await close_db_pool()
     print("API encerrada e pool de conexões fechado.")
 
@@ -44,6 +117,8 @@ app.include_router(preferences_router)
 app.include_router(presets_router)
 app.include_router(recommendations_router)
 app.include_router(forecasts_router)
+app.include_router(admin_router)
+app.include_router(alerts_router)
 
 
 @app.get("/", tags=["Root"])
@@ -58,5 +133,33 @@ async def health_check():
     """
     return {"status": "ok"}
 
+@app.api_route("/ready", methods=["GET", "HEAD"], tags=["Health Check"])
+async def readiness_check():
+    """
+    Endpoint de prontidão para o load balancer.
+    Retorna 503 enquanto o warm-up não terminou ou se alguma dependência falhar.
+    """
+    readiness = await check_readiness()
+    status_code = 200 if readiness["status"] == "ready" else 503
+    return JSONResponse(content=readiness, status_code=status_code)
+
+@app.get("/stats", tags=["Health Check"], dependencies=[Depends(require_admin_token)])
+async def runtime_stats():
+    """
+    Contadores internos da instância: coalescência de requisições e controle de admissão.
+    Protegido pelo token administrativo (X-Admin-Token).
+    """
+    return {
+        "single_flight": single_flight_stats(),
+        "admission": {"recommendations": recommendations_limiter.snapshot()},
+        "recommendation_stream": stream_stats(),
+        "forecast_window": window_stats(),
+        "score_store": store_stats(),
+        "forecast_partitions": maintenance_stats(),
+        "daily_summaries": summary_stats(),
+        "user_context": context_stats(),
+        "alerts": alert_stats(),
+    }
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
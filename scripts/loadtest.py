@@ -0,0 +1,245 @@
+"""
+Gerador de carga HTTP do The Check.
+
+Envia tráfego misto (/spots, /forecasts/spot/{id}, /preferences, /recommendations) a uma
+taxa alvo (loop aberto) e reporta p50/p95/p99, throughput e taxas de erro em JSON.
+Os tokens HS256 são gerados com o SUPABASE_JWT_SECRET configurado.
+
+Exemplos:
+    python -m scripts.loadtest --target http://localhost:8000 --rps 50 --duration 30 \\
+        --user-id 11111111-1111-1111-1111-111111111111
+    python -m scripts.loadtest --target inprocess --rps 20 --duration 10 \\
+        --mix spots=1,forecast=4,preferences=2,recommendations=3 --output report.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+import httpx
+import jwt
+
+DEFAULT_MIX = "spots=2,forecast=4,preferences=2,recommendations=2"
+
+
+def mint_token(user_id: str, secret: str, ttl_seconds: int = 3600) -> str:
+    """Gera um JWT HS256 equivalente ao emitido pelo Supabase para um usuário autenticado."""
+    now = int(time.time())
+    payload = {"sub": user_id, "aud": "authenticated", "role": "authenticated", "iat": now, "exp": now + ttl_seconds}
+    return jwt.encode(payload, secret, algorithm="HS256")
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    unknown = set(weights) - set(_SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Cenários desconhecidos no --mix: {', '.join(sorted(unknown))}")
+    return weights
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    # Nearest-rank: o menor valor com pelo menos pct% das amostras até ele
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return round(sorted_values[rank], 2)
+
+
+# --- Cenários de tráfego ---
+
+def _spots(ctx) -> tuple:
+    return "GET", "/spots/", None, None
+
+def _forecast(ctx) -> tuple:
+    return "GET", f"/forecasts/spot/{random.choice(ctx['spot_ids'])}", None, None
+
+def _preferences(ctx) -> tuple:
+    spot_ids = random.sample(ctx['spot_ids'], min(len(ctx['spot_ids']), ctx['spots_per_request']))
+    return "GET", "/preferences/", {"spot_ids": spot_ids}, None
+
+def _recommendations(ctx) -> tuple:
+    spot_ids = random.sample(ctx['spot_ids'], min(len(ctx['spot_ids']), ctx['spots_per_request']))
+    body = {
+        "spot_ids": spot_ids,
+        "day_selection": {"type": "offsets", "values": list(range(ctx['days']))},
+        "time_window": {"start": "05:00:00", "end": "18:00:00"},
+    }
+    return "POST", "/recommendations/", None, body
+
+_SCENARIOS = {
+    "spots": _spots,
+    "forecast": _forecast,
+    "preferences": _preferences,
+    "recommendations": _recommendations,
+}
+
+
+class _Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.status_codes: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def record(self, scenario: str, latency_ms: float, status: str, is_error: bool) -> None:
+        self.latencies[scenario].append(latency_ms)
+        self.status_codes[scenario][status] += 1
+        if is_error:
+            self.errors[scenario] += 1
+
+    def _summary(self, latencies: List[float], errors: int, codes: Dict[str, int], elapsed: float) -> Dict[str, Any]:
+        ordered = sorted(latencies)
+        return {
+            "requests": len(ordered),
+            "throughput_rps": round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+            "errors": errors,
+            "error_rate": round(errors / len(ordered), 4) if ordered else 0.0,
+            "status_codes": dict(codes),
+            "latency_ms": {
+                "p50": percentile(ordered, 50),
+                "p95": percentile(ordered, 95),
+                "p99": percentile(ordered, 99),
+                "max": round(ordered[-1], 2) if ordered else None,
+                "mean": round(sum(ordered) / len(ordered), 2) if ordered else None,
+            },
+        }
+
+    def report(self, elapsed: float, target_rps: float, dropped: int) -> Dict[str, Any]:
+        all_latencies = [lat for values in self.latencies.values() for lat in values]
+        all_codes: Dict[str, int] = defaultdict(int)
+        for codes in self.status_codes.values():
+            for code, count in codes.items():
+                all_codes[code] += count
+        return {
+            "duration_s": round(elapsed, 2),
+            "target_rps": target_rps,
+            "dropped_by_concurrency_cap": dropped,
+            "overall": self._summary(all_latencies, sum(self.errors.values()), all_codes, elapsed),
+            "endpoints": {
+                scenario: self._summary(self.latencies[scenario], self.errors[scenario], self.status_codes[scenario], elapsed)
+                for scenario in sorted(self.latencies)
+            },
+        }
+
+
+async def _send(client: httpx.AsyncClient, scenario: str, ctx: Dict[str, Any], recorder: _Recorder, headers: Dict[str, str]) -> None:
+    method, path, params, body = _SCENARIOS[scenario](ctx)
+    started_at = time.perf_counter()
+    try:
+        response = await client.request(method, path, params=params, json=body, headers=headers)
+        await response.aread()
+        status, is_error = str(response.status_code), response.status_code >= 400
+    except httpx.HTTPError as e:
+        status, is_error = type(e).__name__, True
+    recorder.record(scenario, (time.perf_counter() - started_at) * 1000, status, is_error)
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    rps: float,
+    duration: float,
+    weights: Dict[str, float],
+    tokens: List[str],
+    ctx: Dict[str, Any],
+    max_in_flight: int,
+) -> Dict[str, Any]:
+    """
+    Dispara requisições em loop aberto na taxa alvo (a chegada não espera as respostas).
+    Se `max_in_flight` for atingido, a requisição é descartada e contada, para que um
+    servidor lento não reduza a taxa de envio sem aviso.
+    """
+    recorder = _Recorder()
+    scenarios, scenario_weights = zip(*weights.items())
+    in_flight: set = set()
+    dropped = 0
+    interval = 1.0 / rps
+    started_at = time.perf_counter()
+    next_send = started_at
+    while next_send - started_at < duration:
+        await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+        next_send += interval
+        if len(in_flight) >= max_in_flight:
+            dropped += 1
+            continue
+        scenario = random.choices(scenarios, weights=scenario_weights)[0]
+        headers = {"Authorization": f"Bearer {random.choice(tokens)}"}
+        task = asyncio.create_task(_send(client, scenario, ctx, recorder, headers))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+    if in_flight:
+        await asyncio.gather(*in_flight)
+    return recorder.report(time.perf_counter() - started_at, rps, dropped)
+
+
+async def main_async(args) -> Dict[str, Any]:
+    secret = args.jwt_secret
+    if secret is None:
+        from src.core.config import settings
+        secret = settings.SUPABASE_JWT_SECRET
+    tokens = [mint_token(user_id, secret) for user_id in args.user_id]
+    weights = parse_mix(args.mix)
+
+    app = None
+    if args.target == "inprocess":
+        from main import app
+        transport = httpx.ASGITransport(app=app)
+        base_url = "http://inprocess"
+        await app.router.startup()
+    else:
+        transport = httpx.AsyncHTTPTransport(retries=0)
+        base_url = args.target.rstrip("/")
+
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            spot_ids = args.spot_ids
+            if not spot_ids:
+                response = await client.get("/spots/")
+                response.raise_for_status()
+                spot_ids = [spot["spot_id"] for spot in response.json()]
+            if not spot_ids:
+                raise SystemExit("Nenhum spot disponível para gerar tráfego.")
+            ctx = {"spot_ids": spot_ids, "spots_per_request": args.spots_per_request, "days": args.days}
+            report = await run_load(client, args.rps, args.duration, weights, tokens, ctx, args.max_in_flight)
+    finally:
+        if app is not None:
+            await app.router.shutdown()
+
+    report["target"] = args.target
+    report["mix"] = weights
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Gerador de carga HTTP do The Check.")
+    parser.add_argument("--target", default="http://localhost:8000", help="URL base da API ou 'inprocess' para usar o app ASGI diretamente.")
+    parser.add_argument("--rps", type=float, default=20.0, help="Taxa alvo de requisições por segundo.")
+    parser.add_argument("--duration", type=float, default=30.0, help="Duração do teste em segundos.")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Pesos dos cenários (padrão: {DEFAULT_MIX}).")
+    parser.add_argument("--user-id", action="append", required=True, help="UUID usado no 'sub' dos tokens (repita para vários usuários).")
+    parser.add_argument("--jwt-secret", default=None, help="Segredo HS256; padrão: SUPABASE_JWT_SECRET das configurações.")
+    parser.add_argument("--spot-ids", type=int, nargs="*", default=None, help="Spots usados nos cenários; padrão: todos de /spots.")
+    parser.add_argument("--spots-per-request", type=int, default=5, help="Quantidade de spots por requisição de preferências/recomendações.")
+    parser.add_argument("--days", type=int, default=3, help="Quantidade de dias (offsets) pedidos nas recomendações.")
+    parser.add_argument("--max-in-flight", type=int, default=200, help="Limite de requisições simultâneas do gerador.")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Timeout por requisição, em segundos.")
+    parser.add_argument("--output", default=None, help="Arquivo para gravar o relatório JSON (padrão: stdout).")
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import HTTPException, status
+from src.core.config import settings
+
+
+class Overloaded(Exception):
+    """Levantada quando uma requisição não é admitida (fila cheia ou espera esgotada)."""
+
+    def __init__(self, status_code: int, retry_after: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.detail = detail
+
+    def to_http_exception(self) -> HTTPException:
+        return HTTPException(
+            status_code=self.status_code,
+            detail=self.detail,
+            headers={"Retry-After": str(self.retry_after)},
+        )
+
+
+class AdmissionLimiter:
+    """
+    Limita a concorrência de uma rota pesada com uma fila limitada.
+
+    Até `max_concurrency` requisições executam ao mesmo tempo. Outras `max_queue` esperam até
+    `queue_timeout` segundos por uma vaga. Além disso, a requisição recebe 429 imediatamente.
+    Se a espera esgotar, recebe 503. Em ambos os casos, o Retry-After é estimado a partir
+    do tempo médio de serviço observado.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._active = 0
+        self._waiting = 0
+        self._avg_service_time = 1.0
+        self.stats = {"admitted": 0, "queued": 0, "rejected": 0, "timed_out": 0}
+
+    @property
+    def overloaded(self) -> bool:
+        # O semáforo (e não _active) é a fonte da verdade: uma vaga liberada pode já estar
+        # prometida a quem espera, mesmo antes de _active ser atualizado
+        return self._semaphore.locked()
+
+    def snapshot(self) -> dict:
+        return {
+            **self.stats,
+            "active": self._active,
+            "waiting": self._waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "avg_service_time_ms": round(self._avg_service_time * 1000, 2),
+        }
+
+    def _retry_after(self) -> int:
+        backlog = (self._waiting + self._active) / self.max_concurrency
+        return max(1, math.ceil(backlog * self._avg_service_time))
+
+    @asynccontextmanager
+    async def admit(self):
+        # Só quem encontra o limitador cheio entra na fila (e conta para o 429 e o Retry-After)
+        queued = self.overloaded
+        if queued:
+            if self._waiting >= self.max_queue:
+                self.stats["rejected"] += 1
+                raise Overloaded(status.HTTP_429_TOO_MANY_REQUESTS, self._retry_after(), f"Too many concurrent {self.name} requests.")
+            self.stats["queued"] += 1
+            self._waiting += 1
+        # Toda aquisição passa pela espera limitada: com vaga livre ela é imediata
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.stats["timed_out"] += 1
+            raise Overloaded(status.HTTP_503_SERVICE_UNAVAILABLE, self._retry_after(), f"{self.name} is overloaded, try again later.")
+        finally:
+            if queued:
+                self._waiting -= 1
+
+        self.stats["admitted"] += 1
+        self._active += 1
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._active -= 1
+            self._semaphore.release()
+            # Média móvel exponencial do tempo de serviço, usada no Retry-After
+            self._avg_service_time = 0.8 * self._avg_service_time + 0.2 * (time.perf_counter() - started_at)
+
+
+def pool_aware_concurrency(connections_per_request: int, override: Optional[int] = None) -> int:
+    """
+    Concorrência máxima que uma rota pesada pode usar sem esgotar o pool:
+    reserva DB_POOL_RESERVED_CONNECTIONS para as rotas leves (/spots, /profile, ...).
+    """
+    if override:
+        return override
+    available = settings.DB_POOL_MAX_SIZE - settings.DB_POOL_RESERVED_CONNECTIONS
+    return max(1, available // max(1, connections_per_request))
@@ -1,5 +1,6 @@
+import hmac
 import jwt
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from src.core.config import settings
 
@@ -28,4 +29,12 @@ async def get_current_user_id(creds: HTTPAuthorizationCredentials = Depends(bear
     except jwt.ExpiredSignatureError:
          raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expirado.")
     except jwt.PyJWTError as e:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=f"Não foi possível validar as credenciais do token: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=f"Não foi possível validar as credenciais do token: {e}")
+
+
+async def require_admin_token(x_admin_token: str = Header(default="")) -> None:
+    """
+    Valida o token administrativo enviado no cabeçalho X-Admin-Token.
+    """
+    if not settings.ADMIN_TOKEN or not hmac.compare_digest(x_admin_token.encode(), settings.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin token inválido.")
@@ -0,0 +1,262 @@
+import gzip
+import hashlib
+import re
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard é opcional
+    zstandard = None
+
+
+def _compress_gzip(body: bytes) -> bytes:
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+def _compress_brotli(body: bytes) -> bytes:
+    return brotli.compress(body, quality=5)
+
+def _compress_zstd(body: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=6).compress(body)
+
+# Ordem de preferência do servidor quando o cliente aceita mais de uma codificação
+_COMPRESSORS = [
+    (name, fn) for name, fn, available in (
+        ("br", _compress_brotli, brotli is not None),
+        ("zstd", _compress_zstd, zstandard is not None),
+        ("gzip", _compress_gzip, True),
+    ) if available
+]
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Escolhe a codificação a partir do cabeçalho Accept-Encoding, respeitando q=0.
+    Entre as aceitas, usa o maior q-value e, no empate, a preferência do servidor.
+    """
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        match = re.search(r"q\s*=\s*([0-9.]+)", params)
+        if match:
+            try:
+                q = float(match.group(1))
+            except ValueError:
+                q = 0.0
+        accepted[token] = q
+
+    best, best_q = None, 0.0
+    for name, _ in _COMPRESSORS:
+        q = accepted.get(name, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Compara o If-None-Match com o ETag (comparação fraca, como manda o RFC 9110 para GET/HEAD)."""
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+class CompressionMiddleware:
+    """
+    Middleware ASGI de compressão com negociação de conteúdo (gzip, e brotli/zstd se instalados).
+
+    Respostas menores que `minimum_size` seguem sem compressão. Respostas em streaming
+    (ex: SSE) também não são comprimidas. Toda resposta que passa pelo middleware leva
+    `Vary: Accept-Encoding`.
+
+    `cached_routes` lista pares (padrão do path, função de versão) das rotas cujas respostas
+    são iguais para todos os usuários. A função recebe o match do path e devolve a versão
+    dos dados que a rota lê (ou None para não usar o cache). A resposta 200 fica em cache por (path, query string, versão),
+    com o corpo original e cada codificação já comprimida: enquanto a versão não muda, a
+    requisição é servida do cache sem chamar a rota (sem consulta nem serialização). Quando
+    os dados mudam, a versão muda e a entrada antiga sai do LRU, sem invalidação explícita.
+    Nessas rotas o ETag é o digest do corpo com a codificação (`"<digest>-br"`; sem sufixo na
+    representação sem compressão), um If-None-Match igual recebe 304, e HEAD recebe os
+    cabeçalhos da representação do GET.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        cached_routes: Iterable[Tuple[str, Callable[["re.Match"], Optional[Hashable]]]] = (),
+        cache_max_entries: int = 512,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cached_routes = [(re.compile(pattern), version) for pattern, version in cached_routes]
+        self.cache_max_entries = cache_max_entries
+        self._cache: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        self.stats = {"compressed": 0, "cache_hits": 0, "not_modified": 0, "skipped": 0}
+
+    def _route_version(self, scope) -> Tuple[bool, Optional[Hashable]]:
+        """(rota em cache?, versão atual dos dados) da requisição."""
+        if scope["method"] not in ("GET", "HEAD"):
+            return False, None
+        for pattern, version in self.cached_routes:
+            match = pattern.match(scope["path"])
+            if match:
+                return True, version(match)
+        return False, None
+
+    async def _fetch(self, scope, receive) -> Tuple[Optional[Dict[str, Any]], list]:
+        """
+        Executa a rota (como GET, também para HEAD) e devolve (entrada, mensagens): a entrada
+        quando a resposta é um 200 completo e sem codificação; senão, as mensagens originais.
+        """
+        messages = []
+
+        async def capture(message):
+            messages.append(message)
+
+        await self.app({**scope, "method": "GET"}, receive, capture)
+        start, bodies = messages[0], messages[1:]
+        headers = start.get("headers") or []
+        if (
+            start["status"] != 200
+            or len(bodies) != 1
+            or bodies[0].get("more_body", False)
+            or any(k.lower() == b"content-encoding" for k, _ in headers)
+        ):
+            return None, messages
+        body = bodies[0].get("body", b"")
+        return {
+            "headers": [(k, v) for k, v in headers if k.lower() not in (b"content-length", b"etag", b"vary")],
+            "vary": b", ".join([v for k, v in headers if k.lower() == b"vary"] + [b"Accept-Encoding"]),
+            "body": body,
+            "digest": hashlib.blake2b(body, digest_size=16).hexdigest(),
+            "encoded": {},
+        }, messages
+
+    def _encoded(self, entry: Dict[str, Any], encoding: str) -> bytes:
+        compressed = entry["encoded"].get(encoding)
+        if compressed is None:
+            compressed = entry["encoded"][encoding] = dict(_COMPRESSORS)[encoding](entry["body"])
+            self.stats["compressed"] += 1
+        return compressed
+
+    async def _send_cached(self, scope, send, entry: Dict[str, Any], encoding: Optional[str], if_none_match: str) -> None:
+        if encoding is not None and len(entry["body"]) < self.minimum_size:
+            encoding = None
+        etag = f'"{entry["digest"]}-{encoding}"' if encoding else f'"{entry["digest"]}"'
+        vary = (b"vary", entry["vary"])
+        if if_none_match and etag_matches(if_none_match, etag):
+            self.stats["not_modified"] += 1
+            await send({"type": "http.response.start", "status": 304, "headers": [(b"etag", etag.encode("latin-1")), vary]})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        body = self._encoded(entry, encoding) if encoding else entry["body"]
+        headers = [*entry["headers"], (b"content-length", str(len(body)).encode("latin-1")), (b"etag", etag.encode("latin-1")), vary]
+        if encoding:
+            headers.append((b"content-encoding", encoding.encode("latin-1")))
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else body})
+
+    async def _call_cached(self, scope, receive, send, version: Optional[Hashable], encoding: Optional[str], if_none_match: str) -> None:
+        # A origem entra na chave porque o CORSMiddleware (interno a este) ecoa o Origin
+        headers = dict(scope.get("headers") or [])
+        key = (scope["path"], scope.get("query_string", b""), headers.get(b"origin"), version)
+        entry = self._cache.get(key) if version is not None else None
+        if entry is not None:
+            self._cache.move_to_end(key)
+            self.stats["cache_hits"] += 1
+        else:
+            entry, messages = await self._fetch(scope, receive)
+            if entry is None:
+                # Erros e respostas incomuns seguem como vieram, sem cache nem compressão
+                self.stats["skipped"] += 1
+                start = messages[0]
+                vary = [v for k, v in start.get("headers", []) if k.lower() == b"vary"]
+                headers = [(k, v) for k, v in start.get("headers", []) if k.lower() != b"vary"]
+                await send({**start, "headers": headers + [(b"vary", b", ".join(vary + [b"Accept-Encoding"]))]})
+                for message in messages[1:]:
+                    await send({**message, "body": b""} if scope["method"] == "HEAD" else message)
+                return
+            if version is not None:
+                self._cache[key] = entry
+                if len(self._cache) > self.cache_max_entries:
+                    self._cache.popitem(last=False)
+        await self._send_cached(scope, send, entry, encoding, if_none_match)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        encoding = negotiate_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+
+        cached, version = self._route_version(scope)
+        if cached:
+            await self._call_cached(scope, receive, send, version, encoding, headers.get(b"if-none-match", b"").decode("latin-1"))
+            return
+
+        start_message = None
+        body_parts = []
+        passthrough = False
+
+        def with_vary(message, extra_headers=()):
+            vary = [v for k, v in message.get("headers", []) if k.lower() == b"vary"]
+            new_headers = [(k, v) for k, v in message.get("headers", []) if k.lower() != b"vary"]
+            new_headers += [*extra_headers, (b"vary", b", ".join(vary + [b"Accept-Encoding"]))]
+            return {**message, "headers": new_headers}
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                response_headers = dict(message.get("headers") or [])
+                content_type = response_headers.get(b"content-type", b"")
+                if b"content-encoding" in response_headers or content_type.startswith(b"text/event-stream"):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body_parts.append(message.get("body", b""))
+            if message.get("more_body", False):
+                if len(body_parts) == 1:
+                    return
+                # Corpo em streaming: devolve o que foi acumulado sem comprimir
+                passthrough = True
+                self.stats["skipped"] += 1
+                await send(with_vary(start_message))
+                await send({"type": "http.response.body", "body": b"".join(body_parts), "more_body": True})
+                return
+
+            body = b"".join(body_parts)
+            if encoding is None or len(body) < self.minimum_size or start_message["status"] < 200 or start_message["status"] == 204:
+                self.stats["skipped"] += 1
+                await send(with_vary(start_message))
+                await send({"type": "http.response.body", "body": body})
+                return
+
+            compressed = dict(_COMPRESSORS)[encoding](body)
+            self.stats["compressed"] += 1
+            new_headers = [(b"content-encoding", encoding.encode("latin-1")), (b"content-length", str(len(compressed)).encode("latin-1"))]
+            start_message = {**start_message, "headers": [(k, v) for k, v in start_message.get("headers", []) if k.lower() != b"content-length"]}
+            await send(with_vary(start_message, new_headers))
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
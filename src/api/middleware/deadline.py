@@ -0,0 +1,102 @@
+import asyncio
+import json
+import re
+from typing import Iterable
+
+from src.core import deadline
+
+
+class DeadlineMiddleware:
+    """
+    Dá a cada requisição HTTP um orçamento de tempo (`budget_seconds`), propagado por
+    src/core/deadline.py à espera por conexão do pool e às queries. As rotas tratam o
+    estouro (DeadlineExceeded) servindo resultado parcial ou em cache, ou respondendo 504.
+
+    O handler roda em uma task própria, cancelada (junto com as queries em andamento) se o
+    cliente desconectar, ou se passar `grace_seconds` do prazo sem terminar; nesse caso,
+    se a resposta ainda não começou, o middleware responde 504. Rotas em `excluded_paths`
+    (ex: streams SSE) seguem sem prazo.
+    """
+
+    def __init__(self, app, budget_seconds: float, grace_seconds: float = 1.0, excluded_paths: Iterable[str] = ()):
+        self.app = app
+        self.budget_seconds = budget_seconds
+        self.grace_seconds = grace_seconds
+        self.excluded_paths = [re.compile(pattern) for pattern in excluded_paths]
+        self.stats = {"requests": 0, "disconnects": 0, "timeouts": 0}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or any(p.match(scope["path"]) for p in self.excluded_paths):
+            await self.app(scope, receive, send)
+            return
+
+        # O corpo é lido antes do handler; depois disso, o receive original só serve para
+        # detectar a desconexão do cliente.
+        body_messages = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body_messages.append(message)
+            if not message.get("more_body", False):
+                break
+
+        disconnected = asyncio.Event()
+        response_started = False
+
+        async def replay_receive():
+            if body_messages:
+                return body_messages.pop(0)
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send_wrapper(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        async def watch_disconnect():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            disconnected.set()
+
+        self.stats["requests"] += 1
+        token = deadline.start(self.budget_seconds)
+        try:
+            handler = asyncio.create_task(self.app(scope, replay_receive, send_wrapper))
+        finally:
+            deadline.reset(token)
+        watcher = asyncio.create_task(watch_disconnect())
+        try:
+            done, _ = await asyncio.wait(
+                {handler, watcher},
+                timeout=self.budget_seconds + self.grace_seconds,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            if handler in done:
+                handler.result()
+                return
+
+            handler.cancel()
+            try:
+                await handler
+            except asyncio.CancelledError:
+                pass
+            if watcher in done:
+                self.stats["disconnects"] += 1
+                return
+            self.stats["timeouts"] += 1
+            print(f"AVISO: Requisição {scope['method']} {scope['path']} cancelada após estourar o prazo.")
+            if not response_started:
+                body = json.dumps({"detail": "Request deadline exceeded."}, separators=(",", ":")).encode()
+                await send({
+                    "type": "http.response.start",
+                    "status": 504,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+                })
+                await send({"type": "http.response.body", "body": body})
+        finally:
+            watcher.cancel()
+            if not handler.done():
+                handler.cancel()
@@ -0,0 +1,48 @@
+import hmac
+import random
+
+from src.services.profiler import SamplingProfiler
+
+
+class ProfilingMiddleware:
+    """
+    Perfila requisições sob demanda. Uma requisição é perfilada se trouxer
+    `X-Profile: 1` com um `X-Admin-Token` válido, ou por amostragem (`sample_rate`).
+    O perfil fica guardado no profiler e o id volta no cabeçalho `X-Profile-Id`.
+
+    Só é instalado quando PROFILING_ENABLED=true; desligado, não há custo algum.
+    """
+
+    def __init__(self, app, profiler: SamplingProfiler, admin_token: str = "", sample_rate: float = 0.0):
+        self.app = app
+        self.profiler = profiler
+        self.admin_token = admin_token.encode()
+        self.sample_rate = sample_rate
+
+    def _requested(self, scope) -> bool:
+        headers = dict(scope.get("headers") or [])
+        if headers.get(b"x-profile") not in (b"1", b"true"):
+            return False
+        return bool(self.admin_token) and hmac.compare_digest(headers.get(b"x-admin-token", b""), self.admin_token)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (
+            self._requested(scope) or (self.sample_rate and random.random() < self.sample_rate)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        session_id = self.profiler.start({"method": scope["method"], "path": scope["path"]})
+        status_code = None
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"x-profile-id", session_id.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.profiler.stop(session_id, status_code=status_code)
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from typing import Any, Dict, List
+from src.api.dependencies.auth import require_admin_token
+from src.services.profiler import profiler
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["Admin"],
+    dependencies=[Depends(require_admin_token)]
+)
+
+@router.get("/profiles", response_model=List[Dict[str, Any]])
+async def list_profiles():
+    """Lista os perfis de requisição guardados (os mais recentes primeiro)."""
+    return profiler.list_profiles()
+
+@router.get("/profiles/aggregate", response_class=PlainTextResponse)
+async def get_aggregate_profile():
+    """Soma de todos os perfis guardados (janela móvel), no formato folded para flamegraphs."""
+    return profiler.folded()
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(profile_id: str):
+    """Perfil de uma requisição, no formato folded para flamegraphs."""
+    folded = profiler.folded(profile_id)
+    if folded is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found.")
+    return folded
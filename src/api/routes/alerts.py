@@ -0,0 +1,78 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import List
+from src.core.config import settings
+from src.core.schemas import Alert, AlertSubscription, AlertSubscriptionCreate
+from src.db import queries
+from src.api.dependencies.auth import get_current_user_id
+from src.services import alert_service, user_context
+from src.services.scoring_service import SURF_LEVELS
+
+router = APIRouter(
+    prefix="/alerts",
+    tags=["Alerts"]
+)
+
+@router.post("/subscriptions", response_model=AlertSubscription, status_code=status.HTTP_201_CREATED)
+async def create_subscription(
+    subscription: AlertSubscriptionCreate,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """
+    Assina alertas de um pico: a cada atualização das previsões, cada dia local cuja melhor
+    hora (ainda por vir) atingir `min_score` gera um alerta no outbox. Sem `surf_level`,
+    usa o nível do perfil do usuário.
+    """
+    surf_level = subscription.surf_level
+    if surf_level is None:
+        context = await user_context.get_user_context(current_user_id)
+        if context is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User profile not found.")
+        surf_level = context['surf_level']
+    if surf_level not in SURF_LEVELS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid level. Use one of: {', '.join(SURF_LEVELS)}.")
+    if not 0 <= subscription.min_score <= 100:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="min_score must be between 0 and 100.")
+    if not await queries.get_spot_by_id(subscription.spot_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Spot not found.")
+
+    created = await queries.create_alert_subscription(
+        current_user_id, subscription.spot_id, surf_level, subscription.min_score,
+        settings.ALERT_MAX_SUBSCRIPTIONS_PER_USER
+    )
+    if created is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Subscription limit reached ({settings.ALERT_MAX_SUBSCRIPTIONS_PER_USER})."
+        )
+    alert_service.subscriptions_changed()
+    return created
+
+@router.get("/subscriptions", response_model=List[AlertSubscription])
+async def get_subscriptions(
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """Retorna as assinaturas de alerta do usuário autenticado."""
+    return await queries.get_alert_subscriptions(current_user_id)
+
+@router.delete("/subscriptions/{subscription_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_subscription(
+    subscription_id: int,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """Remove uma assinatura de alerta do usuário (e os alertas dela ainda no outbox)."""
+    success = await queries.delete_alert_subscription(current_user_id, subscription_id)
+    if not success:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Subscription not found.")
+    alert_service.subscriptions_changed()
+    return None
+
+@router.post("/outbox/consume", response_model=List[Alert])
+async def consume_alerts(
+    limit: int = Query(default=100, ge=1, le=1000),
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """
+    Retorna os alertas pendentes mais antigos do usuário, marcando-os como consumidos:
+    cada alerta é entregue uma única vez, mesmo com consumidores simultâneos.
+    """
+    return await queries.consume_alerts(current_user_id, limit)
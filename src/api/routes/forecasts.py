@@ -1,27 +1,47 @@
 # bryanads/thecheckapi/thecheckAPI-16b9a78c834b43d2ae715994e6bdff06b4aed85d/src/api/routes/forecasts.py
 import datetime
 import asyncio
-from fastapi import APIRouter, HTTPException, status
-from typing import List
+import re
+import time
+import orjson
+from fastapi import APIRouter, HTTPException, Query, Response, status
+from typing import Hashable, List
 
-from src.core.schemas import SpotForecastResponse, HourlyData, ForecastConditions
+from src.core.schemas import SpotForecastResponse, SpotDailyForecastResponse
 from src.db import queries
+from src.core.config import settings
+from src.services import daily_summary_service, data_versions, forecast_window
+from src.services.single_flight import SingleFlight
 
 router = APIRouter(
     prefix="/forecasts",
     tags=["Forecasts"]
 )
 
-@router.get("/spot/{spot_id}", response_model=SpotForecastResponse)
-async def get_spot_forecast(spot_id: int):
+forecast_flight = SingleFlight("forecasts")
+
+# Chaves de "conditions" na mesma ordem das colunas 1..N de SQL_FORECASTS_FOR_SPOT
+_CONDITION_KEYS = (*queries.FORECAST_CONDITION_FIELDS, "tide_type")
+
+def spot_forecast_cache_version(match: re.Match) -> Hashable:
     """
-    Retorna uma lista contínua de previsões horárias para os próximos 7 dias
-    e as últimas 24 horas para um spot_id específico.
+    Versão da resposta de /forecasts/spot/{spot_id} para o cache do CompressionMiddleware:
+    as previsões do spot, o catálogo (nome do spot) e o minuto, que é a resolução da janela
+    consultada pela rota (e limita o atraso se uma notificação se perder).
     """
-    # MODIFICAÇÃO 1: Começa a busca 24 horas no passado
-    start_utc = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=1)
-    end_utc = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=7)
+    spot_id = int(match.group("spot_id"))
+    return (data_versions.forecast_version(spot_id), data_versions.catalog_version(), int(time.time() // 60))
+
+def daily_cache_version(match: re.Match) -> Hashable:
+    """Versão das respostas dos resumos diários: os resumos gravados, o catálogo e o minuto."""
+    return (daily_summary_service.summary_version(), data_versions.catalog_version(), int(time.time() // 60))
 
+async def _build_spot_forecast(spot_id: int, start_utc: datetime.datetime, end_utc: datetime.datetime) -> bytes:
+    """
+    Monta o JSON de SpotForecastResponse direto dos records do asyncpg com orjson, sem
+    instanciar os modelos pydantic (o formato é o mesmo: datetimes com "Z", floats e
+    chaves na ordem de ForecastConditions).
+    """
     spot_data_task = queries.get_spot_by_id(spot_id)
     forecast_rows_task = queries.get_forecasts_for_spot(spot_id, start_utc, end_utc)
     
@@ -31,18 +51,71 @@ async def get_spot_forecast(spot_id: int):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Spot not found.")
 
     # MODIFICAÇÃO 2: Não agrupa mais por dia, apenas converte os resultados
-    hourly_forecasts = []
-    for row in forecast_rows:
-        conditions_data = {k: v for k, v in row.items() if k not in ['forecast_id', 'spot_id', 'timestamp_utc', 'last_modified_at']}
-        
-        hourly_data = HourlyData(
-            timestamp_utc=row['timestamp_utc'],
-            conditions=ForecastConditions(**conditions_data)
+    hourly_forecasts = [
+        {"timestamp_utc": row[0], "conditions": dict(zip(_CONDITION_KEYS, row[1:]))}
+        for row in forecast_rows
+    ]
+    return orjson.dumps(
+        {"spot_id": spot_id, "spot_name": spot_data['name'], "forecasts": hourly_forecasts}, # Retorna a lista contínua
+        option=orjson.OPT_UTC_Z
+    )
+
+@router.get("/spot/{spot_id}", response_model=SpotForecastResponse)
+async def get_spot_forecast(spot_id: int):
+    """
+    Retorna uma lista contínua de previsões horárias para os próximos 7 dias
+    e as últimas 24 horas para um spot_id específico.
+    Requisições simultâneas para o mesmo spot compartilham uma única consulta.
+    O corpo é serializado direto dos records; o response_model fica só para a documentação.
+    """
+    # A janela é truncada no minuto para que requisições simultâneas tenham a mesma chave
+    now = datetime.datetime.now(datetime.timezone.utc).replace(second=0, microsecond=0)
+    # MODIFICAÇÃO 1: Começa a busca 24 horas no passado
+    start_utc = now - datetime.timedelta(days=1)
+    end_utc = now + datetime.timedelta(days=7)
+
+    try:
+        body = await forecast_flight.do(
+            (spot_id, start_utc),
+            lambda: _build_spot_forecast(spot_id, start_utc, end_utc),
+            timeout=settings.SINGLE_FLIGHT_TIMEOUT_SECONDS
         )
-        hourly_forecasts.append(hourly_data)
-    
-    return SpotForecastResponse(
-        spot_id=spot_id,
-        spot_name=spot_data['name'],
-        forecasts=hourly_forecasts # Retorna a lista contínua
-    )
\ No newline at end of file
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Forecast is taking too long, try again later.",
+            headers={"Retry-After": str(settings.SINGLE_FLIGHT_RETRY_AFTER_SECONDS)}
+        )
+    return Response(content=body, media_type="application/json")
+
+
+@router.get("/spot/{spot_id}/daily", response_model=SpotDailyForecastResponse)
+async def get_spot_daily_forecast(spot_id: int, days: int = Query(7, ge=1, le=16)):
+    """
+    Retorna o resumo diário (mín/máx/média de swell, vento e maré, e a melhor hora por nível)
+    de um spot, de hoje (no fuso do spot) em diante, lido da tabela de resumos diários.
+    """
+    spot_data = await queries.get_spot_by_id(spot_id)
+    if not spot_data:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Spot not found.")
+    # "Hoje" é calculado aqui, com o fuso validado, e não no SQL (um fuso inválido faria a query falhar)
+    summaries = await queries.get_forecast_daily_summaries([spot_id], [forecast_window.local_today(spot_data['timezone'])], days)
+    return SpotDailyForecastResponse(spot_id=spot_id, spot_name=spot_data['name'], days=summaries[spot_id])
+
+
+@router.get("/daily", response_model=List[SpotDailyForecastResponse])
+async def get_daily_forecasts(spot_ids: List[int] = Query(...), days: int = Query(7, ge=1, le=16)):
+    """
+    Versão multi-spot do resumo diário: uma única leitura para todos os spot_ids informados.
+    Spots inexistentes são ignorados.
+    """
+    spots_by_id = await queries.get_spots_by_ids(list(dict.fromkeys(spot_ids)))
+    spot_ids = [spot_id for spot_id in dict.fromkeys(spot_ids) if spot_id in spots_by_id]
+    summaries = await queries.get_forecast_daily_summaries(
+        spot_ids, [forecast_window.local_today(spots_by_id[spot_id]['timezone']) for spot_id in spot_ids], days
+    )
+    return [
+        SpotDailyForecastResponse(spot_id=spot_id, spot_name=spots_by_id[spot_id]['name'], days=summaries[spot_id])
+        for spot_id in spot_ids
+    ]
+
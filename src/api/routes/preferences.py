@@ -1,13 +1,54 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from src.core.schemas import Preference, PreferenceUpdate
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import List
+from src.core.schemas import Preference, PreferenceUpdate, ResolvedPreference, PreferenceBulkUpdate
 from src.db import queries
 from src.api.dependencies.auth import get_current_user_id
+from src.services import user_context
 
 router = APIRouter(
     prefix="/preferences",
     tags=["Preferences"]
 )
 
+@router.get("/", response_model=List[ResolvedPreference])
+async def get_preferences_for_spots(
+    spot_ids: List[int] = Query(...),
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """
+    Retorna as preferências resolvidas para vários picos de uma vez, seguindo a mesma
+    hierarquia de /preferences/spot/{spot_id}, campo a campo. O campo 'sources' indica
+    a origem de cada valor ('user', 'spot' ou 'generic').
+    """
+    context = await user_context.get_user_context(current_user_id)
+    if context is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User profile not found.")
+    resolved = await queries.get_preferences_for_spots(context, spot_ids)
+    return [resolved[spot_id] for spot_id in dict.fromkeys(spot_ids) if spot_id in resolved]
+
+@router.put("/", response_model=List[Preference])
+async def set_preferences_for_spots(
+    bulk_update: PreferenceBulkUpdate,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """
+    Cria ou atualiza as preferências customizadas do usuário para vários picos em uma única operação.
+    """
+    items = [item.model_dump(exclude_unset=True) for item in bulk_update.items]
+    if not items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No update data provided.")
+    # Um item só com spot_id não altera nada: recusa em vez de omiti-lo da resposta
+    empty_spot_ids = [item['spot_id'] for item in items if len(item) == 1]
+    if empty_spot_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"No update data provided for spot_ids: {', '.join(map(str, empty_spot_ids))}."
+        )
+
+    updated = await queries.create_or_update_user_preferences_bulk(current_user_id, items)
+    user_context.invalidate(current_user_id)
+    return updated
+
 @router.get("/spot/{spot_id}", response_model=Preference)
 async def get_spot_preferences(
     spot_id: int,
@@ -19,16 +60,16 @@ async def get_spot_preferences(
     2. Preferências padrão do pico para o nível do usuário.
     3. Preferências genéricas para o nível do usuário (fallback).
     """
-    # Nível 1: Tenta buscar as preferências customizadas do usuário
-    user_prefs = await queries.get_user_spot_preferences(current_user_id, spot_id)
+    # O contexto do usuário (em cache) traz o nível de surf e as preferências customizadas
+    context = await user_context.get_user_context(current_user_id)
+    if context is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User profile not found.")
+
+    # Nível 1: Preferências customizadas do usuário
+    user_prefs = context['custom_prefs'].get(spot_id)
     if user_prefs:
         return user_prefs
-
-    # Se não houver, busca o perfil para obter o nível de surf
-    user_profile = await queries.get_profile_by_id(current_user_id)
-    if not user_profile:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User profile not found.")
-    surf_level = user_profile.get('surf_level', 'intermediario')
+    surf_level = context['surf_level']
 
     # Nível 2: Tenta buscar as preferências padrão do spot para o nível do usuário
     spot_level_prefs = await queries.get_spot_level_preferences(spot_id, surf_level)
@@ -58,5 +99,6 @@ async def set_spot_preferences(
     
     # Esta função agora se refere apenas às preferências do usuário
     updated_preferences = await queries.create_or_update_user_preferences(current_user_id, spot_id, update_data)
+    user_context.invalidate(current_user_id)
     
     return updated_preferences
\ No newline at end of file
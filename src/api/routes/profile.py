@@ -3,6 +3,7 @@ from typing import Optional
 from src.core.schemas import Profile, ProfileUpdate
 from src.db import queries
 from src.api.dependencies.auth import get_current_user_id
+from src.services import user_context
 
 router = APIRouter(
     prefix="/profile",
@@ -44,6 +45,7 @@ async def update_current_user_profile(
         )
 
     updated_profile = await queries.update_profile(current_user_id, update_data)
+    user_context.invalidate(current_user_id)
 
     if not updated_profile:
         raise HTTPException(
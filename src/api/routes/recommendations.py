@@ -3,53 +3,146 @@
 import datetime
 import asyncio
 import json
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
-from collections import defaultdict
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from typing import Hashable, List, Optional, Tuple
+from collections import defaultdict, OrderedDict
+import time
+import numpy as np
 
-from src.core.schemas import RecommendationRequest, DailyRecommendation, SpotDailySummary
+from src.core.schemas import RecommendationRequest, DailyRecommendation, SpotDailySummary, TimeWindow, DaySelection, HourlyRecommendation
 from src.db import queries
 from src.api.dependencies.auth import get_current_user_id
-from src.services.scoring_service import calculate_overall_score
-from .preferences import get_spot_preferences
+from src.api.dependencies.admission import AdmissionLimiter, Overloaded, pool_aware_concurrency
+from src.core.config import settings
+from src.core.deadline import DeadlineExceeded
+from src.services.scoring_service import calculate_overall_score, SURF_LEVELS
+from src.services import forecast_window, score_store, user_context
+from src.services.single_flight import SingleFlight
+from src.services import recommendation_stream
 
 router = APIRouter(prefix="/recommendations", tags=["Recommendations"])
 
-def weekdays_to_offsets(weekdays: List[int]) -> List[int]:
+# Cada cálculo em tempo real usa até 2 conexões simultâneas (perfil e preferências do
+# usuário, se o contexto não estiver em cache; depois spots e preferências do pico)
+REALTIME_CONNECTIONS_PER_REQUEST = 2
+
+recommendations_limiter = AdmissionLimiter(
+    name="recommendations",
+    max_concurrency=pool_aware_concurrency(REALTIME_CONNECTIONS_PER_REQUEST, settings.RECOMMENDATIONS_MAX_CONCURRENCY),
+    max_queue=settings.RECOMMENDATIONS_MAX_QUEUE,
+    queue_timeout=settings.RECOMMENDATIONS_QUEUE_TIMEOUT_SECONDS,
+)
+
+recommendations_flight = SingleFlight("recommendations")
+
+_recommendations_adapter = TypeAdapter(List[DailyRecommendation])
+
+# Último resultado completo de cada cálculo (chave do SingleFlight), servido quando o
+# orçamento da requisição acaba antes do cálculo: (instante, recomendações)
+_recent_results: "OrderedDict[Hashable, Tuple[float, List[DailyRecommendation]]]" = OrderedDict()
+
+def weekdays_to_offsets(weekdays: List[int], today: datetime.date) -> List[int]:
+    """Offsets (a partir de `today`) dos próximos dias da semana escolhidos (0 = domingo)."""
     if not weekdays: return [0]
-    today = (datetime.datetime.now(datetime.timezone.utc).weekday() + 1) % 7
-    offsets = [i for i in range(7) if ((today + i) % 7) in weekdays]
+    today_weekday = (today.weekday() + 1) % 7
+    offsets = [i for i in range(7) if ((today_weekday + i) % 7) in weekdays]
     return offsets if offsets else [0]
 
+def local_time_windows(
+    timezone: str,
+    day_selection: DaySelection,
+    time_window: TimeWindow,
+    now: Optional[datetime.datetime] = None
+) -> List[Tuple[datetime.datetime, datetime.datetime, datetime.date]]:
+    """
+    Converte os dias escolhidos (offsets a partir de hoje ou dias da semana, ambos no fuso
+    do spot) e a janela de horário local em intervalos UTC fechados: (início_utc, fim_utc, data_local).
+    """
+    tz = forecast_window.spot_timezone(timezone)
+    today_local = (now or datetime.datetime.now(datetime.timezone.utc)).astimezone(tz).date()
+    if day_selection.type == 'weekdays':
+        day_offsets = weekdays_to_offsets(day_selection.values, today_local)
+    else:
+        day_offsets = day_selection.values
+    windows = []
+    for offset in sorted(set(day_offsets)):
+        local_date = today_local + datetime.timedelta(days=offset)
+        start_local = datetime.datetime.combine(local_date, time_window.start, tzinfo=tz)
+        end_local = datetime.datetime.combine(local_date, time_window.end, tzinfo=tz)
+        windows.append((start_local.astimezone(datetime.timezone.utc), end_local.astimezone(datetime.timezone.utc), local_date))
+    return windows
+
 # --- LÓGICA DE CÁLCULO EM TEMPO REAL (FALLBACK) ---
 async def calculate_recommendations_realtime(
     request: RecommendationRequest,
-    current_user_id: str,
-    day_offsets: List[int]
-) -> List[DailyRecommendation]:
-    """ Lógica original de cálculo, agora usada como fallback. """
-    print(f"INFO: Executando cálculo em tempo real para o usuário {current_user_id} com offsets {day_offsets}.")
-    # (O restante desta função permanece o mesmo)
-    start_utc = datetime.datetime.now(datetime.timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-    end_utc = start_utc + datetime.timedelta(days=max(day_offsets) + 1)
-    user_profile = await queries.get_profile_by_id(current_user_id)
-    if not user_profile: raise HTTPException(status_code=404, detail="User profile not found")
+    current_user_id: str
+) -> Tuple[List[DailyRecommendation], bool]:
+    """
+    Lógica original de cálculo, agora usada como fallback.
+    Os dias e a janela de horário (no fuso de cada spot) viram predicados SQL,
+    então só as horas pontuáveis são buscadas e pontuadas.
+    Retorna (recomendações, parcial): se o orçamento da requisição acabar durante a
+    leitura das previsões, o resultado traz só os spots servidos pelas matrizes de score.
+    """
+    print(f"INFO: Executando cálculo em tempo real para o usuário {current_user_id} com dias {request.day_selection.model_dump()}.")
+    # Perfil e preferências customizadas vêm do contexto do usuário (em cache)
+    context = await user_context.get_user_context(current_user_id)
+    if context is None: raise HTTPException(status_code=404, detail="User profile not found")
+    user_profile = context['profile']
+
+    # Resolve as preferências de todos os spots de uma vez, em vez de uma chamada por spot
+    spots_by_id, prefs_by_spot = await asyncio.gather(
+        queries.get_spots_by_ids(request.spot_ids),
+        queries.get_preferences_for_spots(context, request.spot_ids)
+    )
+
+    # Spots sem preferências personalizadas ativas são lidos das matrizes de score por nível
+    surf_level = context['surf_level']
+    store = None
+    if surf_level in SURF_LEVELS:
+        try:
+            store = await score_store.get_score_store()
+        except Exception as e:
+            # As matrizes são só um atalho: sem elas, todos os spots seguem o cálculo via SQL
+            print(f"AVISO: Matrizes de score indisponíveis ({e!r}); usando o cálculo completo.")
+
     daily_options = defaultdict(list)
-    for spot_id in request.spot_ids:
-        spot_details, spot_forecasts, user_prefs = await asyncio.gather(queries.get_spot_by_id(spot_id), queries.get_forecasts_for_spot(spot_id, start_utc, end_utc), get_spot_preferences(spot_id, current_user_id))
-        if not spot_details or not spot_forecasts: continue
-        for forecast in spot_forecasts:
-            forecast_time = forecast['timestamp_utc'].time()
-            forecast_date = forecast['timestamp_utc'].date()
-            forecast_day_offset = (forecast_date - start_utc.date()).days
-            if forecast_day_offset in day_offsets and request.time_window.start <= forecast_time <= request.time_window.end:
-                score_data = await calculate_overall_score(forecast, user_prefs, spot_details, user_profile)
-                if score_data['overall_score'] > 30:
-                    daily_options[forecast_date].append({"spot_id": spot_id, "spot_name": spot_details['name'],"timestamp_utc": forecast['timestamp_utc'], "forecast_conditions": forecast, **score_data})
+    window_spot_ids, window_starts, window_ends, window_dates = [], [], [], []
+    for spot_id, spot_details in spots_by_id.items():
+        user_prefs = prefs_by_spot.get(spot_id)
+        if not user_prefs: continue
+        uses_store = store is not None and 'user' not in user_prefs['sources'].values()
+        for start_utc, end_utc, local_date in local_time_windows(spot_details['timezone'], request.day_selection, request.time_window):
+            stored_hours = score_store.best_hours_between(store, surf_level, spot_id, start_utc, end_utc, 30) if uses_store else None
+            if stored_hours is not None:
+                daily_options[local_date].extend({"spot_id": spot_id, "spot_name": spot_details['name'], **hour} for hour in stored_hours)
+                continue
+            window_spot_ids.append(spot_id)
+            window_starts.append(start_utc)
+            window_ends.append(end_utc)
+            window_dates.append(local_date)
+    partial = False
+    try:
+        forecast_rows = await queries.get_forecasts_in_windows(window_spot_ids, window_starts, window_ends, window_dates) if window_spot_ids else []
+    except DeadlineExceeded:
+        # Sem nada das matrizes não há resultado parcial útil
+        if not daily_options: raise
+        print(f"AVISO: Prazo esgotado ao ler previsões; resultado parcial para o usuário {current_user_id}.")
+        forecast_rows, partial = [], True
+
+    for forecast in forecast_rows:
+        spot_id = forecast['spot_id']
+        spot_details, user_prefs = spots_by_id[spot_id], prefs_by_spot.get(spot_id)
+        forecast_date = forecast.pop('local_date')
+        score_data = await calculate_overall_score(forecast, user_prefs, spot_details, user_profile)
+        if score_data['overall_score'] > 30:
+            daily_options[forecast_date].append({"spot_id": spot_id, "spot_name": spot_details['name'],"timestamp_utc": forecast['timestamp_utc'], "forecast_conditions": forecast, **score_data})
     final_response = []
     for date, hourly_recs in sorted(daily_options.items()):
         best_spot_sessions = {}
-        for rec in hourly_recs:
+        for rec in sorted(hourly_recs, key=lambda r: (r['spot_id'], r['timestamp_utc'])):
             sid = rec['spot_id']
             if sid not in best_spot_sessions or rec['overall_score'] > best_spot_sessions[sid]['best_overall_score']:
                 best_spot_sessions[sid] = {"spot_id": sid, "spot_name": rec['spot_name'], "best_hour_utc": rec['timestamp_utc'], "best_overall_score": rec['overall_score'], "detailed_scores": rec['detailed_scores'], "forecast_conditions": rec['forecast_conditions']}
@@ -57,17 +150,72 @@ async def calculate_recommendations_realtime(
         spot_summaries = [SpotDailySummary(**data) for data in best_spot_sessions.values()]
         ranked_spots_for_day = sorted(spot_summaries, key=lambda x: x.best_overall_score, reverse=True)
         final_response.append(DailyRecommendation(date=date, ranked_spots=ranked_spots_for_day))
-    return final_response
+    return final_response, partial
+
+
+def _flight_key(request: RecommendationRequest, current_user_id: str) -> Hashable:
+    # Os dias são resolvidos no fuso de cada spot; a data UTC separa os cálculos de dias diferentes
+    return (
+        current_user_id,
+        tuple(sorted(set(request.spot_ids))),
+        request.day_selection.type,
+        tuple(sorted(set(request.day_selection.values))),
+        datetime.datetime.now(datetime.timezone.utc).date(),
+        request.time_window.start,
+        request.time_window.end,
+    )
+
+async def calculate_recommendations_shared(request: RecommendationRequest, current_user_id: str) -> Tuple[List[DailyRecommendation], bool]:
+    """
+    Cálculo em tempo real compartilhado pelo POST e pelo stream: pedidos idênticos e
+    simultâneos do mesmo usuário compartilham uma única execução, que passa pelo
+    controle de admissão (pode levantar Overloaded). Retorna (recomendações, parcial).
+    """
+    if request.day_selection.type != 'weekdays' and not request.day_selection.values:
+        return [], False
+
+    flight_key = _flight_key(request, current_user_id)
+    recommendations, partial = await recommendations_flight.do(
+        flight_key,
+        lambda: _calculate_with_admission(request, current_user_id),
+        timeout=settings.SINGLE_FLIGHT_TIMEOUT_SECONDS
+    )
+    if not partial:
+        _recent_results[flight_key] = (time.monotonic(), recommendations)
+        _recent_results.move_to_end(flight_key)
+        if len(_recent_results) > settings.RECOMMENDATIONS_RECENT_RESULTS_MAX_ENTRIES:
+            _recent_results.popitem(last=False)
+    return recommendations, partial
+
+def recent_recommendations(request: RecommendationRequest, current_user_id: str) -> Optional[List[DailyRecommendation]]:
+    """Último resultado completo do mesmo cálculo, se não for mais antigo que RECOMMENDATIONS_STALE_MAX_AGE_SECONDS."""
+    entry = _recent_results.get(_flight_key(request, current_user_id))
+    if entry is None or time.monotonic() - entry[0] > settings.RECOMMENDATIONS_STALE_MAX_AGE_SECONDS:
+        return None
+    return entry[1]
+
+async def _calculate_with_admission(
+    request: RecommendationRequest,
+    current_user_id: str
+) -> Tuple[List[DailyRecommendation], bool]:
+    # O cálculo em tempo real passa pelo controle de admissão. Sob sobrecarga, só o
+    # cache é servido e o excedente recebe 429/503 com Retry-After.
+    async with recommendations_limiter.admit():
+        return await calculate_recommendations_realtime(request, current_user_id)
 
 
 @router.post("/", response_model=List[DailyRecommendation])
 async def get_recommendations(
     request: RecommendationRequest,
+    response: Response,
     current_user_id: str = Depends(get_current_user_id)
 ):
     """
     Retorna recomendações. Se uma cache_key for fornecida, tenta servir do cache.
     Caso contrário, calcula em tempo real.
+    Se o orçamento da requisição acabar ou o cálculo for recusado por sobrecarga, responde
+    com o que houver e o cabeçalho X-Partial-Result: 'partial' (faltam spots) ou 'stale'
+    (último resultado completo).
     """
     # --- NOVA LÓGICA SIMPLIFICADA ---
     if request.cache_key:
@@ -82,12 +230,162 @@ async def get_recommendations(
             # usando os dados do preset que o frontend enviará.
 
     # --- LÓGICA DE FALLBACK (CÁLCULO EM TEMPO REAL) ---
-    if request.day_selection.type == 'weekdays':
-        day_offsets = weekdays_to_offsets(request.day_selection.values)
-    else:
-        day_offsets = request.day_selection.values
+    try:
+        recommendations, partial = await calculate_recommendations_shared(request, current_user_id)
+    except Overloaded as e:
+        stale = recent_recommendations(request, current_user_id)
+        if stale is None:
+            print(f"AVISO: Recomendação em tempo real recusada para o usuário {current_user_id} ({e.status_code}).")
+            raise e.to_http_exception()
+        print(f"AVISO: Sobrecarga; servindo o último resultado do usuário {current_user_id}.")
+        response.headers["X-Partial-Result"] = "stale"
+        return stale
+    except (DeadlineExceeded, asyncio.TimeoutError) as e:
+        # Prazo da requisição ou espera pelo cálculo compartilhado esgotados
+        stale = recent_recommendations(request, current_user_id)
+        if stale is None:
+            if isinstance(e, DeadlineExceeded):
+                raise
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Recommendations are taking too long, try again later.",
+                headers={"Retry-After": str(settings.SINGLE_FLIGHT_RETRY_AFTER_SECONDS)}
+            )
+        print(f"AVISO: Prazo esgotado; servindo o último resultado do usuário {current_user_id}.")
+        response.headers["X-Partial-Result"] = "stale"
+        return stale
+    if partial:
+        response.headers["X-Partial-Result"] = "partial"
+    return recommendations
 
-    if not day_offsets:
+
+def rank_best_slots(store: dict, surf_level: str, start_column: int, hours: int, limit: int, distinct_spots: bool) -> List[dict]:
+    """
+    Seleciona, na fatia de horas [start_column, start_column + hours) das matrizes de score
+    do nível, os `limit` melhores slots (spot, hora) em uma única passada vetorizada.
+    Com distinct_spots, considera apenas a melhor hora de cada spot.
+    """
+    window = store["window"]
+    columns = slice(max(start_column, 0), min(start_column + hours, window["n_hours"]))
+    scores = {name: matrix[:, columns] for name, matrix in store["levels"][surf_level].items()}
+
+    overall = np.where(np.isnan(scores["overall_score"]), -np.inf, scores["overall_score"])
+    if overall.size == 0:
         return []
+    if distinct_spots:
+        rows = np.arange(overall.shape[0])
+        cols = overall.argmax(axis=1)
+    else:
+        rows, cols = np.divmod(np.arange(overall.size), overall.shape[1])
+    candidate_scores = overall[rows, cols]
+
+    k = min(limit, candidate_scores.size)
+    top = np.argpartition(-candidate_scores, k - 1)[:k]
+    top = top[np.argsort(-candidate_scores[top], kind="stable")]
+    top = top[np.isfinite(candidate_scores[top])]
+
+    slots = []
+    for row, column in zip(rows[top].tolist(), cols[top].tolist()):
+        window_column = columns.start + int(column)
+        slots.append({
+            "spot_id": int(window["spot_ids"][row]),
+            "spot_name": window["spots"][row]["name"],
+            "timestamp_utc": forecast_window.column_timestamp(window, window_column),
+            "overall_score": float(scores["overall_score"][row, column]),
+            "detailed_scores": {name: float(scores[name][row, column]) for name in score_store.DETAILED_SCORE_NAMES},
+            "forecast_conditions": forecast_window.forecast_conditions_at(window, row, window_column),
+        })
+    return slots
+
+
+@router.get("/best", response_model=List[HourlyRecommendation])
+async def get_best_slots(
+    hours: int = Query(6, ge=1, le=168),
+    level: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=100),
+    distinct_spots: bool = False,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """
+    Melhores slots (spot, hora) entre todos os spots nas próximas `hours` horas, a partir da
+    hora atual. Usa as preferências do pico por nível (ou genéricas) do nível informado ou,
+    se omitido, do nível do perfil do usuário.
+    """
+    if level is None:
+        context = await user_context.get_user_context(current_user_id)
+        if context is None: raise HTTPException(status_code=404, detail="User profile not found")
+        level = context['surf_level']
+    if level not in SURF_LEVELS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid level. Use one of: {', '.join(SURF_LEVELS)}.")
+
+    store = await score_store.get_score_store()
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return rank_best_slots(store, level, forecast_window.hour_column(store["window"], now), hours, limit, distinct_spots)
+
+
+@router.get("/stream")
+async def stream_recommendations(
+    preset_id: Optional[int] = None,
+    spot_ids: Optional[List[int]] = Query(None),
+    day_type: str = "offsets",
+    day_values: List[int] = Query([0]),
+    start: datetime.time = datetime.time(0, 0),
+    end: datetime.time = datetime.time(23, 59, 59),
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """
+    Stream (Server-Sent Events) das recomendações de um preset ou de um conjunto de spots.
+    Envia o ranking atual ao conectar e um novo evento só quando as previsões dos spots
+    ou as preferências do usuário mudarem (via LISTEN/NOTIFY do Postgres). Assinantes
+    com as mesmas entradas compartilham um único recálculo.
+    """
+    if preset_id is not None:
+        presets = await queries.get_presets_by_user_id(current_user_id)
+        preset = next((p for p in presets if p['preset_id'] == preset_id), None)
+        if not preset:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Preset not found.")
+        request = RecommendationRequest(
+            spot_ids=preset['spot_ids'],
+            day_selection=DaySelection(type=preset['day_selection_type'], values=preset['day_selection_values']),
+            time_window=TimeWindow(start=preset['start_time'], end=preset['end_time'])
+        )
+    elif spot_ids:
+        request = RecommendationRequest(
+            spot_ids=spot_ids,
+            day_selection=DaySelection(type=day_type, values=day_values),
+            time_window=TimeWindow(start=start, end=end)
+        )
+    else:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Provide a preset_id or spot_ids.")
+
+    async def compute() -> str:
+        recommendations, _ = await calculate_recommendations_shared(request, current_user_id)
+        return _recommendations_adapter.dump_json(recommendations).decode()
+
+    topic_key = (
+        current_user_id,
+        tuple(sorted(set(request.spot_ids))),
+        request.day_selection.type,
+        tuple(sorted(set(request.day_selection.values))),
+        request.time_window.start,
+        request.time_window.end,
+    )
+    queue = recommendation_stream.subscribe(topic_key, current_user_id, frozenset(request.spot_ids), compute)
+
+    async def event_stream():
+        try:
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), timeout=settings.RECOMMENDATION_STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event}\ndata: {data}\n\n"
+        finally:
+            recommendation_stream.unsubscribe(topic_key, queue)
 
-    return await calculate_recommendations_realtime(request, current_user_id, day_offsets)
\ No newline at end of file
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
\ No newline at end of file
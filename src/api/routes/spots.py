@@ -1,13 +1,23 @@
+import re
+import time
 from fastapi import APIRouter, HTTPException
-from typing import List
+from typing import Hashable, List
 from src.core.schemas import Spot  # Importa o schema que criamos
 from src.db import queries         # Importa nosso módulo de queries
+from src.services import data_versions
 
 router = APIRouter(
     prefix="/spots",
     tags=["Spots"]
 )
 
+def catalog_cache_version(match: re.Match) -> Hashable:
+    """
+    Versão da resposta de /spots para o cache do CompressionMiddleware. O minuto limita o
+    tempo de uma resposta desatualizada se uma notificação se perder.
+    """
+    return (data_versions.catalog_version(), int(time.time() // 60))
+
 @router.get("/", response_model=List[Spot])
 async def get_all_spots_endpoint():
     """
@@ -18,4 +28,4 @@ async def get_all_spots_endpoint():
         # Se não houver spots, podemos retornar uma lista vazia ou um erro.
         # Por enquanto, uma lista vazia está ótimo.
         return []
-    return spots
\ No newline at end of file
+    return spots
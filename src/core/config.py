@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -9,6 +10,81 @@ class Settings(BaseSettings):
     SUPABASE_URL: str
     SUPABASE_JWT_SECRET: str
 
+    # Pool de conexões
+    DB_POOL_MIN_SIZE: int = 1
+    DB_POOL_MAX_SIZE: int = 10
+    DB_POOL_RESERVED_CONNECTIONS: int = 3  # reservadas para as rotas leves
+    DB_ACQUIRE_TIMEOUT_SECONDS: float = 10.0
+    DB_STATEMENT_TIMEOUT_MS: int = 30000  # statement_timeout das conexões do pool (0 = sem limite)
+
+    # Warm-up executado no startup (pool, prepared statements, catálogo de spots e scoring)
+    WARMUP_ENABLED: bool = True
+    WARMUP_POOL_SIZE: Optional[int] = None  # None = preenche o pool até DB_POOL_MAX_SIZE
+    WARMUP_TIMEOUT_SECONDS: float = 30.0
+    WARMUP_RETRY_INITIAL_SECONDS: float = 1.0  # backoff entre tentativas após uma falha (dobra a cada uma)
+    WARMUP_RETRY_MAX_SECONDS: float = 60.0
+
+    # Compressão de respostas
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_CACHE_MAX_ENTRIES: int = 512
+
+    # Controle de admissão do cálculo de recomendações em tempo real
+    RECOMMENDATIONS_MAX_CONCURRENCY: Optional[int] = None  # None = derivado da capacidade do pool
+    RECOMMENDATIONS_MAX_QUEUE: int = 20
+    RECOMMENDATIONS_QUEUE_TIMEOUT_SECONDS: float = 2.0
+    # Último resultado completo por cálculo, servido quando o prazo da requisição estoura
+    RECOMMENDATIONS_RECENT_RESULTS_MAX_ENTRIES: int = 1024
+    RECOMMENDATIONS_STALE_MAX_AGE_SECONDS: float = 900.0
+
+    # Orçamento de tempo por requisição (propagado à espera por conexão e às queries)
+    REQUEST_DEADLINE_SECONDS: float = 10.0
+    REQUEST_DEADLINE_GRACE_SECONDS: float = 1.0  # folga antes de cancelar o handler e responder 504
+
+    # Coalescência de leituras idênticas em andamento
+    SINGLE_FLIGHT_TIMEOUT_SECONDS: float = 15.0
+    SINGLE_FLIGHT_RETRY_AFTER_SECONDS: int = 5  # Retry-After do 503 quando a espera esgota
+
+    # Stream (SSE) de atualizações de recomendações
+    RECOMMENDATION_STREAM_DEBOUNCE_SECONDS: float = 1.0
+    RECOMMENDATION_STREAM_REFRESH_SECONDS: float = 600.0
+    RECOMMENDATION_STREAM_KEEPALIVE_SECONDS: float = 15.0
+    RECOMMENDATION_STREAM_RETRY_INITIAL_SECONDS: float = 1.0  # backoff após um recálculo com erro (dobra a cada falha)
+    RECOMMENDATION_STREAM_RETRY_MAX_SECONDS: float = 60.0
+
+    # Cache do contexto do usuário (perfil e preferências customizadas), invalidado nas escritas
+    USER_CONTEXT_TTL_SECONDS: float = 60.0
+    USER_CONTEXT_MAX_ENTRIES: int = 10000
+
+    # Janela de previsões de todos os spots mantida em memória (ranking /recommendations/best)
+    FORECAST_WINDOW_DAYS: int = 8  # dias à frente, além de ontem e hoje
+    FORECAST_WINDOW_TTL_SECONDS: float = 300.0  # intervalo entre buscas de mudanças (além do NOTIFY)
+    FORECAST_WINDOW_FULL_RELOAD_SECONDS: float = 3600.0  # recarga completa (spots e preferências por nível)
+    FORECAST_DELTA_OVERLAP_SECONDS: float = 120.0  # margem da marca d'água: maior atraso tolerado entre a escrita de uma linha e o COMMIT
+    FORECAST_REFRESH_DEBOUNCE_SECONDS: float = 2.0
+
+    # Alertas de score (avaliados após cada atualização das previsões)
+    ALERT_MAX_SUBSCRIPTIONS_PER_USER: int = 100
+    ALERT_OUTBOX_RETENTION_HOURS: float = 48.0  # alertas cuja hora já passou há mais tempo são removidos
+
+    # Migrações do schema (src/db/migrations), aplicadas no startup
+    MIGRATIONS_ENABLED: bool = True
+    MIGRATIONS_STARTUP_MAX_TABLE_MB: int = 256  # acima disso, migrações que reescrevem a tabela ficam para `python -m src.db.migrate`
+
+    # Partições mensais da tabela forecasts: criação antecipada e retenção
+    FORECAST_PARTITION_MONTHS_AHEAD: int = 2
+    FORECAST_RETENTION_DAYS: int = 90
+    FORECAST_RETENTION_MODE: str = "archive"  # "archive" (move para forecasts_archive) ou "drop"; outro valor interrompe a manutenção
+    FORECAST_PARTITION_MAINTENANCE_INTERVAL_SECONDS: float = 21600.0
+
+    # Token dos endpoints administrativos (/admin); vazio = desativados
+    ADMIN_TOKEN: str = ""
+
+    # Profiler por amostragem (opt-in)
+    PROFILING_ENABLED: bool = False
+    PROFILING_SAMPLE_RATE: float = 0.0
+    PROFILING_INTERVAL_SECONDS: float = 0.005
+    PROFILING_MAX_STORED: int = 50
+
     class Config:
         env_file = ".env"
         env_file_encoding = 'utf-8'
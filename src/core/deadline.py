@@ -0,0 +1,103 @@
+# File: src/core/deadline.py
+
+import asyncio
+import contextvars
+import time
+from typing import Awaitable, Optional, Union
+
+from src.core.config import settings
+
+# Prazo (time.monotonic) da requisição atual, definido pelo DeadlineMiddleware. As tasks
+# criadas durante a requisição herdam o prazo; fora de uma requisição (tarefas em segundo
+# plano) não há prazo. Execuções compartilhadas entre requisições não herdam o prazo de
+# quem as iniciou: rodam com um SharedDeadline (SingleFlight) ou sem prazo (detached).
+_deadline: contextvars.ContextVar[Union[None, float, "SharedDeadline"]] = contextvars.ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """O orçamento de tempo da requisição acabou."""
+
+
+class SharedDeadline:
+    """
+    Prazo de uma execução compartilhada: o mais longo entre os prazos de quem a espera, ou
+    nenhum se algum deles não tiver prazo. Cresce quando chega alguém com prazo mais longo.
+    """
+
+    def __init__(self):
+        self._at: Optional[float] = None
+        self._unbounded = False
+
+    def join(self, at: Optional[float]) -> None:
+        if at is None:
+            self._unbounded = True
+        elif self._at is None or at > self._at:
+            self._at = at
+
+    @property
+    def at(self) -> Optional[float]:
+        return None if self._unbounded else self._at
+
+
+def start(seconds: float) -> contextvars.Token:
+    """Define o prazo da requisição atual; devolve o token para reset()."""
+    return _deadline.set(time.monotonic() + seconds)
+
+
+def reset(token: contextvars.Token) -> None:
+    _deadline.reset(token)
+
+
+def current() -> Optional[float]:
+    """Prazo (time.monotonic) do contexto atual, ou None se não há prazo."""
+    deadline = _deadline.get()
+    return deadline.at if isinstance(deadline, SharedDeadline) else deadline
+
+
+def remaining() -> Optional[float]:
+    """Segundos restantes do orçamento (None se não há prazo)."""
+    deadline = current()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def timeout(default: Optional[float] = None) -> Optional[float]:
+    """
+    Timeout para uma operação: o menor entre `default` e o que resta do orçamento.
+    Levanta DeadlineExceeded se o orçamento já acabou.
+    """
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded()
+    return left if default is None else min(default, left)
+
+
+def wait_timeout(default: Optional[float] = None) -> Optional[float]:
+    """
+    Timeout para esperar uma execução compartilhada: como timeout(), mais metade da folga
+    do middleware (REQUEST_DEADLINE_GRACE_SECONDS), para que uma execução com o mesmo prazo
+    tenha tempo de entregar o resultado parcial.
+    """
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded()
+    left += settings.REQUEST_DEADLINE_GRACE_SECONDS / 2
+    return left if default is None else min(default, left)
+
+
+def detached(coro: Awaitable, deadline: Optional[SharedDeadline] = None) -> asyncio.Future:
+    """
+    Agenda `coro` em uma task que não herda o prazo da requisição atual: roda com o
+    `deadline` compartilhado informado ou sem prazo (os demais contextvars são herdados).
+    """
+    context = contextvars.copy_context()
+    context.run(_deadline.set, deadline)
+    return context.run(asyncio.ensure_future, coro)
@@ -1,6 +1,6 @@
 import datetime
 from pydantic import BaseModel, EmailStr
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 class Spot(BaseModel):
     spot_id: int
@@ -93,6 +93,16 @@ class Preference(BaseModel):
     class Config:
         from_attributes = True
 
+class ResolvedPreference(Preference):
+    # Origem de cada campo: 'user', 'spot' ou 'generic'
+    sources: Dict[str, str]
+
+class PreferenceBulkItem(PreferenceUpdate):
+    spot_id: int
+
+class PreferenceBulkUpdate(BaseModel):
+    items: List[PreferenceBulkItem]
+
 
 class ForecastConditions(BaseModel):
     wave_height_sg: Optional[float] = None
@@ -126,6 +136,57 @@ class SpotForecastResponse(BaseModel):
     spot_name: str
     forecasts: List[HourlyData]
 
+class DailyBestHour(BaseModel):
+    timestamp_utc: datetime.datetime
+    overall_score: float
+
+class DailyForecastSummary(BaseModel):
+    local_date: datetime.date
+    hours: int
+    swell_height_min: Optional[float] = None
+    swell_height_max: Optional[float] = None
+    swell_height_mean: Optional[float] = None
+    swell_period_min: Optional[float] = None
+    swell_period_max: Optional[float] = None
+    swell_period_mean: Optional[float] = None
+    wind_speed_min: Optional[float] = None
+    wind_speed_max: Optional[float] = None
+    wind_speed_mean: Optional[float] = None
+    sea_level_min: Optional[float] = None
+    sea_level_max: Optional[float] = None
+    sea_level_mean: Optional[float] = None
+    best_hours: Dict[str, DailyBestHour] = {}  # melhor hora por nível de surf
+
+class SpotDailyForecastResponse(BaseModel):
+    spot_id: int
+    spot_name: str
+    days: List[DailyForecastSummary]
+
+class AlertSubscriptionCreate(BaseModel):
+    spot_id: int
+    min_score: float
+    surf_level: Optional[str] = None  # padrão: o nível do perfil
+
+class AlertSubscription(BaseModel):
+    subscription_id: int
+    user_id: str
+    spot_id: int
+    surf_level: str
+    min_score: float
+    created_at: datetime.datetime
+
+class Alert(BaseModel):
+    alert_id: int
+    subscription_id: int
+    spot_id: int
+    spot_name: str
+    surf_level: str
+    local_date: datetime.date
+    timestamp_utc: datetime.datetime  # melhor hora do dia
+    overall_score: float
+    min_score: float
+    created_at: datetime.datetime
+
 
 class DaySelection(BaseModel):
     type: str
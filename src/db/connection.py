@@ -1,8 +1,40 @@
+import asyncio
 import asyncpg
+from src.core import deadline
 from src.core.config import settings
 
 _pool = None
 
+
+class DeadlineConnection(asyncpg.Connection):
+    """
+    Conexão que limita o timeout de cada leitura (fetch, fetchrow, fetchval) ao que resta
+    do orçamento da requisição (src/core/deadline.py). Quando o prazo estoura, o asyncpg
+    cancela a query no servidor e a chamada levanta DeadlineExceeded.
+
+    execute/executemany ficam de fora: o próprio asyncpg os usa para COMMIT/ROLLBACK e para
+    o reset da conexão ao devolvê-la ao pool, que precisam rodar mesmo com o prazo esgotado.
+    Escritas continuam limitadas pelo statement_timeout e pelo cancelamento da requisição.
+    """
+
+    async def _with_deadline(self, method, *args, timeout=None, **kwargs):
+        try:
+            return await method(*args, timeout=deadline.timeout(timeout), **kwargs)
+        except asyncio.TimeoutError as e:
+            if deadline.expired():
+                raise deadline.DeadlineExceeded() from e
+            raise
+
+    async def fetch(self, query, *args, timeout=None, **kwargs):
+        return await self._with_deadline(super().fetch, query, *args, timeout=timeout, **kwargs)
+
+    async def fetchrow(self, query, *args, timeout=None, **kwargs):
+        return await self._with_deadline(super().fetchrow, query, *args, timeout=timeout, **kwargs)
+
+    async def fetchval(self, query, *args, timeout=None, **kwargs):
+        return await self._with_deadline(super().fetchval, query, *args, timeout=timeout, **kwargs)
+
+
 async def get_db_pool():
     """
     Inicializa e retorna o pool de conexões.
@@ -16,8 +48,11 @@ async def get_db_pool():
             host=settings.DB_HOST,
             port=settings.DB_PORT,
             database=settings.DB_NAME,
-            min_size=1,
-            max_size=10
+            min_size=settings.DB_POOL_MIN_SIZE,
+            max_size=settings.DB_POOL_MAX_SIZE,
+            connection_class=DeadlineConnection,
+            # Limite no servidor para qualquer statement, inclusive fora de requisições
+            server_settings={"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}
         )
         print("Pool de conexões criado com sucesso.")
     return _pool
@@ -34,10 +69,16 @@ async def close_db_pool():
 
 async def get_connection():
     """
-    Adquire uma conexão do pool para executar uma query.
+    Adquire uma conexão do pool para executar uma query, esperando no máximo
+    DB_ACQUIRE_TIMEOUT_SECONDS (ou o que resta do orçamento da requisição).
     """
     pool = await get_db_pool()
-    return await pool.acquire()
+    try:
+        return await pool.acquire(timeout=deadline.timeout(settings.DB_ACQUIRE_TIMEOUT_SECONDS))
+    except asyncio.TimeoutError as e:
+        if deadline.expired():
+            raise deadline.DeadlineExceeded() from e
+        raise
 
 async def release_connection(conn):
     """
@@ -0,0 +1,92 @@
+# File: src/db/migrate.py
+
+import asyncio
+import re
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from src.db.connection import get_connection, release_connection, close_db_pool
+
+# Migrações SQL aplicadas em ordem pelo nome do arquivo (NNNN_descricao.sql), cada uma em
+# sua própria transação, e registradas em schema_migrations. Um advisory lock garante que
+# só uma instância aplique migrações por vez.
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+MIGRATIONS_LOCK_ID = 7310420001
+# Migrações que copiam uma tabela inteira declaram no cabeçalho: "-- reescreve: public.tabela"
+_REWRITES = re.compile(r"^-- reescreve: (\S+)$", re.MULTILINE)
+
+SQL_CREATE_SCHEMA_MIGRATIONS = """
+    CREATE TABLE IF NOT EXISTS public.schema_migrations (
+        version TEXT PRIMARY KEY,
+        applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+"""
+
+def load_migrations() -> List[Tuple[str, str]]:
+    """Retorna (versão, SQL) de cada arquivo de migração, em ordem."""
+    return [(path.stem, path.read_text(encoding="utf-8")) for path in sorted(MIGRATIONS_DIR.glob("*.sql"))]
+
+async def _rewrite_too_large(conn, sql: str, max_table_mb: Optional[int]) -> Optional[str]:
+    """Tabela reescrita pela migração, se ela passar de max_table_mb (None = sem limite)."""
+    if max_table_mb is None:
+        return None
+    for table in _REWRITES.findall(sql):
+        size = await conn.fetchval("SELECT pg_total_relation_size(to_regclass($1))", table)
+        if size is not None and size > max_table_mb * 1024 * 1024:
+            return table
+    return None
+
+async def apply_migrations(conn, max_table_mb: Optional[int] = None) -> List[str]:
+    """
+    Aplica na conexão as migrações ainda não registradas e retorna as versões aplicadas.
+    Se uma migração falhar, a transação dela é desfeita e o erro é propagado.
+    Com max_table_mb, para antes de uma migração que reescreve uma tabela maior que isso
+    (ela e as seguintes ficam pendentes, para rodar com `python -m src.db.migrate`).
+    """
+    await conn.execute("SELECT pg_advisory_lock($1)", MIGRATIONS_LOCK_ID)
+    try:
+        # Migrações podem copiar tabelas inteiras: sem o statement_timeout do pool nesta sessão
+        # (o pool volta ao padrão com RESET ALL ao receber a conexão de volta)
+        await conn.execute("SET statement_timeout = 0")
+        await conn.execute(SQL_CREATE_SCHEMA_MIGRATIONS)
+        applied = {row['version'] for row in await conn.fetch("SELECT version FROM public.schema_migrations")}
+        newly_applied = []
+        for version, sql in load_migrations():
+            if version in applied:
+                continue
+            table = await _rewrite_too_large(conn, sql, max_table_mb)
+            if table is not None:
+                print(
+                    f"AVISO: Migração {version} reescreve {table}, maior que {max_table_mb} MB; ela e as seguintes "
+                    f"não foram aplicadas. Rode `python -m src.db.migrate` fora do startup."
+                )
+                break
+            async with conn.transaction():
+                await conn.execute(sql)
+                await conn.execute("INSERT INTO public.schema_migrations (version) VALUES ($1)", version)
+            print(f"INFO: Migração {version} aplicada.")
+            newly_applied.append(version)
+        return newly_applied
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATIONS_LOCK_ID)
+
+async def run_migrations(max_table_mb: Optional[int] = None) -> List[str]:
+    """Aplica as migrações pendentes usando uma conexão do pool."""
+    conn = await get_connection()
+    try:
+        applied = await apply_migrations(conn, max_table_mb)
+        if not applied:
+            print("INFO: Schema do banco já está atualizado.")
+        return applied
+    finally:
+        await release_connection(conn)
+
+async def _main() -> None:
+    try:
+        await run_migrations()
+    finally:
+        await close_db_pool()
+
+if __name__ == "__main__":
+    # Uso: python -m src.db.migrate
+    asyncio.run(_main())
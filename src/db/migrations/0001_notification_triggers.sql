@@ -0,0 +1,37 @@
+-- Notificações (LISTEN/NOTIFY) usadas pelo stream de recomendações e pelos caches em memória.
+-- Ver documentation/database.md.
+
+CREATE OR REPLACE FUNCTION public.notify_forecast_update() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('forecast_updates', NEW.spot_id::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS forecasts_notify_update ON public.forecasts;
+CREATE TRIGGER forecasts_notify_update
+    AFTER INSERT OR UPDATE ON public.forecasts
+    FOR EACH ROW EXECUTE FUNCTION public.notify_forecast_update();
+
+CREATE OR REPLACE FUNCTION public.notify_preference_update() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'profiles' THEN
+        PERFORM pg_notify('preference_updates', NEW.id::text);
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('preference_updates', OLD.user_id::text);
+    ELSE
+        PERFORM pg_notify('preference_updates', NEW.user_id::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS user_spot_preferences_notify_update ON public.user_spot_preferences;
+CREATE TRIGGER user_spot_preferences_notify_update
+    AFTER INSERT OR UPDATE OR DELETE ON public.user_spot_preferences
+    FOR EACH ROW EXECUTE FUNCTION public.notify_preference_update();
+
+DROP TRIGGER IF EXISTS profiles_notify_surf_level_update ON public.profiles;
+CREATE TRIGGER profiles_notify_surf_level_update
+    AFTER UPDATE OF surf_level ON public.profiles
+    FOR EACH ROW EXECUTE FUNCTION public.notify_preference_update();
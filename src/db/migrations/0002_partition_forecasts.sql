@@ -0,0 +1,108 @@
+-- Particiona public.forecasts por mês de timestamp_utc (partições forecasts_pYYYYMM, em UTC).
+-- As consultas continuam iguais: o filtro por timestamp_utc descarta as partições fora do intervalo.
+-- A tabela original é copiada e removida dentro da transação da migração.
+-- Permissões e políticas de RLS da tabela original devem ser reaplicadas na nova tabela.
+-- Com uma tabela grande, a cópia é longa: rode antes do deploy com `python -m src.db.migrate`
+-- (no startup, a API não aplica a migração acima de MIGRATIONS_STARTUP_MAX_TABLE_MB).
+-- reescreve: public.forecasts
+
+CREATE SCHEMA IF NOT EXISTS forecasts_archive;
+
+CREATE OR REPLACE FUNCTION public.create_forecast_partition(month date) RETURNS text AS $$
+DECLARE
+    month_start timestamptz := (date_trunc('month', month)::timestamp AT TIME ZONE 'UTC');
+    month_end timestamptz := ((date_trunc('month', month) + interval '1 month')::timestamp AT TIME ZONE 'UTC');
+    partition_name text := 'forecasts_p' || to_char(date_trunc('month', month), 'YYYYMM');
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS public.%I PARTITION OF public.forecasts FOR VALUES FROM (%L) TO (%L)',
+        partition_name, month_start, month_end
+    );
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    forecast_id_seq text := pg_get_serial_sequence('public.forecasts', 'forecast_id');
+    index_name text;
+    first_month date;
+    last_month date;
+BEGIN
+    -- Libera os nomes dos índices/constraints e a sequence para a nova tabela
+    ALTER TABLE public.forecasts RENAME TO forecasts_unpartitioned;
+    FOR index_name IN
+        SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = 'public.forecasts_unpartitioned'::regclass
+    LOOP
+        EXECUTE format('ALTER INDEX public.%I RENAME TO %I', index_name, left(index_name, 55) || '_unpart');
+    END LOOP;
+    EXECUTE format('ALTER SEQUENCE %s OWNED BY NONE', forecast_id_seq);
+
+    CREATE TABLE public.forecasts (
+        forecast_id INTEGER NOT NULL,
+        spot_id INTEGER NOT NULL CONSTRAINT forecasts_spot_id_fkey REFERENCES public.spots(spot_id) ON DELETE CASCADE,
+        timestamp_utc TIMESTAMPTZ NOT NULL,
+        wave_height_sg NUMERIC(5, 2),
+        wave_direction_sg NUMERIC(6, 2),
+        wave_period_sg NUMERIC(5, 2),
+        swell_height_sg NUMERIC(5, 2),
+        swell_direction_sg NUMERIC(6, 2),
+        swell_period_sg NUMERIC(5, 2),
+        secondary_swell_height_sg NUMERIC(5, 2),
+        secondary_swell_direction_sg NUMERIC(6, 2),
+        secondary_swell_period_sg NUMERIC(5, 2),
+        wind_speed_sg NUMERIC(5, 2),
+        wind_direction_sg NUMERIC(6, 2),
+        water_temperature_sg NUMERIC(5, 2),
+        air_temperature_sg NUMERIC(5, 2),
+        current_speed_sg NUMERIC(5, 2),
+        current_direction_sg NUMERIC(6, 2),
+        sea_level_sg NUMERIC(5, 2),
+        tide_type VARCHAR(10),
+        last_modified_at TIMESTAMPTZ DEFAULT now(),
+        PRIMARY KEY (forecast_id, timestamp_utc),
+        UNIQUE (spot_id, timestamp_utc)
+    ) PARTITION BY RANGE (timestamp_utc);
+    EXECUTE format('ALTER TABLE public.forecasts ALTER COLUMN forecast_id SET DEFAULT nextval(%L::regclass)', forecast_id_seq);
+    EXECUTE format('ALTER SEQUENCE %s OWNED BY public.forecasts.forecast_id', forecast_id_seq);
+
+    -- Partições para os dados existentes e para os próximos meses
+    SELECT date_trunc('month', min(timestamp_utc) AT TIME ZONE 'UTC')::date,
+           date_trunc('month', greatest(max(timestamp_utc), now()) AT TIME ZONE 'UTC')::date
+    INTO first_month, last_month
+    FROM public.forecasts_unpartitioned;
+    first_month := coalesce(first_month, date_trunc('month', now() AT TIME ZONE 'UTC')::date);
+    last_month := greatest(coalesce(last_month, first_month), date_trunc('month', now() AT TIME ZONE 'UTC')::date) + interval '2 months';
+    WHILE first_month <= last_month LOOP
+        PERFORM public.create_forecast_partition(first_month);
+        first_month := first_month + interval '1 month';
+    END LOOP;
+
+    INSERT INTO public.forecasts (
+        forecast_id, spot_id, timestamp_utc,
+        wave_height_sg, wave_direction_sg, wave_period_sg,
+        swell_height_sg, swell_direction_sg, swell_period_sg,
+        secondary_swell_height_sg, secondary_swell_direction_sg, secondary_swell_period_sg,
+        wind_speed_sg, wind_direction_sg, water_temperature_sg, air_temperature_sg,
+        current_speed_sg, current_direction_sg, sea_level_sg, tide_type, last_modified_at
+    )
+    SELECT
+        forecast_id, spot_id, timestamp_utc,
+        wave_height_sg, wave_direction_sg, wave_period_sg,
+        swell_height_sg, swell_direction_sg, swell_period_sg,
+        secondary_swell_height_sg, secondary_swell_direction_sg, secondary_swell_period_sg,
+        wind_speed_sg, wind_direction_sg, water_temperature_sg, air_temperature_sg,
+        current_speed_sg, current_direction_sg, sea_level_sg, tide_type, last_modified_at
+    FROM public.forecasts_unpartitioned;
+
+    DROP TABLE public.forecasts_unpartitioned;
+END;
+$$;
+
+-- O trigger de notificação era da tabela antiga; em uma tabela particionada ele vale para todas as partições
+CREATE TRIGGER forecasts_notify_update
+    AFTER INSERT OR UPDATE ON public.forecasts
+    FOR EACH ROW EXECUTE FUNCTION public.notify_forecast_update();
+
+ANALYZE public.forecasts;
@@ -0,0 +1,16 @@
+-- Rastreamento de mudanças em forecasts para o recálculo incremental de scores:
+-- last_modified_at passa a ser atualizado em todo UPDATE, e um índice atende a busca
+-- das linhas alteradas desde a última leitura (last_modified_at > marca d'água).
+
+CREATE OR REPLACE FUNCTION public.touch_forecast_last_modified() RETURNS trigger AS $$
+BEGIN
+    NEW.last_modified_at := now();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER forecasts_touch_last_modified
+    BEFORE UPDATE ON public.forecasts
+    FOR EACH ROW EXECUTE FUNCTION public.touch_forecast_last_modified();
+
+CREATE INDEX IF NOT EXISTS forecasts_last_modified_at_idx ON public.forecasts (last_modified_at);
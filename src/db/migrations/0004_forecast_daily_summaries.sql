@@ -0,0 +1,24 @@
+-- Resumo diário das previsões por spot (dia local, no fuso do spot), usado pelas visões de
+-- calendário. Mantido pela API após cada ingestão: só os dias com células alteradas são
+-- reescritos. best_hours traz a melhor hora de cada nível: {"pro": {"timestamp_utc", "overall_score"}, ...}.
+
+CREATE TABLE IF NOT EXISTS public.forecast_daily_summaries (
+    spot_id INTEGER NOT NULL REFERENCES public.spots(spot_id) ON DELETE CASCADE,
+    local_date DATE NOT NULL,
+    hours INTEGER NOT NULL,
+    swell_height_min NUMERIC(5, 2),
+    swell_height_max NUMERIC(5, 2),
+    swell_height_mean NUMERIC(5, 2),
+    swell_period_min NUMERIC(5, 2),
+    swell_period_max NUMERIC(5, 2),
+    swell_period_mean NUMERIC(5, 2),
+    wind_speed_min NUMERIC(5, 2),
+    wind_speed_max NUMERIC(5, 2),
+    wind_speed_mean NUMERIC(5, 2),
+    sea_level_min NUMERIC(5, 2),
+    sea_level_max NUMERIC(5, 2),
+    sea_level_mean NUMERIC(5, 2),
+    best_hours JSONB NOT NULL DEFAULT '{}',
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (spot_id, local_date)
+);
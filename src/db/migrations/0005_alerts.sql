@@ -0,0 +1,34 @@
+-- Alertas de score: o usuário assina (spot, nível, score mínimo) e, depois de cada ingestão
+-- de previsões, a API grava em alert_outbox um alerta por assinatura e dia local em que a
+-- melhor hora (ainda por vir) atinge o score mínimo. O outbox é consumido por
+-- POST /alerts/outbox/consume; UNIQUE (subscription_id, local_date) evita alertas repetidos.
+
+CREATE TABLE IF NOT EXISTS public.alert_subscriptions (
+    subscription_id BIGSERIAL PRIMARY KEY,
+    user_id UUID NOT NULL REFERENCES public.profiles(id) ON DELETE CASCADE,
+    spot_id INTEGER NOT NULL REFERENCES public.spots(spot_id) ON DELETE CASCADE,
+    surf_level TEXT NOT NULL,
+    min_score NUMERIC(5, 2) NOT NULL CHECK (min_score >= 0 AND min_score <= 100),
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS alert_subscriptions_user_id_idx ON public.alert_subscriptions (user_id);
+
+CREATE TABLE IF NOT EXISTS public.alert_outbox (
+    alert_id BIGSERIAL PRIMARY KEY,
+    subscription_id BIGINT NOT NULL REFERENCES public.alert_subscriptions(subscription_id) ON DELETE CASCADE,
+    user_id UUID NOT NULL,
+    spot_id INTEGER NOT NULL,
+    surf_level TEXT NOT NULL,
+    local_date DATE NOT NULL,
+    timestamp_utc TIMESTAMPTZ NOT NULL,
+    overall_score NUMERIC(5, 2) NOT NULL,
+    min_score NUMERIC(5, 2) NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    consumed_at TIMESTAMPTZ,
+    UNIQUE (subscription_id, local_date)
+);
+
+-- Alertas pendentes de cada usuário, na ordem de criação
+CREATE INDEX IF NOT EXISTS alert_outbox_pending_idx ON public.alert_outbox (user_id, alert_id) WHERE consumed_at IS NULL;
+CREATE INDEX IF NOT EXISTS alert_outbox_timestamp_idx ON public.alert_outbox (timestamp_utc);
@@ -0,0 +1,14 @@
+-- last_modified_at passa a registrar o instante da escrita da linha (clock_timestamp())
+-- em vez do início da transação (now()). Com now(), uma ingestão longa gravava horários
+-- anteriores à marca d'água já lida pela API e as linhas podiam ficar de fora do recálculo
+-- incremental. Ainda resta o intervalo entre a escrita e o COMMIT, coberto pela margem
+-- FORECAST_DELTA_OVERLAP_SECONDS.
+
+CREATE OR REPLACE FUNCTION public.touch_forecast_last_modified() RETURNS trigger AS $$
+BEGIN
+    NEW.last_modified_at := clock_timestamp();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+ALTER TABLE public.forecasts ALTER COLUMN last_modified_at SET DEFAULT clock_timestamp();
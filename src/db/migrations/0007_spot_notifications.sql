@@ -0,0 +1,15 @@
+-- Notificação de mudanças na tabela spots, usada para invalidar as respostas de /spots e
+-- das previsões guardadas em cache pela API (ver documentation/database.md). O trigger é
+-- por comando: uma importação do catálogo gera uma única notificação.
+
+CREATE OR REPLACE FUNCTION public.notify_spot_update() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('spot_updates', '');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS spots_notify_update ON public.spots;
+CREATE TRIGGER spots_notify_update
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.spots
+    FOR EACH STATEMENT EXECUTE FUNCTION public.notify_spot_update();
@@ -0,0 +1,44 @@
+-- Partição DEFAULT de forecasts: sem ela, uma linha fora de todas as partições mensais (mês
+-- anterior à primeira partição, ou além das criadas pela manutenção) fazia a ingestão inteira
+-- falhar com "no partition of relation found for row". As linhas ficam em forecasts_default
+-- até a partição do mês ser criada.
+--
+-- Com a partição DEFAULT, criar uma partição mensal exige que a DEFAULT não tenha linhas
+-- daquele mês. create_forecast_partition passa a mover essas linhas para a partição nova
+-- (criada fora da tabela e anexada depois) em vez de falhar.
+
+CREATE TABLE IF NOT EXISTS public.forecasts_default PARTITION OF public.forecasts DEFAULT;
+
+CREATE OR REPLACE FUNCTION public.create_forecast_partition(month date) RETURNS text AS $$
+DECLARE
+    month_start timestamptz := (date_trunc('month', month)::timestamp AT TIME ZONE 'UTC');
+    month_end timestamptz := ((date_trunc('month', month) + interval '1 month')::timestamp AT TIME ZONE 'UTC');
+    partition_name text := 'forecasts_p' || to_char(date_trunc('month', month), 'YYYYMM');
+BEGIN
+    IF to_regclass(format('public.%I', partition_name)) IS NOT NULL THEN
+        RETURN partition_name;
+    END IF;
+    IF NOT EXISTS (
+        SELECT 1 FROM public.forecasts_default
+        WHERE timestamp_utc >= month_start AND timestamp_utc < month_end
+    ) THEN
+        EXECUTE format(
+            'CREATE TABLE public.%I PARTITION OF public.forecasts FOR VALUES FROM (%L) TO (%L)',
+            partition_name, month_start, month_end
+        );
+        RETURN partition_name;
+    END IF;
+
+    EXECUTE format('CREATE TABLE public.%I (LIKE public.forecasts INCLUDING DEFAULTS)', partition_name);
+    EXECUTE format(
+        'WITH moved AS (DELETE FROM public.forecasts_default WHERE timestamp_utc >= %L AND timestamp_utc < %L RETURNING *) '
+        'INSERT INTO public.%I SELECT * FROM moved',
+        month_start, month_end, partition_name
+    );
+    EXECUTE format(
+        'ALTER TABLE public.forecasts ATTACH PARTITION public.%I FOR VALUES FROM (%L) TO (%L)',
+        partition_name, month_start, month_end
+    );
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
@@ -1,7 +1,78 @@
 from src.db.connection import get_connection, release_connection
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import datetime
 import json
+import re
+
+# --- STATEMENTS QUENTES ---
+# Mantidos como constantes para que o warm-up possa prepará-los em cada conexão do pool
+# (o cache de prepared statements do asyncpg é indexado pelo texto exato da query).
+
+SQL_ALL_SPOTS = "SELECT * FROM spots ORDER BY name;"
+SQL_SPOT_BY_ID = "SELECT * FROM spots WHERE spot_id = $1"
+SQL_SPOTS_BY_IDS = "SELECT * FROM spots WHERE spot_id = ANY($1::int[])"
+SQL_PROFILE_BY_ID = "SELECT * FROM profiles WHERE id = $1"
+SQL_ACTIVE_USER_PREFERENCES = """
+    SELECT spot_id, to_jsonb(usp) AS prefs FROM user_spot_preferences usp
+    WHERE user_id = $1 AND is_active = TRUE;
+"""
+SQL_SPOT_LEVEL_PREFERENCES_FOR_SPOTS = """
+    SELECT spot_id, to_jsonb(slp) AS prefs FROM spot_level_preferences slp
+    WHERE spot_id = ANY($1::int[]) AND surf_level = $2;
+"""
+# Campos numéricos das condições de previsão, na ordem de ForecastConditions
+FORECAST_CONDITION_FIELDS = (
+    "wave_height_sg", "wave_direction_sg", "wave_period_sg",
+    "swell_height_sg", "swell_direction_sg", "swell_period_sg",
+    "secondary_swell_height_sg", "secondary_swell_direction_sg", "secondary_swell_period_sg",
+    "wind_speed_sg", "wind_direction_sg", "water_temperature_sg", "air_temperature_sg",
+    "current_speed_sg", "current_direction_sg", "sea_level_sg",
+)
+
+_FORECAST_NUMERIC_COLUMNS = ", ".join(f"{col}::float8" for col in FORECAST_CONDITION_FIELDS)
+
+# Colunas em ordem fixa (timestamp_utc, *FORECAST_CONDITION_FIELDS, tide_type), com os
+# NUMERIC já convertidos para float8, para a serialização direta dos records
+SQL_FORECASTS_FOR_SPOT = f"""
+    SELECT timestamp_utc, {_FORECAST_NUMERIC_COLUMNS}, tide_type
+    FROM forecasts
+    WHERE spot_id = $1 AND timestamp_utc BETWEEN $2 AND $3
+    ORDER BY timestamp_utc;
+"""
+SQL_FORECASTS_IN_WINDOWS = """
+    SELECT f.*, w.local_date
+    FROM unnest($1::int[], $2::timestamptz[], $3::timestamptz[], $4::date[])
+        AS w(spot_id, start_utc, end_utc, local_date)
+    JOIN forecasts f
+        ON f.spot_id = w.spot_id AND f.timestamp_utc BETWEEN w.start_utc AND w.end_utc
+    ORDER BY f.spot_id, f.timestamp_utc;
+"""
+SQL_CACHED_RECOMMENDATIONS = "SELECT recommendations_payload FROM user_recommendation_cache WHERE user_id = $1 AND cache_key = $2"
+
+_NIL_UUID = "00000000-0000-0000-0000-000000000000"
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+# (statement, argumentos inofensivos) usados para preparar cada statement em uma conexão
+HOT_STATEMENTS = [
+    (SQL_ALL_SPOTS, ()),
+    (SQL_SPOT_BY_ID, (-1,)),
+    (SQL_SPOTS_BY_IDS, ([],)),
+    (SQL_PROFILE_BY_ID, (_NIL_UUID,)),
+    (SQL_ACTIVE_USER_PREFERENCES, (_NIL_UUID,)),
+    (SQL_SPOT_LEVEL_PREFERENCES_FOR_SPOTS, ([], "")),
+    (SQL_FORECASTS_FOR_SPOT, (-1, _EPOCH, _EPOCH)),
+    (SQL_FORECASTS_IN_WINDOWS, ([], [], [], [])),
+    (SQL_CACHED_RECOMMENDATIONS, (_NIL_UUID, "")),
+]
+
+async def prepare_hot_statements(conn) -> None:
+    """
+    Executa cada statement quente com argumentos inofensivos, populando o cache de
+    prepared statements (e de codecs de tipos) da conexão.
+    """
+    for query, args in HOT_STATEMENTS:
+        await conn.fetch(query, *args)
+
 
 async def get_all_spots() -> List[Dict[str, Any]]:
     """
@@ -9,10 +80,10 @@ async def get_all_spots() -> List[Dict[str, Any]]:
     """
     conn = await get_connection()
     try:
-        rows = await conn.fetch("SELECT * FROM spots ORDER BY name;")
+        rows = await conn.fetch(SQL_ALL_SPOTS)
         return [dict(row) for row in rows]
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 async def get_spot_by_id(spot_id: int) -> Optional[Dict[str, Any]]:
     """
@@ -20,10 +91,21 @@ async def get_spot_by_id(spot_id: int) -> Optional[Dict[str, Any]]:
     """
     conn = await get_connection()
     try:
-        row = await conn.fetchrow("SELECT * FROM spots WHERE spot_id = $1", spot_id)
+        row = await conn.fetchrow(SQL_SPOT_BY_ID, spot_id)
         return dict(row) if row else None
     finally:
-        await conn.close()
+        await release_connection(conn)
+
+async def get_spots_by_ids(spot_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """
+    Busca os detalhes de vários spots de uma vez, indexados pelo spot_id.
+    """
+    conn = await get_connection()
+    try:
+        rows = await conn.fetch(SQL_SPOTS_BY_IDS, list(spot_ids))
+        return {row['spot_id']: dict(row) for row in rows}
+    finally:
+        await release_connection(conn)
 
 async def get_profile_by_id(user_id: str) -> Optional[Dict[str, Any]]:
     """
@@ -31,14 +113,14 @@ async def get_profile_by_id(user_id: str) -> Optional[Dict[str, Any]]:
     """
     conn = await get_connection()
     try:
-        row = await conn.fetchrow("SELECT * FROM profiles WHERE id = $1", user_id)
+        row = await conn.fetchrow(SQL_PROFILE_BY_ID, user_id)
         if row:
             profile_dict = dict(row)
             profile_dict['id'] = str(profile_dict['id'])
             return profile_dict
         return None
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 async def update_profile(user_id: str, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """
@@ -60,7 +142,7 @@ async def update_profile(user_id: str, updates: Dict[str, Any]) -> Optional[Dict
             return updated_profile
         return None
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 async def create_preset(user_id: str, preset_data: Dict[str, Any]) -> Dict[str, Any]:
     """Cria um novo preset para um usuário."""
@@ -82,7 +164,7 @@ async def create_preset(user_id: str, preset_data: Dict[str, Any]) -> Dict[str,
         new_preset['user_id'] = str(new_preset['user_id'])
         return new_preset
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 async def get_presets_by_user_id(user_id: str) -> List[Dict[str, Any]]:
     """Busca todos os presets de um usuário."""
@@ -95,7 +177,7 @@ async def get_presets_by_user_id(user_id: str) -> List[Dict[str, Any]]:
                 preset['user_id'] = str(preset['user_id'])
         return presets
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 async def update_preset(user_id: str, preset_id: int, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """Atualiza um preset existente."""
@@ -115,7 +197,7 @@ async def update_preset(user_id: str, preset_id: int, updates: Dict[str, Any]) -
             return updated_preset
         return None
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 async def delete_preset(user_id: str, preset_id: int) -> bool:
     conn = await get_connection()
@@ -123,26 +205,18 @@ async def delete_preset(user_id: str, preset_id: int) -> bool:
         result = await conn.execute("DELETE FROM presets WHERE preset_id = $1 AND user_id = $2", preset_id, user_id)
         return result.strip('DELETE ') == '1'
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 # --- NOVA HIERARQUIA DE PREFERÊNCIAS ---
 
-async def get_user_spot_preferences(user_id: str, spot_id: int) -> Optional[Dict[str, Any]]:
-    """NÍVEL 1: Busca as preferências customizadas e ativas de um usuário para um spot."""
+async def get_active_user_spot_preferences(user_id: str) -> Dict[int, Dict[str, Any]]:
+    """Busca todas as preferências customizadas e ativas de um usuário, indexadas por spot_id."""
     conn = await get_connection()
     try:
-        row = await conn.fetchrow(
-            "SELECT * FROM user_spot_preferences WHERE user_id = $1 AND spot_id = $2 AND is_active = TRUE",
-            user_id, spot_id
-        )
-        if not row:
-            return None
-        preferences = dict(row)
-        if 'user_id' in preferences and preferences['user_id'] is not None:
-            preferences['user_id'] = str(preferences['user_id'])
-        return preferences
+        rows = await conn.fetch(SQL_ACTIVE_USER_PREFERENCES, user_id)
+        return {row['spot_id']: json.loads(row['prefs']) for row in rows}
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 async def get_spot_level_preferences(spot_id: int, surf_level: str) -> Optional[Dict[str, Any]]:
     """NÍVEL 2: Busca as preferências padrão de um spot para um nível de surf."""
@@ -154,7 +228,7 @@ async def get_spot_level_preferences(spot_id: int, surf_level: str) -> Optional[
         )
         return dict(row) if row else None
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 async def get_generic_preferences_by_level(surf_level: str) -> Dict[str, Any]:
     """
@@ -184,54 +258,6 @@ async def get_generic_preferences_by_level(surf_level: str) -> Dict[str, Any]:
         "ideal_water_temperature": 22.0, "ideal_air_temperature": 25.0,
     }
 
-async def get_preferences_by_user_and_spot(user_id: str, spot_id: int) -> Dict[str, Any]:
-    """
-    Busca as preferências para um usuário e spot, garantindo valores para todos os campos.
-    A hierarquia é:
-    1. Preferências customizadas do usuário (user_spot_preferences)
-    2. Preferências do pico por nível (spot_level_preferences)
-    3. Preferências genéricas por nível (fallback)
-    """
-    user_profile = await get_profile_by_id(user_id)
-    surf_level = user_profile.get('surf_level', 'intermediario') if user_profile else 'intermediario'
-
-    # 1. Começa com as preferências genéricas como base
-    final_prefs = await get_generic_preferences_by_level(surf_level)
-
-    conn = await get_connection()
-    try:
-        # 2. Tenta sobrescrever com as preferências do pico
-        spot_level_prefs_row = await conn.fetchrow(
-            "SELECT * FROM spot_level_preferences WHERE spot_id = $1 AND surf_level = $2",
-            spot_id, surf_level
-        )
-        if spot_level_prefs_row:
-            spot_prefs = {k: v for k, v in dict(spot_level_prefs_row).items() if v is not None}
-            final_prefs.update(spot_prefs)
-
-        # 3. Tenta sobrescrever com as preferências do usuário (se ativas)
-        user_prefs_row = await conn.fetchrow(
-            "SELECT * FROM user_spot_preferences WHERE user_id = $1 AND spot_id = $2 AND is_active = TRUE",
-            user_id, spot_id
-        )
-        if user_prefs_row:
-            user_prefs = {k: v for k, v in dict(user_prefs_row).items() if v is not None}
-            final_prefs.update(user_prefs)
-            final_prefs.update({
-                'preference_id': user_prefs_row['preference_id'],
-                'is_active': user_prefs_row['is_active']
-            })
-    finally:
-        await conn.close()
-
-    final_prefs.setdefault('preference_id', 0)
-    final_prefs.setdefault('user_id', user_id)
-    final_prefs.setdefault('spot_id', spot_id)
-    final_prefs.setdefault('is_active', False)
-
-    return final_prefs
-
-
 async def create_or_update_user_preferences(user_id: str, spot_id: int, updates: Dict[str, Any]) -> Dict[str, Any]:
     """
     Cria ou atualiza (UPSERT) as preferências de um usuário para um spot.
@@ -259,25 +285,168 @@ async def create_or_update_user_preferences(user_id: str, spot_id: int, updates:
 
         return updated_preferences
     finally:
-        await conn.close()
+        await release_connection(conn)
+
+PREFERENCE_FIELDS = (
+    "ideal_swell_height", "max_swell_height", "max_wind_speed",
+    "ideal_water_temperature", "ideal_air_temperature",
+)
+
+async def get_preferences_for_spots(user_context: Dict[str, Any], spot_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """
+    Resolve as preferências de um usuário para vários spots em um único statement.
+    Segue, campo a campo, a hierarquia: preferências customizadas e ativas do usuário,
+    do pico por nível (spot_level_preferences) e genéricas por nível, e registra em
+    'sources' a origem de cada valor ('user', 'spot' ou 'generic').
+    O nível e as preferências customizadas vêm do contexto do usuário.
+    """
+    spot_ids = list(dict.fromkeys(spot_ids))
+    if not spot_ids:
+        return {}
+    user_id, surf_level = user_context['user_id'], user_context['surf_level']
+    conn = await get_connection()
+    try:
+        rows = await conn.fetch(SQL_SPOT_LEVEL_PREFERENCES_FOR_SPOTS, spot_ids, surf_level)
+    finally:
+        await release_connection(conn)
+
+    spot_prefs_by_spot = {row['spot_id']: json.loads(row['prefs']) for row in rows}
+    generic_prefs = await get_generic_preferences_by_level(surf_level)
+    resolved = {}
+    for spot_id in spot_ids:
+        spot_prefs = spot_prefs_by_spot.get(spot_id, {})
+        user_prefs = user_context['custom_prefs'].get(spot_id, {})
+
+        final_prefs = {
+            'preference_id': user_prefs.get('preference_id', 0),
+            'user_id': user_id,
+            'spot_id': spot_id,
+            'is_active': bool(user_prefs.get('is_active', False)),
+        }
+        sources = {}
+        for field in PREFERENCE_FIELDS:
+            if user_prefs.get(field) is not None:
+                final_prefs[field], sources[field] = user_prefs[field], 'user'
+            elif spot_prefs.get(field) is not None:
+                final_prefs[field], sources[field] = spot_prefs[field], 'spot'
+            else:
+                final_prefs[field], sources[field] = generic_prefs.get(field), 'generic'
+        final_prefs['sources'] = sources
+        resolved[spot_id] = final_prefs
+    return resolved
 
-async def get_forecasts_for_spot(spot_id: int, start_utc: datetime.datetime, end_utc: datetime.datetime) -> List[Dict[str, Any]]:
+async def create_or_update_user_preferences_bulk(user_id: str, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Cria ou atualiza (UPSERT) as preferências de um usuário para vários spots em um único statement.
+    Cada item contém 'spot_id' e apenas os campos que devem ser alterados; os campos
+    ausentes mantêm o valor atual (ou o default da tabela, para linhas novas).
     """
-    Busca os dados de previsão brutos para um spot em um intervalo de tempo.
+    if not items:
+        return []
+    # Um mesmo spot repetido quebraria o ON CONFLICT; consolida os patches (o último vence)
+    patches: Dict[int, Dict[str, Any]] = {}
+    for item in items:
+        patches.setdefault(item['spot_id'], {}).update(item)
+    columns = PREFERENCE_FIELDS + ("is_active",)
+    merged_columns = ",\n                ".join(
+        f"CASE WHEN x.patch ? '{col}' THEN (x.patch->>'{col}')::{'boolean' if col == 'is_active' else 'numeric'} "
+        f"ELSE {'COALESCE(usp.is_active, TRUE)' if col == 'is_active' else f'usp.{col}'} END"
+        for col in columns
+    )
+    query = f"""
+        INSERT INTO user_spot_preferences (user_id, spot_id, {", ".join(columns)})
+        SELECT $1, x.spot_id,
+                {merged_columns}
+        FROM (
+            SELECT (item->>'spot_id')::int AS spot_id, item - 'spot_id' AS patch
+            FROM jsonb_array_elements($2::jsonb) AS item
+        ) AS x
+        LEFT JOIN user_spot_preferences usp ON usp.user_id = $1 AND usp.spot_id = x.spot_id
+        ON CONFLICT (user_id, spot_id) DO UPDATE SET {", ".join(f"{col} = EXCLUDED.{col}" for col in columns)}
+        RETURNING *;
+    """
+    conn = await get_connection()
+    try:
+        rows = await conn.fetch(query, user_id, json.dumps(list(patches.values())))
+        updated = [dict(row) for row in rows]
+        for preferences in updated:
+            if preferences.get('user_id') is not None:
+                preferences['user_id'] = str(preferences['user_id'])
+        return updated
+    finally:
+        await release_connection(conn)
+
+async def get_forecasts_for_spot(spot_id: int, start_utc: datetime.datetime, end_utc: datetime.datetime) -> List[Any]:
+    """
+    Busca os dados de previsão de um spot em um intervalo de tempo. Retorna os records do
+    asyncpg diretamente, com as colunas na ordem de SQL_FORECASTS_FOR_SPOT.
+    """
+    conn = await get_connection()
+    try:
+        return await conn.fetch(SQL_FORECASTS_FOR_SPOT, spot_id, start_utc, end_utc)
+    finally:
+        await release_connection(conn)
+
+async def get_forecasts_in_windows(
+    spot_ids: List[int],
+    window_starts: List[datetime.datetime],
+    window_ends: List[datetime.datetime],
+    local_dates: List[datetime.date]
+) -> List[Dict[str, Any]]:
+    """
+    Busca as previsões de vários spots restritas a janelas de tempo em UTC (uma por spot e dia).
+    Cada janela é um intervalo fechado e já corresponde ao dia/horário local pedido, então só
+    as linhas pontuáveis saem do banco. Cada linha traz a 'local_date' da janela que a selecionou.
+    As janelas são resolvidas pelo índice único (spot_id, timestamp_utc) da tabela forecasts.
+    """
+    if not spot_ids:
+        return []
+    conn = await get_connection()
+    try:
+        rows = await conn.fetch(SQL_FORECASTS_IN_WINDOWS, spot_ids, window_starts, window_ends, local_dates)
+        return [dict(row) for row in rows]
+    finally:
+        await release_connection(conn)
+
+async def get_forecast_window_rows(
+    start_utc: datetime.datetime,
+    end_utc: datetime.datetime,
+    modified_since: Optional[datetime.datetime] = None
+) -> List[Any]:
+    """
+    Busca as previsões de todos os spots em uma janela [start_utc, end_utc), com as colunas
+    numéricas já convertidas para float8 e em ordem fixa:
+    spot_id, timestamp_utc, tide_type, *FORECAST_CONDITION_FIELDS, last_modified_at.
+    Com modified_since, traz só as linhas alteradas depois desse instante.
+    Retorna os records do asyncpg diretamente, para montagem das matrizes.
+    """
+    query = f"""
+        SELECT spot_id, timestamp_utc, tide_type, {_FORECAST_NUMERIC_COLUMNS}, last_modified_at
+        FROM forecasts
+        WHERE timestamp_utc >= $1 AND timestamp_utc < $2
+    """
+    args = [start_utc, end_utc]
+    if modified_since is not None:
+        query += " AND last_modified_at > $3"
+        args.append(modified_since)
+    conn = await get_connection()
+    try:
+        return await conn.fetch(query, *args)
+    finally:
+        await release_connection(conn)
+
+async def get_all_spot_level_preferences() -> Dict[tuple, Dict[str, Any]]:
+    """
+    Busca todas as preferências por spot e nível, indexadas por (spot_id, surf_level).
     """
     conn = await get_connection()
     try:
         rows = await conn.fetch(
-            """
-            SELECT * FROM forecasts
-            WHERE spot_id = $1 AND timestamp_utc BETWEEN $2 AND $3
-            ORDER BY timestamp_utc;
-            """,
-            spot_id, start_utc, end_utc
+            f"SELECT spot_id, surf_level, {', '.join(f'{f}::float8' for f in PREFERENCE_FIELDS)} FROM spot_level_preferences;"
         )
-        return [dict(row) for row in rows]
+        return {(row['spot_id'], row['surf_level']): {f: row[f] for f in PREFERENCE_FIELDS} for row in rows}
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 async def get_cached_recommendations(user_id: str, cache_key: str) -> Optional[List[Dict[str, Any]]]:
     """
@@ -285,13 +454,303 @@ async def get_cached_recommendations(user_id: str, cache_key: str) -> Optional[L
     """
     conn = await get_connection()
     try:
-        row = await conn.fetchrow(
-            # A query agora usa cache_key
-            "SELECT recommendations_payload FROM user_recommendation_cache WHERE user_id = $1 AND cache_key = $2",
-            user_id, cache_key
-        )
+        row = await conn.fetchrow(SQL_CACHED_RECOMMENDATIONS, user_id, cache_key)
         if row and row['recommendations_payload']:
             return json.loads(row['recommendations_payload'])
         return None
     finally:
-        await conn.close()
\ No newline at end of file
+        await release_connection(conn)
+
+# --- RESUMOS DIÁRIOS DE PREVISÕES ---
+
+SQL_UPSERT_FORECAST_DAILY_SUMMARIES = """
+    INSERT INTO forecast_daily_summaries (
+        spot_id, local_date, hours,
+        swell_height_min, swell_height_max, swell_height_mean,
+        swell_period_min, swell_period_max, swell_period_mean,
+        wind_speed_min, wind_speed_max, wind_speed_mean,
+        sea_level_min, sea_level_max, sea_level_mean,
+        best_hours, updated_at
+    )
+    SELECT
+        d.spot_id, d.local_date, count(*),
+        min(f.swell_height_sg), max(f.swell_height_sg), round(avg(f.swell_height_sg), 2),
+        min(f.swell_period_sg), max(f.swell_period_sg), round(avg(f.swell_period_sg), 2),
+        min(f.wind_speed_sg), max(f.wind_speed_sg), round(avg(f.wind_speed_sg), 2),
+        min(f.sea_level_sg), max(f.sea_level_sg), round(avg(f.sea_level_sg), 2),
+        d.best_hours, now()
+    FROM unnest($1::int[], $2::date[], $3::jsonb[], $4::timestamptz[], $5::timestamptz[])
+        AS d(spot_id, local_date, best_hours, day_start, day_end)
+    JOIN forecasts f
+        ON f.spot_id = d.spot_id
+        AND f.timestamp_utc >= d.day_start
+        AND f.timestamp_utc < d.day_end
+    GROUP BY d.spot_id, d.local_date, d.best_hours
+    ON CONFLICT (spot_id, local_date) DO UPDATE SET
+        hours = EXCLUDED.hours,
+        swell_height_min = EXCLUDED.swell_height_min,
+        swell_height_max = EXCLUDED.swell_height_max,
+        swell_height_mean = EXCLUDED.swell_height_mean,
+        swell_period_min = EXCLUDED.swell_period_min,
+        swell_period_max = EXCLUDED.swell_period_max,
+        swell_period_mean = EXCLUDED.swell_period_mean,
+        wind_speed_min = EXCLUDED.wind_speed_min,
+        wind_speed_max = EXCLUDED.wind_speed_max,
+        wind_speed_mean = EXCLUDED.wind_speed_mean,
+        sea_level_min = EXCLUDED.sea_level_min,
+        sea_level_max = EXCLUDED.sea_level_max,
+        sea_level_mean = EXCLUDED.sea_level_mean,
+        best_hours = EXCLUDED.best_hours,
+        updated_at = EXCLUDED.updated_at;
+"""
+SQL_FORECAST_DAILY_SUMMARIES = """
+    SELECT d.*
+    FROM unnest($1::int[], $2::date[]) AS t(spot_id, first_date)
+    JOIN forecast_daily_summaries d ON d.spot_id = t.spot_id
+    WHERE d.local_date >= t.first_date
+      AND d.local_date < t.first_date + $3::int
+    ORDER BY d.spot_id, d.local_date;
+"""
+
+async def upsert_forecast_daily_summaries(
+    spot_ids: List[int],
+    local_dates: List[datetime.date],
+    best_hours: List[Dict[str, Any]],
+    day_bounds: List[Tuple[datetime.datetime, datetime.datetime]]
+) -> None:
+    """
+    Recalcula os resumos diários (mín/máx/média por dia local) dos pares (spot, dia) informados
+    a partir de forecasts, gravando junto a melhor hora de cada nível. Pares sem previsões são ignorados.
+    day_bounds traz o início e o fim (em UTC) de cada dia local, calculados com o fuso já validado:
+    um fuso inválido em spots não pode derrubar o lote inteiro no banco.
+    """
+    conn = await get_connection()
+    try:
+        await conn.execute(
+            SQL_UPSERT_FORECAST_DAILY_SUMMARIES,
+            list(spot_ids), list(local_dates), [json.dumps(item) for item in best_hours],
+            [start for start, _ in day_bounds], [end for _, end in day_bounds]
+        )
+    finally:
+        await release_connection(conn)
+
+async def get_forecast_daily_summaries(spot_ids: List[int], first_dates: List[datetime.date], days: int) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Busca os resumos diários de cada spot a partir da data correspondente em first_dates
+    (hoje, no fuso do spot), por `days` dias, indexados pelo spot_id.
+    """
+    conn = await get_connection()
+    try:
+        rows = await conn.fetch(SQL_FORECAST_DAILY_SUMMARIES, list(spot_ids), list(first_dates), days)
+    finally:
+        await release_connection(conn)
+    summaries: Dict[int, List[Dict[str, Any]]] = {spot_id: [] for spot_id in spot_ids}
+    for row in rows:
+        summary = dict(row)
+        summary['best_hours'] = json.loads(summary['best_hours'])
+        summaries[summary['spot_id']].append(summary)
+    return summaries
+
+# --- ALERTAS DE SCORE ---
+
+SQL_ALERT_SUBSCRIPTIONS_FINGERPRINT = "SELECT count(*) AS total, max(subscription_id) AS last_id FROM alert_subscriptions;"
+# Assinaturas com as preferências customizadas e ativas do usuário no spot (NULL quando não há)
+SQL_ALERT_SUBSCRIPTIONS_FOR_EVALUATION = f"""
+    SELECT a.subscription_id, a.spot_id, a.surf_level, a.min_score::float8,
+        (usp.user_id IS NOT NULL) AS has_custom_prefs,
+        {", ".join(f"usp.{f}::float8" for f in PREFERENCE_FIELDS)}
+    FROM alert_subscriptions a
+    LEFT JOIN user_spot_preferences usp
+        ON usp.user_id = a.user_id AND usp.spot_id = a.spot_id AND usp.is_active = TRUE
+    ORDER BY a.subscription_id;
+"""
+# Dia e hora chegam como deslocamentos (em dias e horas) a partir de $4 e $5
+SQL_INSERT_ALERTS = """
+    INSERT INTO alert_outbox (subscription_id, user_id, spot_id, surf_level, local_date, timestamp_utc, overall_score, min_score)
+    SELECT a.subscription_id, a.user_id, a.spot_id, a.surf_level,
+        $4::date + x.day, $5::timestamptz + make_interval(hours => x.hour), x.overall_score, a.min_score
+    FROM unnest($1::bigint[], $2::int[], $3::int[], $6::float8[])
+        AS x(subscription_id, day, hour, overall_score)
+    JOIN alert_subscriptions a ON a.subscription_id = x.subscription_id
+    ORDER BY x.subscription_id, x.day
+    ON CONFLICT (subscription_id, local_date) DO NOTHING;
+"""
+# Marca como consumidos os alertas pendentes mais antigos do usuário; SKIP LOCKED deixa
+# consumidores simultâneos pegarem alertas diferentes
+SQL_CONSUME_ALERTS = """
+    WITH claimed AS (
+        SELECT alert_id FROM alert_outbox
+        WHERE user_id = $1 AND consumed_at IS NULL
+        ORDER BY alert_id
+        LIMIT $2
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE alert_outbox o SET consumed_at = now()
+    FROM claimed, spots s
+    WHERE o.alert_id = claimed.alert_id AND s.spot_id = o.spot_id
+    RETURNING o.alert_id, o.subscription_id, o.spot_id, s.name AS spot_name, o.surf_level,
+        o.local_date, o.timestamp_utc, o.overall_score::float8, o.min_score::float8, o.created_at;
+"""
+
+def _alert_subscription(row) -> Dict[str, Any]:
+    subscription = dict(row)
+    subscription['user_id'] = str(subscription['user_id'])
+    subscription['min_score'] = float(subscription['min_score'])
+    return subscription
+
+async def get_alert_subscriptions(user_id: str) -> List[Dict[str, Any]]:
+    """Busca as assinaturas de alerta de um usuário."""
+    conn = await get_connection()
+    try:
+        rows = await conn.fetch("SELECT * FROM alert_subscriptions WHERE user_id = $1 ORDER BY subscription_id", user_id)
+        return [_alert_subscription(row) for row in rows]
+    finally:
+        await release_connection(conn)
+
+async def create_alert_subscription(user_id: str, spot_id: int, surf_level: str, min_score: float, max_per_user: int) -> Optional[Dict[str, Any]]:
+    """
+    Cria uma assinatura de alerta. Retorna None se o usuário já tiver `max_per_user`
+    assinaturas (a contagem e a inserção acontecem no mesmo statement).
+    """
+    conn = await get_connection()
+    try:
+        row = await conn.fetchrow(
+            """
+            INSERT INTO alert_subscriptions (user_id, spot_id, surf_level, min_score)
+            SELECT $1, $2, $3, $4
+            WHERE (SELECT count(*) FROM alert_subscriptions WHERE user_id = $1) < $5
+            RETURNING *;
+            """,
+            user_id, spot_id, surf_level, min_score, max_per_user
+        )
+        return _alert_subscription(row) if row else None
+    finally:
+        await release_connection(conn)
+
+async def delete_alert_subscription(user_id: str, subscription_id: int) -> bool:
+    """Remove uma assinatura do usuário (e seus alertas). Retorna False se ela não existir."""
+    conn = await get_connection()
+    try:
+        status = await conn.execute(
+            "DELETE FROM alert_subscriptions WHERE subscription_id = $1 AND user_id = $2",
+            subscription_id, user_id
+        )
+        return status != "DELETE 0"
+    finally:
+        await release_connection(conn)
+
+async def get_alert_subscriptions_fingerprint() -> tuple:
+    """(total, maior subscription_id) das assinaturas: muda a cada criação ou remoção."""
+    conn = await get_connection()
+    try:
+        row = await conn.fetchrow(SQL_ALERT_SUBSCRIPTIONS_FINGERPRINT)
+        return (row['total'], row['last_id'])
+    finally:
+        await release_connection(conn)
+
+async def get_alert_subscriptions_for_evaluation() -> List[Any]:
+    """Busca todas as assinaturas, com as preferências customizadas do usuário no spot, em um único statement."""
+    conn = await get_connection()
+    try:
+        return await conn.fetch(SQL_ALERT_SUBSCRIPTIONS_FOR_EVALUATION)
+    finally:
+        await release_connection(conn)
+
+async def insert_alerts(
+    subscription_ids: List[int],
+    day_base: datetime.date,
+    days: List[int],
+    start: datetime.datetime,
+    hours: List[int],
+    overall_scores: List[float]
+) -> int:
+    """
+    Grava alertas no outbox em um único statement: o dia local de cada um é day_base + days[i]
+    e a melhor hora é start + hours[i]. Alertas já existentes para a mesma assinatura e dia,
+    ou de assinaturas removidas, são ignorados. Retorna quantos foram gravados.
+    """
+    conn = await get_connection()
+    try:
+        status = await conn.execute(SQL_INSERT_ALERTS, subscription_ids, days, hours, day_base, start, overall_scores)
+        return int(status.split()[-1])
+    finally:
+        await release_connection(conn)
+
+async def consume_alerts(user_id: str, limit: int) -> List[Dict[str, Any]]:
+    """Retorna os alertas pendentes mais antigos do usuário (até `limit`), marcando-os como consumidos."""
+    conn = await get_connection()
+    try:
+        rows = await conn.fetch(SQL_CONSUME_ALERTS, user_id, limit)
+        return sorted((dict(row) for row in rows), key=lambda alert: alert['alert_id'])
+    finally:
+        await release_connection(conn)
+
+async def purge_alerts(retention_hours: float) -> int:
+    """Remove do outbox os alertas cuja hora já passou há mais de `retention_hours`."""
+    conn = await get_connection()
+    try:
+        status = await conn.execute(
+            "DELETE FROM alert_outbox WHERE timestamp_utc < now() - make_interval(secs => $1)",
+            retention_hours * 3600
+        )
+        return int(status.split()[-1])
+    finally:
+        await release_connection(conn)
+
+# --- PARTIÇÕES DE PREVISÕES ---
+# A tabela forecasts é particionada por mês de timestamp_utc (ver src/db/migrations).
+
+FORECAST_PARTITION_LOCK_ID = 7310420002
+_FORECAST_PARTITION_NAME = re.compile(r"^forecasts_p(\d{4})(\d{2})$")
+SQL_FORECAST_PARTITIONS = """
+    SELECT c.relname AS name
+    FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'public.forecasts'::regclass
+    ORDER BY c.relname;
+"""
+
+def _add_months(month: datetime.date, months: int) -> datetime.date:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+async def maintain_forecast_partitions(
+    months_ahead: int,
+    retention_cutoff: datetime.date,
+    archive: bool
+) -> Optional[Dict[str, List[str]]]:
+    """
+    Garante as partições do mês atual (UTC) e dos próximos `months_ahead` meses e retira as
+    partições que terminam até `retention_cutoff`: movidas para o schema forecasts_archive
+    (archive=True) ou removidas. Informa também se a partição DEFAULT tem linhas (ela não
+    passa pela retenção). Retorna None se outra instância já estiver fazendo a manutenção.
+    """
+    this_month = datetime.datetime.now(datetime.timezone.utc).date().replace(day=1)
+    conn = await get_connection()
+    try:
+        async with conn.transaction():
+            if not await conn.fetchval("SELECT pg_try_advisory_xact_lock($1)", FORECAST_PARTITION_LOCK_ID):
+                return None
+            # DETACH/DROP bloqueiam a tabela pai; não fica esperando atrás de consultas longas
+            await conn.execute("SET LOCAL lock_timeout = '5s'")
+            ensured = []
+            for offset in range(months_ahead + 1):
+                ensured.append(await conn.fetchval("SELECT public.create_forecast_partition($1)", _add_months(this_month, offset)))
+
+            retired = []
+            for row in await conn.fetch(SQL_FORECAST_PARTITIONS):
+                match = _FORECAST_PARTITION_NAME.match(row['name'])
+                if not match:
+                    continue
+                month_end = _add_months(datetime.date(int(match.group(1)), int(match.group(2)), 1), 1)
+                if month_end > retention_cutoff:
+                    continue
+                if archive:
+                    await conn.execute(f'ALTER TABLE public.forecasts DETACH PARTITION public."{row["name"]}"')
+                    await conn.execute(f'ALTER TABLE public."{row["name"]}" SET SCHEMA forecasts_archive')
+                else:
+                    await conn.execute(f'DROP TABLE public."{row["name"]}"')
+                retired.append(row['name'])
+            default_has_rows = await conn.fetchval("SELECT EXISTS (SELECT 1 FROM public.forecasts_default)")
+            return {"partitions": ensured, "retired": retired, "default_has_rows": default_has_rows}
+    finally:
+        await release_connection(conn)
@@ -0,0 +1,259 @@
+# File: src/services/alert_service.py
+
+import asyncio
+import datetime
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from src.core.config import settings
+from src.db import queries
+from src.services import forecast_window, notifications, score_store
+from src.services.scoring_service import SURF_LEVELS, calculate_score_matrices
+
+# Alertas de score: cada assinatura (usuário, spot, nível, score mínimo) gera no máximo um
+# alerta por dia local, quando a melhor hora ainda por vir do dia atinge o score mínimo.
+# Depois de cada atualização das matrizes de score, todas as assinaturas são avaliadas de
+# uma vez: o score depende só de (spot, nível, preferências), então as assinaturas são
+# agrupadas por essa chave e cada grupo é pontuado uma única vez. Os grupos sem preferências
+# customizadas usam as matrizes por nível já mantidas por score_store; só os demais são
+# calculados aqui. Os alertas vão para a tabela alert_outbox (UNIQUE por assinatura e dia,
+# então várias instâncias avaliando ao mesmo tempo não duplicam alertas).
+
+ALERT_BATCH_SIZE = 20000
+# Chave (assinatura, dia local) dos alertas já gravados: subscription_id << 20 | date.toordinal()
+_DATE_BITS = 20
+
+_subscriptions: Optional[Dict[str, Any]] = None
+_fingerprint: Optional[tuple] = None
+_subscriptions_dirty = False
+_subscribed = False
+# Última avaliação: (geração, versão, primeira hora, versão das assinaturas)
+_evaluated: Optional[tuple] = None
+_emitted = np.empty(0, dtype=np.int64)
+_last_purge = 0.0
+_lock: Optional[asyncio.Lock] = None
+_stats = {"evaluations": 0, "subscriptions": 0, "groups": 0, "custom_groups": 0, "alerts_written": 0, "errors": 0, "last_evaluation_ms": None}
+
+
+def _on_preference_update(payload: str) -> None:
+    # Preferências customizadas mudam o score das assinaturas do usuário
+    subscriptions_changed()
+
+
+def _ensure_subscribed() -> None:
+    global _subscribed
+    if not _subscribed:
+        notifications.subscribe(notifications.PREFERENCE_UPDATES_CHANNEL, _on_preference_update)
+        _subscribed = True
+
+
+def subscriptions_changed() -> None:
+    """Força o recarregamento das assinaturas na próxima avaliação."""
+    global _subscriptions_dirty
+    _subscriptions_dirty = True
+
+
+async def _load_subscriptions() -> Dict[str, Any]:
+    rows = await queries.get_alert_subscriptions_for_evaluation()
+    level_codes = {surf_level: code for code, surf_level in enumerate(SURF_LEVELS)}
+    rows = [row for row in rows if row['surf_level'] in level_codes]
+    custom = np.array(
+        [[np.nan if row[field] is None else row[field] for field in queries.PREFERENCE_FIELDS] for row in rows],
+        dtype=np.float64
+    ).reshape(len(rows), len(queries.PREFERENCE_FIELDS))
+    version = (_subscriptions["version"] + 1) if _subscriptions else 1
+    return {
+        "version": version,
+        "subscription_ids": np.array([row['subscription_id'] for row in rows], dtype=np.int64),
+        "spot_ids": np.array([row['spot_id'] for row in rows], dtype=np.int64),
+        "levels": np.array([level_codes[row['surf_level']] for row in rows], dtype=np.int64),
+        "min_scores": np.array([row['min_score'] for row in rows], dtype=np.float64),
+        "custom_prefs": custom,
+    }
+
+
+async def _refresh_subscriptions() -> Dict[str, Any]:
+    """Recarrega as assinaturas se outra escrita (nesta ou em outra instância) as alterou."""
+    global _subscriptions, _fingerprint, _subscriptions_dirty
+    fingerprint = await queries.get_alert_subscriptions_fingerprint()
+    if _subscriptions is None or _subscriptions_dirty or fingerprint != _fingerprint:
+        _subscriptions_dirty = False
+        _subscriptions = await _load_subscriptions()
+        _fingerprint = fingerprint
+    return _subscriptions
+
+
+def _gather_inputs(store: Dict[str, Any], subscriptions: Dict[str, Any], first: int) -> Dict[str, Any]:
+    """
+    Agrupa as assinaturas por (spot, nível, preferências) e copia das matrizes as horas a
+    partir de `first` de que os grupos precisam. Roda no event loop, sem await: a cópia é
+    consistente com as atualizações incrementais de score_store.
+    """
+    window = store["window"]
+    rows = np.searchsorted(window["spot_ids"], subscriptions["spot_ids"])
+    rows = np.minimum(rows, max(len(window["spot_ids"]) - 1, 0))
+    valid = window["spot_ids"][rows] == subscriptions["spot_ids"] if len(window["spot_ids"]) else np.zeros(len(rows), dtype=bool)
+    levels = subscriptions["levels"]
+
+    # Preferências efetivas: customizadas campo a campo, senão as do pico por nível (ou genéricas).
+    # Só as assinaturas em que alguma customizada difere da padrão precisam de cálculo próprio.
+    defaults = np.full(subscriptions["custom_prefs"].shape, np.nan)
+    for code, surf_level in enumerate(SURF_LEVELS):
+        in_level = valid & (levels == code)
+        for i, field in enumerate(queries.PREFERENCE_FIELDS):
+            defaults[in_level, i] = window["level_prefs"][surf_level][field][rows[in_level]]
+    custom = ~np.isnan(subscriptions["custom_prefs"])
+    prefs = np.where(custom, subscriptions["custom_prefs"], defaults)
+    is_custom = valid & np.any(custom & (prefs != defaults), axis=1)
+
+    group_of = np.full(len(rows), -1, dtype=np.int64)
+    default_subs = np.flatnonzero(valid & ~is_custom)
+    default_keys, default_inverse = np.unique(rows[default_subs] * len(SURF_LEVELS) + levels[default_subs], return_inverse=True)
+    group_of[default_subs] = default_inverse
+    default_rows, default_levels = default_keys // len(SURF_LEVELS), default_keys % len(SURF_LEVELS)
+    default_overall = np.empty((len(default_keys), window["n_hours"] - first))
+    for code, surf_level in enumerate(SURF_LEVELS):
+        in_level = default_levels == code
+        default_overall[in_level] = store["levels"][surf_level]["overall_score"][default_rows[in_level], first:]
+
+    custom_subs = np.flatnonzero(is_custom)
+    custom_keys, custom_inverse = np.unique(
+        np.column_stack([rows[custom_subs], levels[custom_subs], prefs[custom_subs]]), axis=0, return_inverse=True
+    )
+    group_of[custom_subs] = len(default_keys) + custom_inverse.reshape(-1)
+    custom_rows, custom_levels = custom_keys[:, 0].astype(np.int64), custom_keys[:, 1].astype(np.int64)
+    conditions = window["conditions"]
+    return {
+        "group_of": group_of,
+        "min_scores": subscriptions["min_scores"],
+        "group_rows": np.concatenate([default_rows, custom_rows]),
+        "default_overall": default_overall,
+        "custom_levels": custom_levels,
+        "custom_prefs": custom_keys[:, 2:],
+        "custom_fields": {name: matrix[custom_rows, first:] for name, matrix in window["fields"].items()},
+        "custom_conditions": {
+            "swell_direction_score": conditions["swell_direction_score"][custom_rows, first:],
+            "wind_terral": conditions["wind_terral"][custom_rows, first:],
+            "tide_score": conditions["tide_score"][custom_rows, first:],
+            "has_wind_directions": conditions["has_wind_directions"][custom_rows],
+        },
+        "day_index": window["day_index"][:, first:],
+        "n_days": window["n_days"],
+    }
+
+
+def _evaluate(inputs: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """
+    Pontua os grupos customizados, calcula a melhor hora de cada grupo em cada dia local e
+    compara com o score mínimo de cada assinatura. Retorna os pares (assinatura, dia) que
+    atingiram o mínimo, com a coluna (relativa à primeira hora) e o score da melhor hora.
+    """
+    custom_overall = np.empty((len(inputs["custom_levels"]), inputs["default_overall"].shape[1]))
+    for code, surf_level in enumerate(SURF_LEVELS):
+        in_level = np.flatnonzero(inputs["custom_levels"] == code)
+        if not len(in_level):
+            continue
+        fields = {name: matrix[in_level] for name, matrix in inputs["custom_fields"].items()}
+        conditions = {name: matrix[in_level] for name, matrix in inputs["custom_conditions"].items()}
+        prefs = {field: inputs["custom_prefs"][in_level, i] for i, field in enumerate(queries.PREFERENCE_FIELDS)}
+        custom_overall[in_level] = calculate_score_matrices(fields, conditions, prefs, surf_level)["overall_score"]
+
+    group_rows = inputs["group_rows"]
+    day_index = inputs["day_index"][group_rows]
+    bests = score_store.daily_bests(np.concatenate([inputs["default_overall"], custom_overall]), day_index, inputs["n_days"])
+
+    subs = np.flatnonzero(inputs["group_of"] >= 0)
+    groups = inputs["group_of"][subs]
+    scores = bests["score"][groups]
+    # O último dia local de cada spot está incompleto na janela: a melhor hora ainda pode mudar
+    last_days = day_index[:, -1][groups] if day_index.shape[1] else np.zeros(len(groups), dtype=np.int64)
+    with np.errstate(invalid='ignore'):
+        hits = (scores >= inputs["min_scores"][subs, None]) & (np.arange(inputs["n_days"]) < last_days[:, None])
+    hit_subs, hit_days = np.nonzero(hits)
+    return {
+        "subscriptions": subs[hit_subs],
+        "days": hit_days,
+        "columns": bests["column"][groups[hit_subs], hit_days],
+        "scores": scores[hit_subs, hit_days],
+        "n_groups": len(group_rows),
+        "n_custom_groups": len(inputs["custom_levels"]),
+    }
+
+
+async def _purge_if_due() -> None:
+    global _last_purge
+    if time.monotonic() - _last_purge < 3600:
+        return
+    _last_purge = time.monotonic()
+    removed = await queries.purge_alerts(settings.ALERT_OUTBOX_RETENTION_HOURS)
+    if removed:
+        print(f"INFO: {removed} alertas antigos removidos do outbox.")
+
+
+async def evaluate_alerts() -> None:
+    """Avalia todas as assinaturas contra as matrizes atuais e grava os alertas novos no outbox."""
+    global _lock
+    _ensure_subscribed()
+    if _lock is None:
+        _lock = asyncio.Lock()
+    async with _lock:
+        await _evaluate_pending()
+
+
+async def _evaluate_pending() -> None:
+    global _evaluated, _emitted
+    store = score_store.current_store()
+    if store is None:
+        return
+    await _purge_if_due()
+    subscriptions = await _refresh_subscriptions()
+    store = score_store.current_store()
+    window = store["window"]
+    now = datetime.datetime.now(datetime.timezone.utc)
+    first = max(forecast_window.hour_column(window, now), 0)
+    state = (store["generation"], store["version"], first, subscriptions["version"])
+    if state == _evaluated or first >= window["n_hours"] or not len(subscriptions["subscription_ids"]):
+        _evaluated = state
+        return
+
+    started = time.perf_counter()
+    try:
+        inputs = _gather_inputs(store, subscriptions, first)
+        result = await asyncio.to_thread(_evaluate, inputs)
+
+        subscription_ids = subscriptions["subscription_ids"][result["subscriptions"]]
+        day_base = window["day_base"].toordinal()
+        keys = (subscription_ids << _DATE_BITS) | (day_base + result["days"])
+        new = np.flatnonzero(~np.isin(keys, _emitted))
+        written = 0
+        for offset in range(0, len(new), ALERT_BATCH_SIZE):
+            batch = new[offset:offset + ALERT_BATCH_SIZE]
+            written += await queries.insert_alerts(
+                subscription_ids[batch].tolist(),
+                window["day_base"],
+                result["days"][batch].tolist(),
+                window["start"],
+                (first + result["columns"][batch]).tolist(),
+                result["scores"][batch].tolist(),
+            )
+            _emitted = np.union1d(_emitted, keys[batch])
+    except Exception:
+        _stats["errors"] += 1
+        raise
+    # Dias que já saíram da janela não voltam a ser avaliados
+    _emitted = _emitted[(_emitted & ((1 << _DATE_BITS) - 1)) >= day_base]
+    _evaluated = state
+    _stats["evaluations"] += 1
+    _stats["subscriptions"] = len(subscriptions["subscription_ids"])
+    _stats["groups"] = result["n_groups"]
+    _stats["custom_groups"] = result["n_custom_groups"]
+    _stats["alerts_written"] += written
+    _stats["last_evaluation_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    if written:
+        print(f"INFO: {written} alertas de score gravados no outbox.")
+
+
+def alert_stats() -> Dict[str, Any]:
+    return dict(_stats)
@@ -0,0 +1,74 @@
+# File: src/services/daily_summary_service.py
+
+import datetime
+import time
+from typing import Any, Dict, List, Tuple
+
+from src.db import queries
+from src.services import forecast_window, score_store
+from src.services.scoring_service import SURF_LEVELS
+
+# Mantém a tabela forecast_daily_summaries: depois de cada atualização das matrizes de
+# score, só os dias locais (spot, dia) com alguma célula alterada são reescritos.
+
+SUMMARY_BATCH_SIZE = 2000
+
+_stats = {"refreshes": 0, "days_written": 0, "errors": 0, "last_refresh_ms": None}
+
+
+def _best_hours(store: Dict[str, Any], row: int, day: int) -> Dict[str, Any]:
+    window = store["window"]
+    best_hours = {}
+    for surf_level in SURF_LEVELS:
+        column = int(store["daily_best"][surf_level]["column"][row, day])
+        if column >= 0:
+            best_hours[surf_level] = {
+                "timestamp_utc": forecast_window.column_timestamp(window, column).isoformat(),
+                "overall_score": float(store["levels"][surf_level]["overall_score"][row, column]),
+            }
+    return best_hours
+
+
+def _complete_days(store: Dict[str, Any], pairs: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Mantém só os dias locais inteiramente dentro da janela (os das bordas estão incompletos)."""
+    day_index = store["window"]["day_index"]
+    if day_index.size == 0:
+        return []
+    first_days, last_days = day_index[:, 0], day_index[:, -1]
+    return [(row, day) for row, day in pairs if first_days[row] < day < last_days[row]]
+
+
+async def refresh_daily_summaries() -> None:
+    """Reescreve os resumos diários dos dias com mudanças pendentes."""
+    store, pairs = score_store.take_pending_days()
+    if store is None or not pairs:
+        return
+    pairs = _complete_days(store, pairs)
+    started = time.perf_counter()
+    window = store["window"]
+    try:
+        for offset in range(0, len(pairs), SUMMARY_BATCH_SIZE):
+            batch = pairs[offset:offset + SUMMARY_BATCH_SIZE]
+            local_dates = [window["day_base"] + datetime.timedelta(days=day) for _, day in batch]
+            await queries.upsert_forecast_daily_summaries(
+                [int(window["spot_ids"][row]) for row, _ in batch],
+                local_dates,
+                [_best_hours(store, row, day) for row, day in batch],
+                [forecast_window.local_day_bounds(window["spots"][row]["timezone"], local_date) for (row, _), local_date in zip(batch, local_dates)],
+            )
+    except Exception:
+        _stats["errors"] += 1
+        score_store.restore_pending_days(store, pairs)
+        raise
+    _stats["refreshes"] += 1
+    _stats["days_written"] += len(pairs)
+    _stats["last_refresh_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+
+def summary_version() -> int:
+    """Versão dos resumos gravados por esta réplica (muda a cada reescrita)."""
+    return _stats["refreshes"]
+
+
+def summary_stats() -> Dict[str, Any]:
+    return dict(_stats)
@@ -0,0 +1,47 @@
+# File: src/services/data_versions.py
+
+from collections import defaultdict
+from typing import Dict
+
+from src.services import notifications
+
+# Versões dos dados lidos pelas rotas públicas em cache (ver CompressionMiddleware): cada
+# notificação do banco incrementa a versão correspondente e as respostas guardadas com a
+# versão antiga deixam de ser servidas. São contadores locais desta réplica; cada réplica
+# recebe as mesmas notificações.
+
+_forecast_versions: Dict[int, int] = defaultdict(int)
+_catalog_version = 0
+_subscribed = False
+
+
+def _on_forecast_update(payload: str) -> None:
+    try:
+        _forecast_versions[int(payload)] += 1
+    except ValueError:
+        print(f"AVISO: Payload inválido em {notifications.FORECAST_UPDATES_CHANNEL}: {payload!r}")
+
+
+def _on_spot_update(payload: str) -> None:
+    global _catalog_version
+    _catalog_version += 1
+
+
+def _ensure_subscribed() -> None:
+    global _subscribed
+    if not _subscribed:
+        notifications.subscribe(notifications.FORECAST_UPDATES_CHANNEL, _on_forecast_update)
+        notifications.subscribe(notifications.SPOT_UPDATES_CHANNEL, _on_spot_update)
+        _subscribed = True
+
+
+def forecast_version(spot_id: int) -> int:
+    """Versão das previsões de um spot (muda a cada linha gravada em forecasts)."""
+    _ensure_subscribed()
+    return _forecast_versions.get(spot_id, 0)
+
+
+def catalog_version() -> int:
+    """Versão da tabela spots (muda a cada escrita nela)."""
+    _ensure_subscribed()
+    return _catalog_version
@@ -0,0 +1,285 @@
+# File: src/services/forecast_window.py
+
+import asyncio
+import datetime
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+
+from src.core.config import settings
+from src.db import queries
+from src.services.scoring_service import (
+    SURF_LEVELS, calculate_spot_condition_matrices, get_spot_profile, tide_type_code, tide_type_from_code,
+)
+
+# Janela de previsões de todos os spots em memória, no formato de matrizes (n_spots, n_horas):
+# uma por campo numérico, começando à meia-noite UTC de ontem, com uma coluna por hora.
+# Horas sem previsão ficam como NaN (e não são pontuadas).
+#
+# A janela é carregada por completo na virada do dia, periodicamente
+# (FORECAST_WINDOW_FULL_RELOAD_SECONDS) ou quando aparece um spot novo. Entre uma carga e
+# outra, refresh_forecast_window aplica só as células (spot, hora) cujos valores mudaram,
+# encontradas pela marca d'água de forecasts.last_modified_at.
+#
+# last_modified_at é o instante da escrita (clock_timestamp()), não o do COMMIT: a busca
+# recua FORECAST_DELTA_OVERLAP_SECONDS para pegar transações que comitam atrasadas. Uma
+# linha cujo COMMIT atrase mais que isso só entra na próxima carga completa.
+
+_window: Optional[Dict[str, Any]] = None
+_lock: Optional[asyncio.Lock] = None
+_generation = 0
+_stats = {"full_loads": 0, "delta_refreshes": 0, "changed_cells": 0}
+_invalid_timezones = set()
+
+
+def spot_timezone(timezone: Optional[str]) -> datetime.tzinfo:
+    """Fuso de um spot; um nome inválido (ou ausente) cai em UTC, com um aviso por nome."""
+    try:
+        return ZoneInfo(timezone)
+    except (ZoneInfoNotFoundError, ValueError, TypeError):
+        if timezone not in _invalid_timezones:
+            _invalid_timezones.add(timezone)
+            print(f"AVISO: Fuso horário inválido {timezone!r}; usando UTC.")
+        return datetime.timezone.utc
+
+
+def local_day_bounds(timezone: Optional[str], local_date: datetime.date) -> Tuple[datetime.datetime, datetime.datetime]:
+    """Início e fim (em UTC) do dia local no fuso do spot."""
+    tz = spot_timezone(timezone)
+    start = datetime.datetime.combine(local_date, datetime.time(), tzinfo=tz)
+    end = datetime.datetime.combine(local_date + datetime.timedelta(days=1), datetime.time(), tzinfo=tz)
+    return start.astimezone(datetime.timezone.utc), end.astimezone(datetime.timezone.utc)
+
+
+def local_today(timezone: Optional[str]) -> datetime.date:
+    """Data de hoje no fuso do spot."""
+    return datetime.datetime.now(spot_timezone(timezone)).date()
+
+
+def _window_start(now: datetime.datetime) -> datetime.datetime:
+    today = now.astimezone(datetime.timezone.utc).date()
+    return datetime.datetime.combine(today - datetime.timedelta(days=1), datetime.time(), tzinfo=datetime.timezone.utc)
+
+
+def _needs_full_reload(now: datetime.datetime) -> bool:
+    if _window is None or _window["watermark"] is None:
+        return True
+    if _window["start"] != _window_start(now):
+        return True  # virada do dia
+    return time.monotonic() - _window["loaded_at"] > settings.FORECAST_WINDOW_FULL_RELOAD_SECONDS
+
+
+def _local_day_index(spots: List[Dict[str, Any]], start: datetime.datetime, n_hours: int) -> Tuple[np.ndarray, datetime.date]:
+    """
+    Dia local (no fuso de cada spot) de cada coluna da janela, como deslocamento em dias a
+    partir de day_base (véspera do início da janela, que cobre fusos a oeste de UTC).
+    """
+    day_base = start.date() - datetime.timedelta(days=1)
+    timestamps = [start + datetime.timedelta(hours=h) for h in range(n_hours)]
+    by_timezone = {}
+    day_index = np.empty((len(spots), n_hours), dtype=np.int64)
+    for i, spot in enumerate(spots):
+        timezone = spot['timezone']
+        if timezone not in by_timezone:
+            tz = spot_timezone(timezone)
+            by_timezone[timezone] = np.array([(ts.astimezone(tz).date() - day_base).days for ts in timestamps], dtype=np.int64)
+        day_index[i] = by_timezone[timezone]
+    return day_index, day_base
+
+
+async def _load_level_prefs(spot_ids: np.ndarray) -> Dict[str, Dict[str, np.ndarray]]:
+    """Monta, por nível, um vetor por campo de preferência: do pico por nível ou, na falta, genérico."""
+    spot_level_prefs = await queries.get_all_spot_level_preferences()
+    level_prefs = {}
+    for surf_level in SURF_LEVELS:
+        generic = await queries.get_generic_preferences_by_level(surf_level)
+        arrays = {}
+        for field in queries.PREFERENCE_FIELDS:
+            values = np.full(len(spot_ids), generic[field], dtype=np.float64)
+            for i, spot_id in enumerate(spot_ids.tolist()):
+                value = spot_level_prefs.get((spot_id, surf_level), {}).get(field)
+                if value is not None:
+                    values[i] = value
+            arrays[field] = values
+        level_prefs[surf_level] = arrays
+    return level_prefs
+
+
+async def _load_window(now: datetime.datetime) -> Dict[str, Any]:
+    global _generation
+    start = _window_start(now)
+    n_hours = (settings.FORECAST_WINDOW_DAYS + 2) * 24
+    end = start + datetime.timedelta(hours=n_hours)
+
+    spots, rows = await asyncio.gather(
+        queries.get_all_spots(),
+        queries.get_forecast_window_rows(start, end),
+    )
+    spots = sorted(spots, key=lambda s: s['spot_id'])
+    spot_ids = np.array([s['spot_id'] for s in spots], dtype=np.int64)
+    n_spots = len(spots)
+
+    fields = {name: np.full((n_spots, n_hours), np.nan) for name in queries.FORECAST_CONDITION_FIELDS}
+    tide_codes = np.zeros((n_spots, n_hours), dtype=np.int64)
+    watermark = None
+    if rows:
+        columns = list(zip(*rows))
+        row_spots = np.array(columns[0], dtype=np.int64)
+        row_hours = np.array([(ts - start).total_seconds() // 3600 for ts in columns[1]], dtype=np.int64)
+        row_idx = np.searchsorted(spot_ids, row_spots)
+        valid = (row_idx < n_spots) & (row_hours >= 0) & (row_hours < n_hours)
+        valid[valid] &= spot_ids[row_idx[valid]] == row_spots[valid]
+        row_idx, row_hours = row_idx[valid], row_hours[valid]
+        tide_codes[row_idx, row_hours] = np.array([tide_type_code(t) for t in columns[2]], dtype=np.int64)[valid]
+        for offset, name in enumerate(queries.FORECAST_CONDITION_FIELDS, start=3):
+            fields[name][row_idx, row_hours] = np.array(columns[offset], dtype=np.float64)[valid]
+        watermark = max(ts for ts in columns[-1] if ts is not None)
+
+    spot_profiles = [get_spot_profile(spot) for spot in spots]
+    day_index, day_base = _local_day_index(spots, start, n_hours)
+    _generation += 1
+    return {
+        "generation": _generation,
+        "version": 0,
+        "start": start,
+        "end": end,
+        "n_hours": n_hours,
+        "loaded_at": time.monotonic(),
+        "refreshed_at": time.monotonic(),
+        "watermark": watermark,
+        "spots": spots,
+        "spot_ids": spot_ids,
+        "spot_index": {int(spot_id): i for i, spot_id in enumerate(spot_ids)},
+        "spot_profiles": spot_profiles,
+        "fields": fields,
+        "tide_codes": tide_codes,
+        "conditions": calculate_spot_condition_matrices(fields, tide_codes, spot_profiles),
+        "level_prefs": await _load_level_prefs(spot_ids),
+        "day_index": day_index,
+        "day_base": day_base,
+        "n_days": int(day_index.max()) + 1 if n_spots else 0,
+    }
+
+
+def _apply_changes(window: Dict[str, Any], rows: List[Any]) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Escreve na janela as linhas alteradas cujos valores de fato mudaram e recalcula as
+    condições dessas células. Retorna as células alteradas (linhas, colunas), ou None se
+    apareceu um spot que não está na janela (exige carga completa).
+    """
+    empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+    if not rows:
+        return empty
+    columns = list(zip(*rows))
+    spot_index = window["spot_index"]
+    if any(spot_id not in spot_index for spot_id in columns[0]):
+        return None
+    window["watermark"] = max([window["watermark"], *(ts for ts in columns[-1] if ts is not None)])
+
+    row_idx = np.array([spot_index[spot_id] for spot_id in columns[0]], dtype=np.int64)
+    row_hours = np.array([(ts - window["start"]).total_seconds() // 3600 for ts in columns[1]], dtype=np.int64)
+    valid = (row_hours >= 0) & (row_hours < window["n_hours"])
+    new_tides = np.array([tide_type_code(t) for t in columns[2]], dtype=np.int64)[valid]
+    new_values = {
+        name: np.array(columns[offset], dtype=np.float64)[valid]
+        for offset, name in enumerate(queries.FORECAST_CONDITION_FIELDS, start=3)
+    }
+    row_idx, row_hours = row_idx[valid], row_hours[valid]
+
+    # A ingestão pode regravar linhas sem mudar nada; só as células com valores diferentes contam
+    changed = window["tide_codes"][row_idx, row_hours] != new_tides
+    for name, values in new_values.items():
+        current = window["fields"][name][row_idx, row_hours]
+        changed |= ~((current == values) | (np.isnan(current) & np.isnan(values)))
+    if not changed.any():
+        return empty
+    row_idx, row_hours = row_idx[changed], row_hours[changed]
+    window["tide_codes"][row_idx, row_hours] = new_tides[changed]
+    for name, values in new_values.items():
+        window["fields"][name][row_idx, row_hours] = values[changed]
+
+    # Condições (direção do swell, vento terral, maré) das células alteradas, spot a spot
+    conditions = window["conditions"]
+    for row in np.unique(row_idx).tolist():
+        cols = row_hours[row_idx == row]
+        cell_fields = {name: matrix[row:row + 1, cols] for name, matrix in window["fields"].items()}
+        cell_conditions = calculate_spot_condition_matrices(cell_fields, window["tide_codes"][row:row + 1, cols], [window["spot_profiles"][row]])
+        for name in ("swell_direction_score", "wind_terral", "tide_score"):
+            conditions[name][row, cols] = cell_conditions[name][0]
+
+    window["version"] += 1
+    return row_idx, row_hours
+
+
+async def refresh_forecast_window(full_only: bool = False) -> Tuple[Dict[str, Any], Optional[Tuple[np.ndarray, np.ndarray]]]:
+    """
+    Atualiza a janela e retorna (janela, células alteradas). As células são None quando a
+    janela foi recarregada por completo (nesse caso é um objeto novo). Com full_only, só
+    recarrega se a carga completa for necessária, sem buscar mudanças.
+    """
+    global _window, _lock
+    if _lock is None:
+        _lock = asyncio.Lock()
+    async with _lock:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        if not _needs_full_reload(now):
+            if full_only:
+                return _window, (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+            since = _window["watermark"] - datetime.timedelta(seconds=settings.FORECAST_DELTA_OVERLAP_SECONDS)
+            rows = await queries.get_forecast_window_rows(_window["start"], _window["end"], modified_since=since)
+            changes = _apply_changes(_window, rows)
+            if changes is not None:
+                _window["refreshed_at"] = time.monotonic()
+                _stats["delta_refreshes"] += 1
+                _stats["changed_cells"] += len(changes[0])
+                return _window, changes
+            print("INFO: Spot novo nas previsões; recarregando a janela completa.")
+
+        started = time.perf_counter()
+        _window = await _load_window(now)
+        _stats["full_loads"] += 1
+        print(f"INFO: Janela de previsões carregada ({len(_window['spots'])} spots x {_window['n_hours']} horas) em {time.perf_counter() - started:.2f}s.")
+        return _window, None
+
+
+def is_current() -> bool:
+    """Indica se a janela carregada ainda vale (sem virada do dia nem recarga completa pendente)."""
+    return not _needs_full_reload(datetime.datetime.now(datetime.timezone.utc))
+
+
+def hour_column(window: Dict[str, Any], moment: datetime.datetime) -> int:
+    """Índice da coluna (hora) da janela que contém o instante informado."""
+    return int((moment - window["start"]).total_seconds() // 3600)
+
+
+def column_timestamp(window: Dict[str, Any], column: int) -> datetime.datetime:
+    return window["start"] + datetime.timedelta(hours=int(column))
+
+
+def forecast_conditions_at(window: Dict[str, Any], row: int, column: int) -> Dict[str, Any]:
+    """Reconstrói as condições de previsão de uma célula (spot, hora) da janela."""
+    conditions = {}
+    for name, matrix in window["fields"].items():
+        value = matrix[row, column]
+        conditions[name] = None if np.isnan(value) else float(value)
+    conditions["tide_type"] = tide_type_from_code(int(window["tide_codes"][row, column]))
+    return conditions
+
+
+def window_stats() -> Dict[str, Any]:
+    if _window is None:
+        return {"loaded": False, **_stats}
+    return {
+        "loaded": True,
+        "generation": _window["generation"],
+        "version": _window["version"],
+        "start": _window["start"].isoformat(),
+        "spots": len(_window["spots"]),
+        "hours": _window["n_hours"],
+        "watermark": _window["watermark"].isoformat() if _window["watermark"] else None,
+        "age_seconds": round(time.monotonic() - _window["loaded_at"], 1),
+        "seconds_since_refresh": round(time.monotonic() - _window["refreshed_at"], 1),
+        **_stats,
+    }
@@ -0,0 +1,94 @@
+# File: src/services/notifications.py
+
+import asyncio
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+import asyncpg
+from src.core.config import settings
+
+# Canais usados pelos triggers do banco (ver documentation/database.md)
+FORECAST_UPDATES_CHANNEL = "forecast_updates"      # payload: spot_id
+PREFERENCE_UPDATES_CHANNEL = "preference_updates"  # payload: user_id
+SPOT_UPDATES_CHANNEL = "spot_updates"              # payload: vazio
+
+_handlers: Dict[str, List[Callable[[str], None]]] = defaultdict(list)
+_conn: Optional[asyncpg.Connection] = None
+_listener_task: Optional[asyncio.Task] = None
+_connection_lost: Optional[asyncio.Event] = None
+
+
+def subscribe(channel: str, handler: Callable[[str], None]) -> None:
+    """
+    Registra um handler síncrono para um canal do LISTEN/NOTIFY.
+    O handler recebe o payload da notificação e não deve bloquear.
+    """
+    _handlers[channel].append(handler)
+
+
+def unsubscribe(channel: str, handler: Callable[[str], None]) -> None:
+    if handler in _handlers.get(channel, []):
+        _handlers[channel].remove(handler)
+
+
+def _dispatch(connection, pid, channel: str, payload: str) -> None:
+    for handler in list(_handlers.get(channel, [])):
+        try:
+            handler(payload)
+        except Exception as e:
+            print(f"AVISO: Handler do canal '{channel}' falhou: {e!r}")
+
+
+async def _listen_forever() -> None:
+    """
+    Mantém uma conexão dedicada (fora do pool) escutando os canais de notificação,
+    reconectando com backoff se a conexão cair.
+    """
+    global _conn, _connection_lost
+    backoff = 1.0
+    channels = (FORECAST_UPDATES_CHANNEL, PREFERENCE_UPDATES_CHANNEL, SPOT_UPDATES_CHANNEL)
+    while True:
+        try:
+            _connection_lost = asyncio.Event()
+            _conn = await asyncpg.connect(
+                user=settings.DB_USER,
+                password=settings.DB_PASSWORD,
+                host=settings.DB_HOST,
+                port=settings.DB_PORT,
+                database=settings.DB_NAME,
+            )
+            _conn.add_termination_listener(lambda _: _connection_lost.set())
+            for channel in channels:
+                await _conn.add_listener(channel, _dispatch)
+            print(f"INFO: Escutando notificações em {', '.join(channels)}.")
+            backoff = 1.0
+            await _connection_lost.wait()
+            print("AVISO: Conexão de notificações perdida. Reconectando...")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"AVISO: Falha ao escutar notificações: {e!r}. Nova tentativa em {backoff:.0f}s.")
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, 60.0)
+
+
+async def start_listener() -> None:
+    """Inicia o listener de notificações em segundo plano (idempotente)."""
+    global _listener_task
+    if _listener_task is None or _listener_task.done():
+        _listener_task = asyncio.create_task(_listen_forever())
+
+
+async def stop_listener() -> None:
+    """Para o listener e fecha a conexão dedicada."""
+    global _listener_task, _conn
+    if _listener_task is not None:
+        _listener_task.cancel()
+        try:
+            await _listener_task
+        except asyncio.CancelledError:
+            pass
+        _listener_task = None
+    if _conn is not None and not _conn.is_closed():
+        await _conn.close()
+    _conn = None
@@ -0,0 +1,62 @@
+# File: src/services/partition_service.py
+
+import asyncio
+import datetime
+import time
+from typing import Any, Dict
+
+from src.core.config import settings
+from src.db import queries
+
+RETENTION_MODES = ("archive", "drop")
+
+# Estado da última manutenção de partições, exposto em /stats
+_maintenance_state: Dict[str, Any] = {"runs": 0, "skipped": 0, "errors": 0, "last_run": None}
+
+
+async def run_partition_maintenance() -> None:
+    """
+    Cria as partições futuras de forecasts e aplica a retenção configurada.
+    Se outra instância estiver fazendo a manutenção, esta rodada é pulada.
+    """
+    # Um valor inválido (ex: "Drop") não pode virar arquivamento ou remoção por engano
+    if settings.FORECAST_RETENTION_MODE not in RETENTION_MODES:
+        raise ValueError(f"FORECAST_RETENTION_MODE inválido: {settings.FORECAST_RETENTION_MODE!r} (use {' ou '.join(RETENTION_MODES)})")
+    started_at = time.perf_counter()
+    cutoff = datetime.datetime.now(datetime.timezone.utc).date() - datetime.timedelta(days=settings.FORECAST_RETENTION_DAYS)
+    result = await queries.maintain_forecast_partitions(
+        months_ahead=settings.FORECAST_PARTITION_MONTHS_AHEAD,
+        retention_cutoff=cutoff,
+        archive=settings.FORECAST_RETENTION_MODE == "archive",
+    )
+    if result is None:
+        _maintenance_state["skipped"] += 1
+        return
+    _maintenance_state["runs"] += 1
+    _maintenance_state["last_run"] = {
+        "at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "duration_ms": round((time.perf_counter() - started_at) * 1000, 2),
+        **result,
+    }
+    if result["retired"]:
+        action = "arquivadas" if settings.FORECAST_RETENTION_MODE == "archive" else "removidas"
+        print(f"INFO: Partições de previsões {action}: {', '.join(result['retired'])}.")
+    if result["default_has_rows"]:
+        print("AVISO: Há previsões na partição forecasts_default (meses sem partição mensal); elas não passam pela retenção.")
+
+
+async def partition_maintenance_loop() -> None:
+    """Executa a manutenção de partições no startup e depois periodicamente."""
+    while True:
+        try:
+            await run_partition_maintenance()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            _maintenance_state["errors"] += 1
+            print(f"AVISO: Manutenção de partições de previsões falhou: {e!r}")
+        await asyncio.sleep(settings.FORECAST_PARTITION_MAINTENANCE_INTERVAL_SECONDS)
+
+
+def maintenance_stats() -> Dict[str, Any]:
+    return dict(_maintenance_state)
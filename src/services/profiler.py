@@ -0,0 +1,128 @@
+# File: src/services/profiler.py
+
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional
+
+from src.core.config import settings
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(_PROJECT_ROOT):
+        filename = os.path.relpath(filename, _PROJECT_ROOT)
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_name} ({filename})"
+
+
+def _folded_stack(frame) -> str:
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class _Session:
+    def __init__(self, thread_id: int, meta: Dict[str, Any]):
+        self.id = uuid.uuid4().hex[:12]
+        self.thread_id = thread_id
+        self.meta = meta
+        self.samples: Counter = Counter()
+        self.started_at = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+
+
+class SamplingProfiler:
+    """
+    Profiler estatístico de parede (wall-clock): uma thread amostra a pilha da thread
+    do event loop a cada `interval` segundos enquanto houver sessões ativas.
+
+    Como o event loop é compartilhado, o perfil de uma requisição também inclui o tempo
+    gasto em requisições concorrentes e em espera de I/O (frames de select/epoll).
+    A saída usa o formato "folded" (`frame;frame;frame contagem`), aceito por
+    flamegraph.pl, speedscope e inferno.
+    """
+
+    def __init__(self, interval: float = 0.005, max_stored: int = 50):
+        self.interval = interval
+        self.max_stored = max_stored
+        self._active: Dict[str, _Session] = {}
+        self._stored: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, meta: Dict[str, Any]) -> str:
+        session = _Session(threading.get_ident(), meta)
+        with self._lock:
+            self._active[session.id] = session
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+                self._thread.start()
+        return session.id
+
+    def stop(self, session_id: str, **meta) -> None:
+        with self._lock:
+            session = self._active.pop(session_id, None)
+            if session is None:
+                return
+            session.duration_ms = round((time.perf_counter() - session.started_at) * 1000, 2)
+            session.meta.update(meta)
+            self._stored[session.id] = session
+            while len(self._stored) > self.max_stored:
+                self._stored.popitem(last=False)
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                sessions = list(self._active.values())
+            frames = sys._current_frames()
+            stacks: Dict[int, str] = {}
+            for session in sessions:
+                if session.thread_id not in stacks:
+                    frame = frames.get(session.thread_id)
+                    stacks[session.thread_id] = _folded_stack(frame) if frame is not None else ""
+            del frames
+            # A pilha é montada fora do lock; só a contagem o segura, porque a sessão pode
+            # ter sido encerrada nesse meio tempo e estar sendo lida por folded()
+            with self._lock:
+                for session in sessions:
+                    stack = stacks[session.thread_id]
+                    if stack and session.id in self._active:
+                        session.samples[stack] += 1
+            time.sleep(self.interval)
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {"id": s.id, "duration_ms": s.duration_ms, "samples": sum(s.samples.values()), **s.meta}
+                for s in reversed(self._stored.values())
+            ]
+
+    def folded(self, session_id: Optional[str] = None) -> Optional[str]:
+        """Saída folded de um perfil, ou a soma de todos os perfis guardados (janela móvel)."""
+        with self._lock:
+            if session_id is not None:
+                session = self._stored.get(session_id)
+                if session is None:
+                    return None
+                samples = Counter(session.samples)
+            else:
+                samples = Counter()
+                for session in self._stored.values():
+                    samples.update(session.samples)
+        return "\n".join(f"{stack} {count}" for stack, count in samples.most_common())
+
+
+profiler = SamplingProfiler(interval=settings.PROFILING_INTERVAL_SECONDS, max_stored=settings.PROFILING_MAX_STORED)
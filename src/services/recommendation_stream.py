@@ -0,0 +1,164 @@
+# File: src/services/recommendation_stream.py
+
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Hashable, Optional, Set
+
+from src.core.config import settings
+from src.services import notifications
+
+
+class _Topic:
+    """
+    Um conjunto de assinantes com entradas idênticas (mesmo usuário e mesmos critérios).
+    Cada mudança relevante dispara um único recálculo, compartilhado por todos os assinantes.
+    Os assinantes recebem tuplas (evento, dados): "recommendations" com o payload JSON ou
+    "error" quando o recálculo falha (que é tentado de novo com backoff).
+    """
+
+    def __init__(self, key: Hashable, user_id: str, spot_ids: FrozenSet[int], compute: Callable[[], Awaitable[str]]):
+        self.key = key
+        self.user_id = user_id
+        self.spot_ids = spot_ids
+        self.compute = compute
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.last_payload: Optional[str] = None
+        self.last_digest: Optional[str] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._periodic_task: Optional[asyncio.Task] = None
+        self._computing = False
+        self._dirty = False
+        self._retry_delay = settings.RECOMMENDATION_STREAM_RETRY_INITIAL_SECONDS
+
+    def schedule_refresh(self, delay: float) -> None:
+        # Debounce: várias notificações em sequência geram um único recálculo
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh(delay))
+        elif self._computing:
+            # O recálculo em andamento pode ter lido os dados antigos: roda de novo ao terminar
+            self._dirty = True
+
+    async def _refresh(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        while True:
+            self._dirty = False
+            self._computing = True
+            try:
+                payload = await self.compute()
+            except Exception as e:
+                delay = self._handle_error(e)
+            else:
+                self._retry_delay = settings.RECOMMENDATION_STREAM_RETRY_INITIAL_SECONDS
+                self.publish(payload)
+                if not self._dirty:
+                    return
+                delay = settings.RECOMMENDATION_STREAM_DEBOUNCE_SECONDS
+            finally:
+                self._computing = False
+            await asyncio.sleep(delay)
+
+    def _handle_error(self, e: Exception) -> float:
+        """Avisa os assinantes da falha e retorna a espera até a próxima tentativa."""
+        retry_after = getattr(e, "retry_after", None) or self._retry_delay
+        self._retry_delay = min(self._retry_delay * 2, settings.RECOMMENDATION_STREAM_RETRY_MAX_SECONDS)
+        print(f"AVISO: Recálculo do stream de recomendações falhou: {e!r}. Nova tentativa em {retry_after:.1f}s.")
+        # Só erros HTTP (perfil inexistente, sobrecarga) têm detalhe seguro para o cliente
+        error = {
+            "status_code": getattr(e, "status_code", 500),
+            "detail": getattr(e, "detail", None) or "Failed to refresh recommendations.",
+            "retry_after": retry_after,
+        }
+        # Depois de um erro, o próximo resultado é reenviado mesmo que não tenha mudado
+        self.last_digest = None
+        data = json.dumps(error)
+        for queue in self.subscribers:
+            queue.put_nowait(("error", data))
+        return retry_after
+
+    def publish(self, payload: str) -> None:
+        digest = hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+        if digest == self.last_digest:
+            return
+        self.last_payload, self.last_digest = payload, digest
+        for queue in self.subscribers:
+            queue.put_nowait(("recommendations", payload))
+
+    async def _periodic(self, interval: float) -> None:
+        # Rede de segurança: offsets de dia mudam à meia-noite sem nenhuma notificação
+        while True:
+            await asyncio.sleep(interval)
+            self.schedule_refresh(0)
+
+    def start(self) -> None:
+        self.schedule_refresh(0)
+        self._periodic_task = asyncio.create_task(self._periodic(settings.RECOMMENDATION_STREAM_REFRESH_SECONDS))
+
+    def stop(self) -> None:
+        for task in (self._refresh_task, self._periodic_task):
+            if task is not None:
+                task.cancel()
+
+
+_topics: Dict[Hashable, _Topic] = {}
+_handlers_registered = False
+
+
+def _on_forecast_update(payload: str) -> None:
+    try:
+        spot_id = int(payload)
+    except ValueError:
+        return
+    for topic in list(_topics.values()):
+        if spot_id in topic.spot_ids:
+            topic.schedule_refresh(settings.RECOMMENDATION_STREAM_DEBOUNCE_SECONDS)
+
+
+def _on_preference_update(payload: str) -> None:
+    for topic in list(_topics.values()):
+        if topic.user_id == payload:
+            topic.schedule_refresh(settings.RECOMMENDATION_STREAM_DEBOUNCE_SECONDS)
+
+
+def _ensure_handlers() -> None:
+    global _handlers_registered
+    if not _handlers_registered:
+        notifications.subscribe(notifications.FORECAST_UPDATES_CHANNEL, _on_forecast_update)
+        notifications.subscribe(notifications.PREFERENCE_UPDATES_CHANNEL, _on_preference_update)
+        _handlers_registered = True
+
+
+def subscribe(key: Hashable, user_id: str, spot_ids: FrozenSet[int], compute: Callable[[], Awaitable[str]]) -> asyncio.Queue:
+    """
+    Inscreve um cliente no tópico `key`, criando-o se necessário.
+    `compute` retorna o payload JSON serializado das recomendações.
+    A fila recebe o último payload conhecido (se houver) e depois cada payload que mudar,
+    como tuplas (evento, dados).
+    """
+    _ensure_handlers()
+    topic = _topics.get(key)
+    if topic is None:
+        topic = _topics[key] = _Topic(key, user_id, spot_ids, compute)
+        topic.start()
+    queue: asyncio.Queue = asyncio.Queue()
+    if topic.last_payload is not None:
+        queue.put_nowait(("recommendations", topic.last_payload))
+    topic.subscribers.add(queue)
+    return queue
+
+
+def unsubscribe(key: Hashable, queue: asyncio.Queue) -> None:
+    topic = _topics.get(key)
+    if topic is None:
+        return
+    topic.subscribers.discard(queue)
+    if not topic.subscribers:
+        topic.stop()
+        del _topics[key]
+
+
+def stream_stats() -> Dict[str, Any]:
+    return {
+        "topics": len(_topics),
+        "subscribers": sum(len(topic.subscribers) for topic in _topics.values()),
+    }
@@ -0,0 +1,317 @@
+# File: src/services/score_store.py
+
+import asyncio
+import datetime
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from src.core import deadline
+from src.core.config import settings
+from src.services import forecast_window, notifications
+from src.services.scoring_service import SURF_LEVELS, calculate_score_matrices
+
+# Scores pré-calculados para quem não tem preferências personalizadas: nesse caso o score
+# depende só de (spot, nível), então uma matriz spots x horas por nível atende todos os
+# usuários. Junto de cada matriz fica a melhor hora de cada spot em cada dia local.
+#
+# Quando a janela de previsões é recarregada por completo, tudo é recalculado. Quando só
+# algumas células (spot, hora) mudam, apenas essas células e os dias locais afetados são
+# recalculados, no lugar, com as mesmas fórmulas. O que a janela não enxergar (ver a marca
+# d'água em forecast_window.py) só entra na próxima carga completa.
+
+DETAILED_SCORE_NAMES = ("wave_score", "wind_score", "tide_score", "air_temperature_score", "water_temperature_score")
+
+_store: Optional[Dict[str, Any]] = None
+_lock: Optional[asyncio.Lock] = None
+_dirty = False
+_refresh_requested: Optional[asyncio.Event] = None
+# Atualização disparada por get_score_store, compartilhada pelas requisições que chegam enquanto roda
+_request_refresh: Optional[asyncio.Future] = None
+_subscribed = False
+# Pares (linha do spot, dia local) com a melhor hora alterada desde a última leitura
+# por take_pending_days; _pending_all indica que tudo mudou (recálculo completo).
+_pending_days: Set[Tuple[int, int]] = set()
+_pending_all = False
+_stats = {"rebuilds": 0, "incremental_updates": 0, "rescored_cells": 0, "last_rebuild_seconds": None, "last_update_ms": None}
+
+
+def _on_forecast_update(payload: str) -> None:
+    global _dirty
+    _dirty = True
+    if _refresh_requested is not None:
+        _refresh_requested.set()
+
+
+def _ensure_subscribed() -> None:
+    global _subscribed
+    if not _subscribed:
+        notifications.subscribe(notifications.FORECAST_UPDATES_CHANNEL, _on_forecast_update)
+        _subscribed = True
+
+
+def daily_bests(overall: np.ndarray, day_index: np.ndarray, n_days: int) -> Dict[str, np.ndarray]:
+    """Melhor hora (a mais cedo, em caso de empate) e seu score para cada spot em cada dia local."""
+    n_spots = overall.shape[0]
+    columns = np.full((n_spots, n_days), -1, dtype=np.int64)
+    scores = np.full((n_spots, n_days), np.nan)
+    masked = np.where(np.isnan(overall), -np.inf, overall)
+    rows = np.arange(n_spots)
+    for day in range(n_days):
+        in_day = np.where(day_index == day, masked, -np.inf)
+        best = in_day.argmax(axis=1)
+        best_scores = in_day[rows, best]
+        found = np.isfinite(best_scores)
+        columns[found, day] = best[found]
+        scores[found, day] = best_scores[found]
+    return {"column": columns, "score": scores}
+
+
+def _update_daily_best(daily_best: Dict[str, np.ndarray], overall: np.ndarray, day_index: np.ndarray, row: int, day: int) -> None:
+    columns = np.flatnonzero(day_index[row] == day)
+    values = np.where(np.isnan(overall[row, columns]), -np.inf, overall[row, columns])
+    best = int(values.argmax())
+    if np.isfinite(values[best]):
+        daily_best["column"][row, day] = columns[best]
+        daily_best["score"][row, day] = values[best]
+    else:
+        daily_best["column"][row, day] = -1
+        daily_best["score"][row, day] = np.nan
+
+
+def _build_store(window: Dict[str, Any]) -> Dict[str, Any]:
+    levels, daily_best = {}, {}
+    for surf_level in SURF_LEVELS:
+        levels[surf_level] = calculate_score_matrices(window["fields"], window["conditions"], window["level_prefs"][surf_level], surf_level)
+        daily_best[surf_level] = daily_bests(levels[surf_level]["overall_score"], window["day_index"], window["n_days"])
+    return {"generation": window["generation"], "version": window["version"], "window": window, "levels": levels, "daily_best": daily_best}
+
+
+def _apply_cell_changes(store: Dict[str, Any], rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+    """
+    Recalcula, em todos os níveis, só as células alteradas e os dias locais que as contêm.
+    Retorna os pares (linha do spot, dia local) afetados.
+    """
+    window = store["window"]
+    # Cada célula vira uma linha (n_células, 1): as mesmas fórmulas, elemento a elemento
+    cell_fields = {name: matrix[rows, cols][:, None] for name, matrix in window["fields"].items()}
+    cell_conditions = {
+        "swell_direction_score": window["conditions"]["swell_direction_score"][rows, cols][:, None],
+        "wind_terral": window["conditions"]["wind_terral"][rows, cols][:, None],
+        "tide_score": window["conditions"]["tide_score"][rows, cols][:, None],
+        "has_wind_directions": window["conditions"]["has_wind_directions"][rows],
+    }
+    day_pairs = np.unique(np.stack([rows, window["day_index"][rows, cols]], axis=1), axis=0)
+    for surf_level in SURF_LEVELS:
+        cell_prefs = {field: values[rows] for field, values in window["level_prefs"][surf_level].items()}
+        cell_scores = calculate_score_matrices(cell_fields, cell_conditions, cell_prefs, surf_level)
+        level = store["levels"][surf_level]
+        for name, values in cell_scores.items():
+            level[name][rows, cols] = values[:, 0]
+
+        if len(day_pairs) > len(window["spots"]):
+            store["daily_best"][surf_level] = daily_bests(level["overall_score"], window["day_index"], window["n_days"])
+        else:
+            for row, day in day_pairs.tolist():
+                _update_daily_best(store["daily_best"][surf_level], level["overall_score"], window["day_index"], row, day)
+    store["version"] = window["version"]
+    return day_pairs
+
+
+async def refresh_scores(full_only: bool = False) -> Dict[str, Any]:
+    """
+    Aplica as mudanças de previsão às matrizes de score: recálculo completo quando a janela
+    foi recarregada e incremental quando só algumas células mudaram. Com full_only, não
+    busca mudanças, só garante que a janela e as matrizes existam e sejam do dia atual.
+    """
+    global _store, _lock, _dirty, _pending_all
+    _ensure_subscribed()
+    if _lock is None:
+        _lock = asyncio.Lock()
+    async with _lock:
+        if not full_only:
+            _dirty = False
+        window, changes = await forecast_window.refresh_forecast_window(full_only=full_only)
+        if _store is None or _store["generation"] != window["generation"]:
+            started = time.perf_counter()
+            # Recalcula fora do event loop; a janela nova ainda não é vista por ninguém
+            _store = await asyncio.to_thread(_build_store, window)
+            _pending_all = True
+            _pending_days.clear()
+            _stats["rebuilds"] += 1
+            _stats["last_rebuild_seconds"] = round(time.perf_counter() - started, 3)
+            print(f"INFO: Matrizes de score por nível recalculadas em {_stats['last_rebuild_seconds']}s.")
+        elif changes is not None and len(changes[0]):
+            # Sem await entre a escrita na janela e esta atualização: leitores nunca veem as duas fora de sincronia
+            started = time.perf_counter()
+            _pending_days.update(map(tuple, _apply_cell_changes(_store, *changes).tolist()))
+            _stats["incremental_updates"] += 1
+            _stats["rescored_cells"] += len(changes[0])
+            _stats["last_update_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return _store
+
+
+async def get_score_store() -> Dict[str, Any]:
+    """
+    Retorna as matrizes de score por nível, atualizadas com as mudanças de previsão já
+    notificadas (ou buscadas há menos de FORECAST_WINDOW_TTL_SECONDS).
+    O resultado é compartilhado e não deve ser mutado.
+
+    A atualização é global: roda sem o prazo da requisição e não é cancelada se ela desistir.
+    Quem chama espera só até o próprio prazo (DeadlineExceeded).
+    """
+    global _request_refresh
+    _ensure_subscribed()
+    if _store is not None and not _dirty and forecast_window.is_current():
+        window = _store["window"]
+        if time.monotonic() - window["refreshed_at"] <= settings.FORECAST_WINDOW_TTL_SECONDS:
+            return _store
+    # Com _dirty, a atualização em andamento pode ter começado antes da notificação
+    if _request_refresh is None or _request_refresh.done() or _dirty:
+        _request_refresh = deadline.detached(refresh_scores())
+        # Se todos desistirem, o erro não é lido por ninguém (e o asyncio reclamaria)
+        _request_refresh.add_done_callback(lambda t: t.cancelled() or t.exception())
+    try:
+        return await asyncio.wait_for(asyncio.shield(_request_refresh), timeout=deadline.timeout())
+    except asyncio.TimeoutError as e:
+        if deadline.expired():
+            raise deadline.DeadlineExceeded() from e
+        raise
+
+
+async def score_refresh_loop(after_refresh: Sequence[Callable[[], Awaitable[None]]] = ()) -> None:
+    """
+    Mantém as matrizes atualizadas em segundo plano: a cada notificação de previsão
+    (agrupando as que chegam em FORECAST_REFRESH_DEBOUNCE_SECONDS) e, na falta delas,
+    a cada FORECAST_WINDOW_TTL_SECONDS. Depois de cada atualização, executa os
+    callbacks de after_refresh (ex.: resumos diários).
+    """
+    global _refresh_requested
+    _ensure_subscribed()
+    _refresh_requested = asyncio.Event()
+    while True:
+        try:
+            await refresh_scores()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"AVISO: Atualização das matrizes de score falhou: {e!r}")
+        # Cada callback roda mesmo que a atualização ou outro callback tenha falhado
+        for callback in after_refresh:
+            try:
+                await callback()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"AVISO: Callback {getattr(callback, '__name__', callback)!r} após a atualização das matrizes falhou: {e!r}")
+        try:
+            await asyncio.wait_for(_refresh_requested.wait(), timeout=settings.FORECAST_WINDOW_TTL_SECONDS)
+            await asyncio.sleep(settings.FORECAST_REFRESH_DEBOUNCE_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        _refresh_requested.clear()
+
+
+def current_store() -> Optional[Dict[str, Any]]:
+    """Matrizes atuais, sem buscar mudanças (None antes da primeira carga)."""
+    return _store
+
+
+def take_pending_days() -> Tuple[Optional[Dict[str, Any]], List[Tuple[int, int]]]:
+    """
+    Retorna (matrizes atuais, pares (linha do spot, dia local) cuja melhor hora pode ter mudado
+    desde a chamada anterior) e esvazia a lista de pendências.
+    """
+    global _pending_all
+    if _store is None:
+        return None, []
+    if _pending_all:
+        window = _store["window"]
+        pairs = [(row, day) for row in range(len(window["spots"])) for day in range(window["n_days"])]
+    else:
+        pairs = sorted(_pending_days)
+    _pending_all = False
+    _pending_days.clear()
+    return _store, pairs
+
+
+def restore_pending_days(store: Dict[str, Any], pairs: List[Tuple[int, int]]) -> None:
+    """Devolve pares não processados às pendências, se as matrizes ainda forem as mesmas."""
+    if _store is not None and store["generation"] == _store["generation"]:
+        _pending_days.update(pairs)
+
+
+def best_hours_between(
+    store: Dict[str, Any],
+    surf_level: str,
+    spot_id: int,
+    start_utc: datetime.datetime,
+    end_utc: datetime.datetime,
+    min_score: float
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Melhor hora de um spot no intervalo fechado [start_utc, end_utc] (a mais cedo, em caso
+    de empate), como lista de zero ou um item: vazia se nenhuma hora passa de min_score.
+    Retorna None se o spot ou o intervalo não estiverem cobertos pela janela (quem chama
+    deve então calcular pelo caminho normal).
+    """
+    window = store["window"]
+    row = window["spot_index"].get(spot_id)
+    if row is None or surf_level not in store["levels"]:
+        return None
+    first = int(-(-(start_utc - window["start"]).total_seconds() // 3600))  # primeira hora cheia >= início
+    last = forecast_window.hour_column(window, end_utc)
+    if first < 0 or last >= window["n_hours"]:
+        return None
+    if last < first:
+        return []
+
+    scores = store["levels"][surf_level]
+    column = _full_day_best_column(store, surf_level, row, first, last)
+    if column is None:
+        overall = scores["overall_score"][row, first:last + 1]
+        if not np.any(overall > min_score):
+            return []
+        column = first + int(np.nanargmax(overall))
+    elif column < 0 or not scores["overall_score"][row, column] > min_score:
+        return []
+    return [{
+        "timestamp_utc": forecast_window.column_timestamp(window, column),
+        "overall_score": float(scores["overall_score"][row, column]),
+        "detailed_scores": {name: float(scores[name][row, column]) for name in DETAILED_SCORE_NAMES},
+        "forecast_conditions": forecast_window.forecast_conditions_at(window, row, column),
+    }]
+
+
+def _full_day_best_column(store: Dict[str, Any], surf_level: str, row: int, first: int, last: int) -> Optional[int]:
+    """Se [first, last] cobre exatamente um dia local do spot, devolve a melhor hora já mantida (-1 se nenhuma)."""
+    day_index = store["window"]["day_index"][row]
+    day = day_index[first]
+    if day_index[last] != day:
+        return None
+    if first > 0 and day_index[first - 1] == day:
+        return None
+    if last < len(day_index) - 1 and day_index[last + 1] == day:
+        return None
+    return int(store["daily_best"][surf_level]["column"][row, day])
+
+
+def daily_best(store: Dict[str, Any], surf_level: str, spot_id: int, local_date: datetime.date) -> Optional[Dict[str, Any]]:
+    """Melhor hora de um spot em um dia local, pelo nível, ou None se não houver hora pontuável na janela."""
+    window = store["window"]
+    row = window["spot_index"].get(spot_id)
+    day = (local_date - window["day_base"]).days
+    if row is None or surf_level not in store["daily_best"] or not 0 <= day < window["n_days"]:
+        return None
+    column = int(store["daily_best"][surf_level]["column"][row, day])
+    if column < 0:
+        return None
+    return {
+        "timestamp_utc": forecast_window.column_timestamp(window, column),
+        "overall_score": float(store["levels"][surf_level]["overall_score"][row, column]),
+    }
+
+
+def store_stats() -> Dict[str, Any]:
+    return {"generation": _store["generation"] if _store else None, "version": _store["version"] if _store else None, "dirty": _dirty, **_stats}
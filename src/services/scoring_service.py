@@ -1,7 +1,95 @@
 # File: src/services/scoring_service.py
 
 import numpy as np
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+
+# --- Perfil de Score Compilado por Spot ---
+# As direções ideais e o fluxo de maré de um spot não mudam entre uma hora e outra,
+# então são compilados uma única vez. O score de direção do swell (uma curva suave) vira
+# uma tabela de consulta com resolução de 0.1 grau; já a classificação terral/maral do
+# vento tem um corte em 45 graus e é calculada com a diferença angular exata.
+DIRECTION_TABLE_RESOLUTION = 10  # entradas por grau
+DIRECTION_TABLE_SIZE = 360 * DIRECTION_TABLE_RESOLUTION
+
+_TIDE_TYPE_CODES: Dict[str, int] = {}
+_spot_profile_cache: Dict[int, Dict[str, Any]] = {}
+
+def tide_type_code(tide_type: Optional[str]) -> int:
+    """Retorna um código inteiro estável para um tipo de maré (0 para ausente)."""
+    if not tide_type:
+        return 0
+    if tide_type not in _TIDE_TYPE_CODES:
+        _TIDE_TYPE_CODES[tide_type] = len(_TIDE_TYPE_CODES) + 1
+    return _TIDE_TYPE_CODES[tide_type]
+
+def direction_index(direction):
+    """Converte uma direção (escalar ou array, em graus) no índice das tabelas de direção."""
+    return np.rint(np.asarray(direction, dtype=np.float64) * DIRECTION_TABLE_RESOLUTION).astype(np.int64) % DIRECTION_TABLE_SIZE
+
+def min_angular_diff(directions, ideal_directions: np.ndarray) -> np.ndarray:
+    """Menor diferença angular (em graus) entre cada direção (escalar ou array) e as direções ideais."""
+    diff = np.abs(np.asarray(directions, dtype=np.float64)[..., None] - ideal_directions)
+    return np.minimum(diff, 360 - diff).min(axis=-1)
+
+def _min_angular_diff_table(ideal_directions: List[float]) -> np.ndarray:
+    angles = np.arange(DIRECTION_TABLE_SIZE, dtype=np.float64) / DIRECTION_TABLE_RESOLUTION
+    return min_angular_diff(angles, np.asarray(ideal_directions, dtype=np.float64))
+
+def wind_terral(wind_directions, spot_profile: Dict[str, Any]):
+    """Indica se o vento é terral (até 45 graus de uma direção ideal), pela diferença angular exata."""
+    if not spot_profile['has_wind_directions']:
+        return np.zeros(np.shape(wind_directions), dtype=bool)
+    return min_angular_diff(wind_directions, spot_profile['wind_directions']) <= 45
+
+def compile_spot_profile(spot: Dict) -> Dict[str, Any]:
+    """
+    Compila as características ideais de um spot: tabela do score de direção do swell,
+    direções ideais do vento e códigos de fluxo de maré.
+    """
+    swell_dirs = [float(d) for d in (spot.get('ideal_swell_direction') or [])]
+    wind_dirs = [float(d) for d in (spot.get('ideal_wind_direction') or [])]
+    ideal_flow = spot.get('ideal_tide_flow') or []
+
+    if swell_dirs:
+        swell_direction_scores = np.exp(-(_min_angular_diff_table(swell_dirs) ** 2) / (45 ** 2)) * 100
+    else:
+        swell_direction_scores = np.full(DIRECTION_TABLE_SIZE, 50.0)  # Neutro se não houver direção ideal
+
+    return {
+        "signature": _spot_profile_signature(spot),
+        "swell_direction_scores": swell_direction_scores,
+        "has_wind_directions": bool(wind_dirs),
+        "wind_directions": np.asarray(wind_dirs, dtype=np.float64),
+        "ideal_sea_level": float(spot['ideal_sea_level']) if spot.get('ideal_sea_level') is not None else 0.5,
+        "tide_flow_codes": frozenset(tide_type_code(flow) for flow in ideal_flow),
+    }
+
+def _spot_profile_signature(spot: Dict) -> tuple:
+    return (
+        tuple(spot.get('ideal_swell_direction') or ()),
+        tuple(spot.get('ideal_wind_direction') or ()),
+        spot.get('ideal_sea_level'),
+        tuple(spot.get('ideal_tide_flow') or ()),
+    )
+
+def get_spot_profile(spot: Dict) -> Dict[str, Any]:
+    """
+    Retorna o perfil compilado do spot, usando o cache por spot_id.
+    O perfil é recompilado se as características ideais do spot mudarem.
+    """
+    spot_id = spot.get('spot_id')
+    cached = _spot_profile_cache.get(spot_id)
+    if cached is not None and cached['signature'] == _spot_profile_signature(spot):
+        return cached
+    profile = compile_spot_profile(spot)
+    if spot_id is not None:
+        _spot_profile_cache[spot_id] = profile
+    return profile
+
+def prime_spot_profiles(spots: List[Dict]) -> None:
+    """Compila e guarda em cache os perfis de uma lista de spots (ex: ao carregar o catálogo)."""
+    for spot in spots:
+        get_spot_profile(spot)
 
 # --- Lógica do Score de Onda (Baseado em wave_score.py) ---
 def _calculate_swell_size_score(swell_height: float, ideal_height: float, max_height: float) -> float:
@@ -17,33 +105,24 @@ def _calculate_swell_size_score(swell_height: float, ideal_height: float, max_he
         if range_size <= 0: return 0.0
         return 100 * (1 - (swell_height - ideal_height) / range_size)
 
+# *** DICIONÁRIO ATUALIZADO AQUI ***
+IDEAL_PERIODS = {
+    'iniciante': 8, 
+    'maroleiro': 10,  # Maroleiro gosta de onda mais em pé, com mais linha
+    'intermediario': 12,
+    'pro': 15         # Pro busca o máximo de power
+}
+SURF_LEVELS = tuple(IDEAL_PERIODS)
+
 def _calculate_swell_period_score(swell_period: float, surf_level: str) -> float:
-    # *** DICIONÁRIO ATUALIZADO AQUI ***
-    ideal_periods = {
-        'iniciante': 8, 
-        'maroleiro': 10,  # Maroleiro gosta de onda mais em pé, com mais linha
-        'intermediario': 12,
-        'pro': 15         # Pro busca o máximo de power
-    }
-    ideal_period = ideal_periods.get(surf_level, 12) # Padrão para intermediário
+    ideal_period = IDEAL_PERIODS.get(surf_level, 12) # Padrão para intermediário
     score = np.exp(-((swell_period - ideal_period) ** 2) / ideal_period) * 100
     return score
 
-def _calculate_swell_direction_score(swell_direction: float, ideal_directions: list) -> float:
-    if not ideal_directions: return 50.0 # Neutro se não houver direção ideal
-    
-    # Convertendo a lista de ideais para float para evitar TypeError
-    ideal_directions = [float(d) for d in ideal_directions]
-    
-    min_diff = 360
-    for ideal_dir in ideal_directions:
-        diff = abs(swell_direction - ideal_dir)
-        min_diff = min(min_diff, diff, 360 - diff)
-    
-    score = np.exp(-(min_diff**2) / (45**2)) * 100
-    return score
+def _calculate_swell_direction_score(swell_direction: float, spot_profile: Dict[str, Any]) -> float:
+    return float(spot_profile['swell_direction_scores'][direction_index(swell_direction)])
 
-def _calculate_wave_score(forecast: Dict, prefs: Dict, spot: Dict, profile: Dict) -> float:
+def _calculate_wave_score(forecast: Dict, prefs: Dict, spot_profile: Dict, profile: Dict) -> float:
     swell_height = float(forecast.get('swell_height_sg', 0))
     swell_period = float(forecast.get('swell_period_sg', 0))
     swell_direction = float(forecast.get('swell_direction_sg', 0))
@@ -57,7 +136,7 @@ def _calculate_wave_score(forecast: Dict, prefs: Dict, spot: Dict, profile: Dict
     if size_score < 0: return 0.0 # Se for muito grande, a nota da onda é zero.
 
     period_score = _calculate_swell_period_score(swell_period, profile.get('surf_level', 'intermediario'))
-    direction_score = _calculate_swell_direction_score(swell_direction, spot.get('ideal_swell_direction', []))
+    direction_score = _calculate_swell_direction_score(swell_direction, spot_profile)
 
     # Score Base
     score_base = (size_score * 0.70) + (period_score * 0.15) + (direction_score * 0.15)
@@ -67,26 +146,17 @@ def _calculate_wave_score(forecast: Dict, prefs: Dict, spot: Dict, profile: Dict
 
 
 # --- Lógica do Score de Vento (Baseado em wind_score.py) ---
-def _calculate_wind_score(forecast: Dict, prefs: Dict, spot: Dict) -> float:
+def _calculate_wind_score(forecast: Dict, prefs: Dict, spot_profile: Dict) -> float:
     wind_speed = float(forecast.get('wind_speed_sg', 0))
     wind_dir = float(forecast.get('wind_direction_sg', 0))
     max_wind = float(prefs.get('max_wind_speed', 8.0))
-    ideal_dirs = spot.get('ideal_wind_direction', [])
-
-    # Convertendo a lista de ideais para float para evitar TypeError
-    ideal_dirs = [float(d) for d in ideal_dirs]
 
     if wind_speed > max_wind:
         return 0.0
 
-    if not ideal_dirs: return 75.0 # Neutro se não houver direção ideal
-
-    min_diff = 360
-    for ideal_dir in ideal_dirs:
-        diff = abs(wind_dir - ideal_dir)
-        min_diff = min(min_diff, diff, 360 - diff)
+    if not spot_profile['has_wind_directions']: return 75.0 # Neutro se não houver direção ideal
 
-    if min_diff <= 45: # Terral
+    if wind_terral(wind_dir, spot_profile): # Terral
         # Lógica simplificada: terral é bom, mas vento forte é ruim
         return 100 * (1 - (wind_speed / max_wind))
     else: # Maral/Lateral
@@ -95,17 +165,16 @@ def _calculate_wind_score(forecast: Dict, prefs: Dict, spot: Dict) -> float:
 
 
 # --- Lógica do Score de Maré (Baseado em tide_score.py) ---
-def _calculate_tide_score(forecast: Dict, spot: Dict) -> float:
+def _calculate_tide_score(forecast: Dict, spot_profile: Dict) -> float:
     sea_level = float(forecast.get('sea_level_sg', 0))
-    tide_type = forecast.get('tide_type', '')
-    ideal_level = float(spot.get('ideal_sea_level', 0.5))
-    ideal_flow = spot.get('ideal_tide_flow', [])
+    ideal_level = spot_profile['ideal_sea_level']
+    ideal_flow_codes = spot_profile['tide_flow_codes']
 
     # Score da Altura (curva de sino)
     score_altura = np.exp(-((sea_level - ideal_level) ** 2) / 0.5) * 100
 
     # Penalidade pelo fluxo
-    if ideal_flow and tide_type not in ideal_flow:
+    if ideal_flow_codes and tide_type_code(forecast.get('tide_type', '')) not in ideal_flow_codes:
         score_altura *= 0.8
     
     return round(score_altura, 2)
@@ -132,9 +201,10 @@ async def calculate_overall_score(forecast: Dict, prefs: Dict, spot: Dict, profi
     """
     Calcula o score geral e os scores detalhados para uma única hora de previsão.
     """
-    wave_score = _calculate_wave_score(forecast, prefs, spot, profile)
-    wind_score = _calculate_wind_score(forecast, prefs, spot)
-    tide_score = _calculate_tide_score(forecast, spot)
+    spot_profile = get_spot_profile(spot)
+    wave_score = _calculate_wave_score(forecast, prefs, spot_profile, profile)
+    wind_score = _calculate_wind_score(forecast, prefs, spot_profile)
+    tide_score = _calculate_tide_score(forecast, spot_profile)
     water_temperature_score = _calculate_water_temperature_score(forecast, prefs)
     air_temperature_score = _calculate_air_temperature_score(forecast, prefs)
 
@@ -156,4 +226,120 @@ async def calculate_overall_score(forecast: Dict, prefs: Dict, spot: Dict, profi
             "air_temperature_score": air_temperature_score,
             "water_temperature_score": water_temperature_score,
         }
-    }
\ No newline at end of file
+    }
+
+
+# --- Caminho Vetorizado (matrizes spot x hora) ---
+# Mesmas fórmulas do cálculo escalar acima, aplicadas de uma vez a uma matriz de previsões.
+# Células com algum dado de entrada ausente (NaN) resultam em score NaN.
+
+def tide_type_from_code(code: int) -> Optional[str]:
+    for tide_type, tide_code in _TIDE_TYPE_CODES.items():
+        if tide_code == code:
+            return tide_type
+    return None
+
+def calculate_spot_condition_matrices(fields: Dict[str, np.ndarray], tide_codes: np.ndarray, spot_profiles: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """
+    Calcula, uma vez por janela de previsões, as partes do score que só dependem do spot e da
+    previsão (não do nível nem das preferências): score de direção do swell, máscara terral
+    do vento e score de maré. Todas as matrizes têm formato (n_spots, n_horas).
+    """
+    n_spots = len(spot_profiles)
+    swell_idx = direction_index(np.nan_to_num(fields['swell_direction_sg']))
+    wind_directions = np.nan_to_num(fields['wind_direction_sg'])
+    direction_scores = np.empty(swell_idx.shape)
+    terral = np.empty(wind_directions.shape, dtype=bool)
+    flow_ok = np.empty(tide_codes.shape, dtype=bool)
+    for i, spot_profile in enumerate(spot_profiles):
+        direction_scores[i] = spot_profile['swell_direction_scores'][swell_idx[i]]
+        terral[i] = wind_terral(wind_directions[i], spot_profile)
+        flow_codes = spot_profile['tide_flow_codes']
+        flow_ok[i] = np.isin(tide_codes[i], list(flow_codes)) if flow_codes else True
+
+    has_wind_dirs = np.array([p['has_wind_directions'] for p in spot_profiles], dtype=bool).reshape(n_spots, 1)
+    ideal_sea_level = np.array([p['ideal_sea_level'] for p in spot_profiles], dtype=np.float64).reshape(n_spots, 1)
+
+    tide_score = np.exp(-((fields['sea_level_sg'] - ideal_sea_level) ** 2) / 0.5) * 100
+    tide_score = np.round(np.where(flow_ok, tide_score, tide_score * 0.8), 2)
+
+    return {
+        "swell_direction_score": direction_scores,
+        "wind_terral": terral,
+        "has_wind_directions": has_wind_dirs,
+        "tide_score": tide_score,
+    }
+
+def calculate_score_matrices(
+    fields: Dict[str, np.ndarray],
+    conditions: Dict[str, np.ndarray],
+    prefs: Dict[str, np.ndarray],
+    surf_level: str
+) -> Dict[str, np.ndarray]:
+    """
+    Calcula o score geral e os scores detalhados para uma matriz (n_spots, n_horas) de previsões.
+    `prefs` traz um vetor (n_spots,) por campo de preferência; `conditions` vem de
+    calculate_spot_condition_matrices (fatiado nas mesmas horas que `fields`).
+    """
+    col = lambda name: np.asarray(prefs[name], dtype=np.float64)[:, None]
+    ideal_height, max_height, max_wind = col('ideal_swell_height'), col('max_swell_height'), col('max_wind_speed')
+    ideal_air, ideal_water = col('ideal_air_temperature'), col('ideal_water_temperature')
+
+    swell_height = fields['swell_height_sg']
+    wind_speed = fields['wind_speed_sg']
+    ideal_period = IDEAL_PERIODS.get(surf_level, 12)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        range_size = max_height - ideal_height
+        size_score = np.where(
+            swell_height > max_height, -100.0,
+            np.where(
+                swell_height < ideal_height * 0.3, 0.0,
+                np.where(
+                    swell_height <= ideal_height, 100 * (swell_height / ideal_height),
+                    np.where(range_size <= 0, 0.0, 100 * (1 - (swell_height - ideal_height) / range_size))
+                )
+            )
+        )
+        period_score = np.exp(-((fields['swell_period_sg'] - ideal_period) ** 2) / ideal_period) * 100
+        score_base = (size_score * 0.70) + (period_score * 0.15) + (conditions['swell_direction_score'] * 0.15)
+        wave_score = np.where(size_score < 0, 0.0, np.round(np.clip(score_base, 0, 100), 2))
+
+        wind_factor = 1 - (wind_speed / max_wind)
+        wind_score = np.where(
+            wind_speed > max_wind, 0.0,
+            np.where(
+                ~conditions['has_wind_directions'], 75.0,
+                np.where(conditions['wind_terral'], 100 * wind_factor, 75 * wind_factor)
+            )
+        )
+
+    tide_score = conditions['tide_score']
+    air_temperature_score = np.round(np.exp(-0.04 * ((fields['air_temperature_sg'] - ideal_air) ** 2)) * 100, 2)
+    water_temperature_score = np.round(np.exp(-0.08 * ((fields['water_temperature_sg'] - ideal_water) ** 2)) * 100, 2)
+
+    overall_score = np.round(
+        (wave_score * 0.50) +
+        (wind_score * 0.33) +
+        (tide_score * 0.15) +
+        (air_temperature_score * 0.01) +
+        (water_temperature_score * 0.01),
+        2
+    )
+
+    # Entradas ausentes tornam a célula não pontuável
+    missing = np.zeros(overall_score.shape, dtype=bool)
+    for name in ('swell_height_sg', 'swell_period_sg', 'swell_direction_sg', 'wind_speed_sg',
+                 'wind_direction_sg', 'sea_level_sg', 'air_temperature_sg', 'water_temperature_sg'):
+        missing |= np.isnan(fields[name])
+    overall_score[missing] = np.nan
+
+    return {
+        "overall_score": overall_score,
+        "wave_score": wave_score,
+        "wind_score": wind_score,
+        "tide_score": tide_score,
+        "air_temperature_score": air_temperature_score,
+        "water_temperature_score": water_temperature_score,
+    }
+
@@ -0,0 +1,77 @@
+# File: src/services/single_flight.py
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from src.core import deadline
+
+_registry: Dict[str, "SingleFlight"] = {}
+
+
+class SingleFlight:
+    """
+    Coalesce leituras idênticas em andamento: chamadas concorrentes com a mesma chave
+    compartilham uma única execução e recebem o mesmo resultado (ou a mesma exceção).
+
+    A computação roda em uma task própria. Se um dos clientes desconecta ou estoura o
+    timeout, os demais não são afetados; se todos desistirem, a computação é cancelada
+    (junto com as queries em andamento). A task não herda o prazo (src/core/deadline.py) da
+    requisição que a iniciou: vale o mais longo entre os de quem espera, e cada um espera só
+    até o próprio prazo (DeadlineExceeded). O resultado é compartilhado entre todos e não
+    deve ser mutado.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+        self._deadlines: Dict[asyncio.Task, deadline.SharedDeadline] = {}
+        self.stats = {"executions": 0, "coalesced": 0, "errors": 0, "timeouts": 0, "abandoned": 0}
+        _registry[name] = self
+
+    def _on_done(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        self._deadlines.pop(task, None)
+        if not task.cancelled() and task.exception() is not None:
+            self.stats["errors"] += 1
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            shared_deadline = deadline.SharedDeadline()
+            task = deadline.detached(fn(), shared_deadline)
+            self._inflight[key] = task
+            self._deadlines[task] = shared_deadline
+            task.add_done_callback(lambda t, k=key: self._on_done(k, t))
+            self.stats["executions"] += 1
+        else:
+            self.stats["coalesced"] += 1
+
+        self._deadlines[task].join(deadline.current())
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout=deadline.wait_timeout(timeout))
+        except asyncio.TimeoutError as e:
+            self.stats["timeouts"] += 1
+            if deadline.expired():
+                raise deadline.DeadlineExceeded() from e
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if not task.done():
+                    # Ninguém mais espera o resultado; novas chamadas iniciam outra execução
+                    self.stats["abandoned"] += 1
+                    if self._inflight.get(key) is task:
+                        del self._inflight[key]
+                    task.cancel()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "in_flight": len(self._inflight)}
+
+
+def single_flight_stats() -> Dict[str, Dict[str, Any]]:
+    """Contadores de coalescência de todos os SingleFlight registrados."""
+    return {name: flight.snapshot() for name, flight in _registry.items()}
@@ -0,0 +1,104 @@
+# File: src/services/user_context.py
+
+import asyncio
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from src.core.config import settings
+from src.db import queries
+from src.services import notifications
+from src.services.single_flight import SingleFlight
+
+# Contexto de cada usuário (perfil, nível de surf e preferências customizadas ativas por
+# spot), usado pelas recomendações e pelas rotas de preferências. Fica em cache por
+# USER_CONTEXT_TTL_SECONDS e é invalidado pelas rotas de escrita (PUT /profile e
+# PUT /preferences) e pelo canal preference_updates, que avisa as outras réplicas.
+# O contexto é compartilhado entre requisições e não deve ser mutado.
+
+_contexts: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+# Marca da última invalidação de cada usuário (um contador global, incrementado a cada
+# invalidação): uma carga que começou antes de uma invalidação do mesmo usuário não grava
+# o resultado no cache (ele pode ter sido lido antes da escrita). Invalidações de outros
+# usuários não afetam a carga. O dicionário é limitado; para um usuário descartado dele,
+# vale a maior marca descartada, o que no pior caso só deixa de gravar uma carga.
+_invalidation_clock = 0
+_invalidated_at: Dict[str, int] = {}
+_pruned_up_to = 0
+_subscribed = False
+_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+context_flight = SingleFlight("user_context")
+
+
+def _on_preference_update(payload: str) -> None:
+    invalidate(payload)
+
+
+def _ensure_subscribed() -> None:
+    global _subscribed
+    if not _subscribed:
+        notifications.subscribe(notifications.PREFERENCE_UPDATES_CHANNEL, _on_preference_update)
+        _subscribed = True
+
+
+def _last_invalidation(user_id: str) -> int:
+    return _invalidated_at.get(user_id, _pruned_up_to)
+
+
+async def _load(user_id: str) -> Optional[Dict[str, Any]]:
+    started_at = _invalidation_clock
+    profile, custom_prefs = await asyncio.gather(
+        queries.get_profile_by_id(user_id),
+        queries.get_active_user_spot_preferences(user_id),
+    )
+    if not profile:
+        return None
+    context = {
+        "user_id": user_id,
+        "profile": profile,
+        "surf_level": profile.get('surf_level') or 'intermediario',
+        "custom_prefs": custom_prefs,
+    }
+    if _last_invalidation(user_id) <= started_at:
+        if len(_contexts) >= settings.USER_CONTEXT_MAX_ENTRIES:
+            # Descarta a entrada mais antiga (ordem de inserção)
+            _contexts.pop(next(iter(_contexts)))
+        _contexts[user_id] = (time.monotonic() + settings.USER_CONTEXT_TTL_SECONDS, context)
+    return context
+
+
+async def get_user_context(user_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Retorna o contexto do usuário, do cache ou do banco (cargas simultâneas do mesmo
+    usuário compartilham as consultas). Retorna None se o perfil não existir.
+    """
+    _ensure_subscribed()
+    cached = _contexts.get(user_id)
+    if cached is not None:
+        if cached[0] > time.monotonic():
+            _stats["hits"] += 1
+            return cached[1]
+        _contexts.pop(user_id, None)
+    _stats["misses"] += 1
+    return await context_flight.do(
+        (user_id, _last_invalidation(user_id)),
+        lambda: _load(user_id),
+        timeout=settings.SINGLE_FLIGHT_TIMEOUT_SECONDS
+    )
+
+
+def invalidate(user_id: str) -> None:
+    """Descarta o contexto do usuário nesta instância (chamado após escritas de perfil/preferências)."""
+    global _invalidation_clock, _pruned_up_to
+    _invalidation_clock += 1
+    # Reinsere para manter a ordem de inserção igual à ordem das invalidações
+    _invalidated_at.pop(user_id, None)
+    _invalidated_at[user_id] = _invalidation_clock
+    if len(_invalidated_at) > settings.USER_CONTEXT_MAX_ENTRIES:
+        _pruned_up_to = _invalidated_at.pop(next(iter(_invalidated_at)))
+    _stats["invalidations"] += 1
+    _contexts.pop(user_id, None)
+
+
+def context_stats() -> Dict[str, Any]:
+    return {"entries": len(_contexts), **_stats}
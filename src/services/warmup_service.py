@@ -0,0 +1,130 @@
+# File: src/services/warmup_service.py
+
+import asyncio
+import time
+from typing import Dict, Any
+
+from src.core.config import settings
+from src.db import queries
+from src.db.connection import get_db_pool
+from src.services.scoring_service import calculate_overall_score, prime_spot_profiles
+
+# Estado do warm-up, consultado pelo endpoint /ready
+_warmup_state: Dict[str, Any] = {
+    "status": "pending",  # pending | running | done | failed | disabled
+    "steps": {},
+}
+
+def _finish_step(name: str, started_at: float, **details) -> None:
+    _warmup_state["steps"][name] = {
+        "ok": True,
+        "duration_ms": round((time.perf_counter() - started_at) * 1000, 2),
+        **details,
+    }
+
+async def _fill_pool() -> None:
+    """Abre conexões até o tamanho alvo e prepara os statements quentes em cada uma."""
+    started_at = time.perf_counter()
+    pool = await get_db_pool()
+    target = min(settings.WARMUP_POOL_SIZE or settings.DB_POOL_MAX_SIZE, settings.DB_POOL_MAX_SIZE)
+    # Se a tentativa for cancelada (timeout do warm-up), as conexões já obtidas voltam ao pool
+    acquires = [asyncio.ensure_future(pool.acquire()) for _ in range(target)]
+    try:
+        conns = await asyncio.gather(*acquires)
+        await asyncio.gather(*(queries.prepare_hot_statements(conn) for conn in conns))
+    finally:
+        for acquire in acquires:
+            if not acquire.done():
+                acquire.cancel()
+            elif not acquire.cancelled() and acquire.exception() is None:
+                await pool.release(acquire.result())
+    _finish_step("pool", started_at, connections=target, statements=len(queries.HOT_STATEMENTS))
+
+async def _load_spot_catalog() -> list:
+    """Carrega o catálogo de spots e compila os perfis de score de cada um."""
+    started_at = time.perf_counter()
+    spots = await queries.get_all_spots()
+    prime_spot_profiles(spots)
+    _finish_step("spot_catalog", started_at, spots=len(spots))
+    return spots
+
+async def _run_scoring_pass(spots: list) -> None:
+    """Executa um cálculo de score completo para aquecer os kernels do NumPy."""
+    started_at = time.perf_counter()
+    spot = spots[0] if spots else {"spot_id": None}
+    forecast = {
+        "swell_height_sg": 1.5, "swell_period_sg": 12.0, "swell_direction_sg": 180.0,
+        "wind_speed_sg": 3.0, "wind_direction_sg": 0.0, "sea_level_sg": 0.5, "tide_type": "rising",
+        "air_temperature_sg": 25.0, "water_temperature_sg": 22.0,
+    }
+    prefs = await queries.get_generic_preferences_by_level('intermediario')
+    await calculate_overall_score(forecast, prefs, spot, {"surf_level": "intermediario"})
+    _finish_step("scoring", started_at)
+
+async def run_warmup() -> None:
+    """
+    Aquece a instância antes de receber tráfego: preenche o pool, prepara os
+    statements quentes, carrega o catálogo de spots e roda um passe de scoring.
+    Falhas são registradas no estado (e expostas em /ready), sem derrubar a API, e o
+    warm-up é tentado de novo com backoff exponencial até dar certo.
+    """
+    if not settings.WARMUP_ENABLED:
+        _warmup_state["status"] = "disabled"
+        return
+    backoff = settings.WARMUP_RETRY_INITIAL_SECONDS
+    attempts = 0
+    while True:
+        attempts += 1
+        _warmup_state["status"] = "running"
+        _warmup_state["attempts"] = attempts
+        _warmup_state["steps"] = {}
+        started_at = time.perf_counter()
+        try:
+            await asyncio.wait_for(_warmup_steps(), timeout=settings.WARMUP_TIMEOUT_SECONDS)
+            _warmup_state["status"] = "done"
+            _warmup_state.pop("error", None)
+            print(f"INFO: Warm-up concluído em {(time.perf_counter() - started_at) * 1000:.0f} ms.")
+            return
+        except Exception as e:
+            _warmup_state["status"] = "failed"
+            _warmup_state["error"] = repr(e)
+            print(f"AVISO: Warm-up falhou (tentativa {attempts}): {e!r}; nova tentativa em {backoff:.0f}s.")
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, settings.WARMUP_RETRY_MAX_SECONDS)
+
+async def _warmup_steps() -> None:
+    await _fill_pool()
+    spots = await _load_spot_catalog()
+    await _run_scoring_pass(spots)
+
+async def check_readiness() -> Dict[str, Any]:
+    """
+    Verifica cada dependência da instância e retorna o estado com latências.
+    A instância só está pronta se o banco responde e o warm-up terminou (ou está desativado).
+    """
+    checks: Dict[str, Any] = {}
+
+    started_at = time.perf_counter()
+    try:
+        pool = await get_db_pool()
+        async with pool.acquire(timeout=2.0) as conn:
+            await conn.fetchval("SELECT 1", timeout=2.0)
+        checks["database"] = {"ok": True, "latency_ms": round((time.perf_counter() - started_at) * 1000, 2)}
+        checks["pool"] = {
+            "ok": True,
+            "size": pool.get_size(),
+            "idle": pool.get_idle_size(),
+            "max_size": pool.get_max_size(),
+        }
+    except Exception as e:
+        checks["database"] = {"ok": False, "latency_ms": round((time.perf_counter() - started_at) * 1000, 2), "error": repr(e)}
+
+    checks["warmup"] = {
+        "ok": _warmup_state["status"] in ("done", "disabled"),
+        **_warmup_state,
+    }
+
+    return {
+        "status": "ready" if all(check["ok"] for check in checks.values()) else "not_ready",
+        "checks": checks,
+    }
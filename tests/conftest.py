@@ -0,0 +1,11 @@
+import os
+import sys
+
+# Os testes rodam sem banco: valores fictícios só para que Settings() possa ser importado
+for name, value in {
+    "DB_USER": "test", "DB_PASSWORD": "test", "DB_HOST": "localhost", "DB_PORT": "5432",
+    "DB_NAME": "test", "SUPABASE_URL": "http://localhost", "SUPABASE_JWT_SECRET": "test",
+}.items():
+    os.environ.setdefault(name, value)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from src.api.dependencies.admission import AdmissionLimiter, Overloaded
+
+
+async def _hold(limiter, release: asyncio.Event):
+    async with limiter.admit():
+        await release.wait()
+
+
+def test_slot_handed_to_waiter_is_not_taken_by_uncounted_acquire():
+    async def scenario():
+        limiter = AdmissionLimiter("test", max_concurrency=1, max_queue=1, queue_timeout=1.0)
+        release_a, release_b = asyncio.Event(), asyncio.Event()
+        a = asyncio.create_task(_hold(limiter, release_a))
+        await asyncio.sleep(0.01)
+        b = asyncio.create_task(_hold(limiter, release_b))
+        await asyncio.sleep(0.01)
+        assert limiter.snapshot()["waiting"] == 1
+
+        # A libera a vaga para B, mas B ainda não rodou: _active já é 0
+        release_a.set()
+        await a
+        with pytest.raises(Overloaded) as exc:
+            async with limiter.admit():
+                pass
+        release_b.set()
+        await b
+        return exc.value.status_code, limiter.stats
+
+    status_code, stats = asyncio.run(scenario())
+    assert status_code == 429
+    assert stats["admitted"] == 2
+    assert stats["rejected"] == 1
+
+
+def test_every_acquire_respects_queue_timeout():
+    async def scenario():
+        limiter = AdmissionLimiter("test", max_concurrency=1, max_queue=1, queue_timeout=0.05)
+        release = asyncio.Event()
+        holder = asyncio.create_task(_hold(limiter, release))
+        await asyncio.sleep(0.01)
+        with pytest.raises(Overloaded) as exc:
+            async with limiter.admit():
+                pass
+        release.set()
+        await holder
+        return exc.value.status_code, limiter.snapshot()
+
+    status_code, snapshot = asyncio.run(scenario())
+    assert status_code == 503
+    assert snapshot["timed_out"] == 1
+    assert snapshot["waiting"] == 0
+    assert snapshot["active"] == 0
+
+
+def test_uncontended_acquire_is_not_counted_as_waiting():
+    async def scenario():
+        limiter = AdmissionLimiter("test", max_concurrency=2, max_queue=1, queue_timeout=1.0)
+        release = asyncio.Event()
+        holder = asyncio.create_task(_hold(limiter, release))
+        # O holder está dentro do wait_for de uma aquisição com vaga livre
+        await asyncio.sleep(0)
+        waiting = limiter.snapshot()["waiting"]
+        release.set()
+        await holder
+        return waiting, limiter.stats
+
+    waiting, stats = asyncio.run(scenario())
+    assert waiting == 0
+    assert stats["queued"] == 0
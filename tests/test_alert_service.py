@@ -0,0 +1,176 @@
+import numpy as np
+import pytest
+
+from src.db import queries
+from src.services import score_store
+from src.services.alert_service import _evaluate, _gather_inputs
+from src.services.scoring_service import (
+    SURF_LEVELS,
+    calculate_score_matrices,
+    calculate_spot_condition_matrices,
+    compile_spot_profile,
+    tide_type_code,
+)
+
+SPOTS = [
+    {"spot_id": 1, "ideal_swell_direction": [110.0], "ideal_wind_direction": [0.0, 300.0], "ideal_sea_level": 0.5, "ideal_tide_flow": ["high"]},
+    {"spot_id": 4, "ideal_swell_direction": [180.0, 200.0], "ideal_wind_direction": [], "ideal_sea_level": 1.0, "ideal_tide_flow": []},
+    {"spot_id": 7, "ideal_swell_direction": [90.0], "ideal_wind_direction": [270.0], "ideal_sea_level": 0.2, "ideal_tide_flow": ["low", "high"]},
+]
+# Deslocamento (em horas) do fuso de cada spot: o dia local de cada coluna varia por spot
+UTC_OFFSETS = [0, -3, 10]
+N_HOURS = 96
+FIRST = 5
+
+
+def _window(rng):
+    spot_ids = np.array([spot["spot_id"] for spot in SPOTS], dtype=np.int64)
+    ranges = {
+        "swell_height_sg": (0.2, 3.0), "swell_period_sg": (5.0, 16.0), "wind_speed_sg": (0.0, 12.0),
+        "air_temperature_sg": (15.0, 32.0), "water_temperature_sg": (15.0, 28.0), "sea_level_sg": (-0.5, 1.5),
+    }
+    fields = {}
+    for name in queries.FORECAST_CONDITION_FIELDS:
+        low, high = ranges.get(name, (0.0, 360.0))
+        fields[name] = rng.uniform(low, high, (len(SPOTS), N_HOURS))
+    # Horas sem previsão
+    fields["swell_height_sg"][1, 30:40] = np.nan
+    tide_codes = rng.choice([tide_type_code("low"), tide_type_code("high")], (len(SPOTS), N_HOURS))
+    profiles = [compile_spot_profile(spot) for spot in SPOTS]
+    day_index = np.array([(np.arange(N_HOURS) + offset + 24) // 24 for offset in UTC_OFFSETS], dtype=np.int64)
+    level_prefs = {
+        surf_level: {
+            "ideal_swell_height": rng.uniform(0.8, 1.6, len(SPOTS)),
+            "max_swell_height": rng.uniform(2.0, 3.5, len(SPOTS)),
+            "max_wind_speed": rng.uniform(6.0, 12.0, len(SPOTS)),
+            "ideal_water_temperature": rng.uniform(18.0, 25.0, len(SPOTS)),
+            "ideal_air_temperature": rng.uniform(20.0, 28.0, len(SPOTS)),
+        }
+        for surf_level in SURF_LEVELS
+    }
+    return {
+        "generation": 1,
+        "version": 0,
+        "n_hours": N_HOURS,
+        "spot_ids": spot_ids,
+        "fields": fields,
+        "conditions": calculate_spot_condition_matrices(fields, tide_codes, profiles),
+        "level_prefs": level_prefs,
+        "day_index": day_index,
+        "n_days": int(day_index.max()) + 1,
+    }
+
+
+def _subscriptions(spot_ids, levels, min_scores, custom_prefs):
+    return {
+        "subscription_ids": np.arange(100, 100 + len(spot_ids), dtype=np.int64),
+        "spot_ids": np.array(spot_ids, dtype=np.int64),
+        "levels": np.array(levels, dtype=np.int64),
+        "min_scores": np.array(min_scores, dtype=np.float64),
+        "custom_prefs": np.array(custom_prefs, dtype=np.float64).reshape(len(spot_ids), len(queries.PREFERENCE_FIELDS)),
+    }
+
+
+def _expected_hits(window, subscriptions, first):
+    """Referência: cada assinatura pontuada sozinha, com as preferências efetivas dela."""
+    hits = []
+    spot_rows = {int(spot_id): row for row, spot_id in enumerate(window["spot_ids"])}
+    for sub in range(len(subscriptions["spot_ids"])):
+        row = spot_rows.get(int(subscriptions["spot_ids"][sub]))
+        if row is None:
+            continue
+        surf_level = SURF_LEVELS[subscriptions["levels"][sub]]
+        prefs = {}
+        for i, field in enumerate(queries.PREFERENCE_FIELDS):
+            custom = subscriptions["custom_prefs"][sub, i]
+            prefs[field] = np.array([window["level_prefs"][surf_level][field][row] if np.isnan(custom) else custom])
+        fields = {name: matrix[row:row + 1, first:] for name, matrix in window["fields"].items()}
+        conditions = {name: matrix[row:row + 1, first:] for name, matrix in window["conditions"].items() if name != "has_wind_directions"}
+        conditions["has_wind_directions"] = window["conditions"]["has_wind_directions"][row:row + 1]
+        overall = calculate_score_matrices(fields, conditions, prefs, surf_level)["overall_score"][0]
+
+        days = window["day_index"][row, first:]
+        for day in range(int(days[-1])):
+            columns = np.flatnonzero(days == day)
+            values = np.where(np.isnan(overall[columns]), -np.inf, overall[columns])
+            if not len(columns) or not np.isfinite(values.max()):
+                continue
+            best = int(values.argmax())
+            if values[best] >= subscriptions["min_scores"][sub]:
+                hits.append((sub, day, int(columns[best]), float(values[best])))
+    return hits
+
+
+def _evaluated_hits(window, subscriptions, first):
+    store = score_store._build_store(window)
+    result = _evaluate(_gather_inputs(store, subscriptions, first))
+    hits = list(zip(result["subscriptions"].tolist(), result["days"].tolist(), result["columns"].tolist(), result["scores"].tolist()))
+    return hits, result
+
+
+def _assert_same_hits(actual, expected):
+    assert [hit[:3] for hit in sorted(actual)] == [hit[:3] for hit in sorted(expected)]
+    assert [hit[3] for hit in sorted(actual)] == pytest.approx([hit[3] for hit in sorted(expected)])
+
+
+def _min_scores(n, rng):
+    # Mínimos baixos garantem alertas; os altos, assinaturas sem alerta
+    return rng.choice([0.0, 20.0, 45.0, 60.0, 200.0], n)
+
+
+def test_bulk_evaluation_matches_per_subscription_loop():
+    rng = np.random.default_rng(7)
+    window = _window(rng)
+    nan = np.nan
+    level_default = [float(window["level_prefs"][SURF_LEVELS[0]][field][0]) for field in queries.PREFERENCE_FIELDS]
+    custom_prefs = [
+        [nan] * 5,                              # padrão do nível
+        [nan] * 5,                              # mesmo grupo padrão da anterior
+        [1.2, nan, nan, nan, nan],              # customizada em um campo
+        [1.2, nan, nan, nan, nan],              # mesmo grupo customizado da anterior
+        [1.0, 2.2, 7.0, 21.0, 24.0],            # toda customizada
+        level_default,                          # customizada, mas igual à padrão
+        [nan] * 5,                              # spot fora da janela
+        [0.9, nan, 10.0, nan, nan],
+    ]
+    subscriptions = _subscriptions(
+        spot_ids=[1, 1, 4, 4, 7, 1, 99, 7],
+        levels=[0, 0, 1, 1, 3, 0, 0, 0],
+        min_scores=_min_scores(8, rng),
+        custom_prefs=custom_prefs,
+    )
+    actual, result = _evaluated_hits(window, subscriptions, FIRST)
+    expected = _expected_hits(window, subscriptions, FIRST)
+    assert expected
+    _assert_same_hits(actual, expected)
+    # Grupos: (1, nível 0) padrão; (4, nível 1, 1.2...); (7, nível 3, ...); (7, nível 0, ...)
+    assert result["n_groups"] == 4
+    assert result["n_custom_groups"] == 3
+
+
+def test_bulk_evaluation_without_custom_groups():
+    rng = np.random.default_rng(11)
+    window = _window(rng)
+    subscriptions = _subscriptions(
+        spot_ids=[1, 4, 7, 7, 4],
+        levels=[0, 1, 2, 0, 3],
+        min_scores=_min_scores(5, rng),
+        custom_prefs=[[np.nan] * 5] * 5,
+    )
+    actual, result = _evaluated_hits(window, subscriptions, FIRST)
+    _assert_same_hits(actual, _expected_hits(window, subscriptions, FIRST))
+    assert result["n_custom_groups"] == 0
+
+
+def test_bulk_evaluation_without_default_groups():
+    rng = np.random.default_rng(13)
+    window = _window(rng)
+    subscriptions = _subscriptions(
+        spot_ids=[1, 4, 7],
+        levels=[0, 1, 0],
+        min_scores=_min_scores(3, rng),
+        custom_prefs=[[1.1, 2.4, np.nan, np.nan, np.nan], [0.7, np.nan, 9.0, np.nan, 26.0], [1.3, 2.0, 6.5, 20.0, 23.0]],
+    )
+    actual, result = _evaluated_hits(window, subscriptions, 0)
+    _assert_same_hits(actual, _expected_hits(window, subscriptions, 0))
+    assert result["n_groups"] == result["n_custom_groups"] == 3
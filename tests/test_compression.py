@@ -0,0 +1,92 @@
+import asyncio
+
+from src.api.middleware.compression import CompressionMiddleware
+
+BODY = b'{"spots": "' + b"x" * 4000 + b'"}'
+
+
+class _App:
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, scope, receive, send):
+        self.calls += 1
+        body = BODY if scope["path"] != "/small" else b"{}"
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+
+def _middleware(app, version):
+    return CompressionMiddleware(app, minimum_size=1024, cached_routes=[(r"^/spots$", lambda match: version["value"])])
+
+
+def _request(middleware, path, accept_encoding=None, method="GET", if_none_match=None):
+    headers = [(b"accept-encoding", accept_encoding.encode())] if accept_encoding else []
+    if if_none_match:
+        headers.append((b"if-none-match", if_none_match))
+    scope = {"type": "http", "method": method, "path": path, "headers": headers}
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    return messages[0]["status"], dict(messages[0]["headers"]), messages[1]["body"]
+
+
+def test_etag_is_specific_to_each_encoding():
+    middleware = _middleware(_App(), {"value": 1})
+    _, gzip_headers, _ = _request(middleware, "/spots", "gzip")
+    _, identity_headers, body = _request(middleware, "/spots")
+    assert body == BODY
+    assert gzip_headers[b"content-encoding"] == b"gzip"
+    assert gzip_headers[b"etag"].endswith(b'-gzip"')
+    assert b"content-encoding" not in identity_headers
+    assert identity_headers[b"etag"] == gzip_headers[b"etag"].replace(b"-gzip", b"")
+
+
+def test_vary_is_sent_whether_or_not_the_body_is_compressed():
+    middleware = _middleware(_App(), {"value": 1})
+    for path, accept_encoding in (("/spots", "gzip"), ("/spots", None), ("/small", "gzip"), ("/other", "gzip")):
+        _, headers, _ = _request(middleware, path, accept_encoding)
+        assert headers[b"vary"] == b"Accept-Encoding"
+    _, headers, _ = _request(middleware, "/other", "gzip")
+    assert b"etag" not in headers
+
+
+def test_cached_route_is_served_without_calling_the_app_until_the_version_changes():
+    app, version = _App(), {"value": 1}
+    middleware = _middleware(app, version)
+    for accept_encoding in ("gzip", "gzip", None):
+        _request(middleware, "/spots", accept_encoding)
+    assert app.calls == 1
+    assert middleware.stats["cache_hits"] == 2
+
+    version["value"] = 2
+    _request(middleware, "/spots", "gzip")
+    assert app.calls == 2
+
+
+def test_matching_if_none_match_gets_304():
+    middleware = _middleware(_App(), {"value": 1})
+    _, headers, _ = _request(middleware, "/spots", "gzip")
+    status, not_modified_headers, body = _request(middleware, "/spots", "gzip", if_none_match=b'"other", W/' + headers[b"etag"])
+    assert status == 304
+    assert body == b""
+    assert not_modified_headers[b"etag"] == headers[b"etag"]
+    # O mesmo ETag não vale para outra codificação
+    status, _, _ = _request(middleware, "/spots", None, if_none_match=headers[b"etag"])
+    assert status == 200
+
+
+def test_head_gets_the_get_representation_headers():
+    middleware = _middleware(_App(), {"value": 1})
+    _, get_headers, _ = _request(middleware, "/spots", "gzip")
+    status, head_headers, body = _request(middleware, "/spots", "gzip", method="HEAD")
+    assert status == 200
+    assert body == b""
+    assert head_headers[b"etag"] == get_headers[b"etag"]
+    assert head_headers[b"content-length"] == get_headers[b"content-length"]
@@ -0,0 +1,18 @@
+import time
+
+from src.services.profiler import SamplingProfiler
+
+
+def test_stopped_profile_is_not_mutated_by_the_sampler():
+    profiler = SamplingProfiler(interval=0.001)
+    session_id = profiler.start({"path": "/test"})
+    deadline = time.perf_counter() + 0.05
+    while time.perf_counter() < deadline:
+        sum(range(1000))
+    profiler.stop(session_id)
+
+    folded = profiler.folded(session_id)
+    time.sleep(0.02)
+    assert folded
+    assert profiler.folded(session_id) == folded
+    assert profiler.list_profiles()[0]["samples"] == sum(int(line.rsplit(" ", 1)[1]) for line in folded.splitlines())
@@ -0,0 +1,78 @@
+import asyncio
+import json
+
+from fastapi import HTTPException
+
+from src.core.config import settings
+from src.services import recommendation_stream
+
+
+def _topic(compute):
+    topic = recommendation_stream._Topic(("key",), "user", frozenset({1}), compute)
+    queue = asyncio.Queue()
+    topic.subscribers.add(queue)
+    return topic, queue
+
+
+def _drain(queue):
+    items = []
+    while not queue.empty():
+        items.append(queue.get_nowait())
+    return items
+
+
+def test_notification_during_compute_triggers_a_second_run(monkeypatch):
+    monkeypatch.setattr(settings, "RECOMMENDATION_STREAM_DEBOUNCE_SECONDS", 0.0)
+
+    async def scenario():
+        version = {"value": 1}
+        started = asyncio.Event()
+        proceed = asyncio.Event()
+        calls = []
+
+        async def compute():
+            calls.append(version["value"])
+            read = version["value"]
+            started.set()
+            await proceed.wait()
+            return json.dumps({"version": read})
+
+        topic, queue = _topic(compute)
+        topic.schedule_refresh(0)
+        await started.wait()
+        # Os dados mudam enquanto o recálculo já leu a versão antiga
+        version["value"] = 2
+        topic.schedule_refresh(0)
+        proceed.set()
+        await asyncio.sleep(0.05)
+        return calls, _drain(queue)
+
+    calls, events = asyncio.run(scenario())
+    assert calls == [1, 2]
+    assert events[-1] == ("recommendations", json.dumps({"version": 2}))
+
+
+def test_failed_compute_sends_error_event_and_retries(monkeypatch):
+    monkeypatch.setattr(settings, "RECOMMENDATION_STREAM_RETRY_INITIAL_SECONDS", 0.01)
+
+    async def scenario():
+        attempts = {"count": 0}
+
+        async def compute():
+            attempts["count"] += 1
+            if attempts["count"] == 1:
+                raise HTTPException(status_code=404, detail="User profile not found.")
+            return "[]"
+
+        topic, queue = _topic(compute)
+        topic.schedule_refresh(0)
+        await asyncio.sleep(0.1)
+        return attempts["count"], _drain(queue)
+
+    attempts, events = asyncio.run(scenario())
+    assert attempts == 2
+    assert events[0][0] == "error"
+    error = json.loads(events[0][1])
+    assert error["status_code"] == 404
+    assert error["detail"] == "User profile not found."
+    assert events[1] == ("recommendations", "[]")
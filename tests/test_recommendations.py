@@ -0,0 +1,47 @@
+import datetime
+
+from src.api.routes.recommendations import local_time_windows, weekdays_to_offsets
+from src.core.schemas import DaySelection, TimeWindow
+
+MORNING = TimeWindow(start=datetime.time(6), end=datetime.time(10))
+# Sexta-feira, 22h em São Paulo (UTC-3): em UTC já é sábado
+FRIDAY_NIGHT_SAO_PAULO = datetime.datetime(2025, 9, 6, 1, 0, tzinfo=datetime.timezone.utc)
+
+
+def test_weekdays_to_offsets_counts_from_today():
+    friday = datetime.date(2025, 9, 5)
+    assert weekdays_to_offsets([6, 0], friday) == [1, 2]  # sábado e domingo
+    assert weekdays_to_offsets([5], friday) == [0]
+    assert weekdays_to_offsets([], friday) == [0]
+
+
+def test_weekdays_are_resolved_in_the_spot_timezone():
+    saturday = DaySelection(type='weekdays', values=[6])
+    windows = local_time_windows("America/Sao_Paulo", saturday, MORNING, now=FRIDAY_NIGHT_SAO_PAULO)
+    assert [local_date for _, _, local_date in windows] == [datetime.date(2025, 9, 6)]
+    start_utc, end_utc, _ = windows[0]
+    assert start_utc == datetime.datetime(2025, 9, 6, 9, 0, tzinfo=datetime.timezone.utc)
+    assert end_utc == datetime.datetime(2025, 9, 6, 13, 0, tzinfo=datetime.timezone.utc)
+
+    # Em UTC já é sábado: o mesmo pedido em um spot UTC cai no próprio dia
+    windows = local_time_windows("UTC", saturday, MORNING, now=FRIDAY_NIGHT_SAO_PAULO)
+    assert [local_date for _, _, local_date in windows] == [datetime.date(2025, 9, 6)]
+    friday = DaySelection(type='weekdays', values=[5])
+    windows = local_time_windows("America/Sao_Paulo", friday, MORNING, now=FRIDAY_NIGHT_SAO_PAULO)
+    assert [local_date for _, _, local_date in windows] == [datetime.date(2025, 9, 5)]
+
+
+def test_day_offsets_count_from_the_local_date():
+    offsets = DaySelection(type='offsets', values=[0, 1])
+    windows = local_time_windows("America/Sao_Paulo", offsets, MORNING, now=FRIDAY_NIGHT_SAO_PAULO)
+    assert [local_date for _, _, local_date in windows] == [datetime.date(2025, 9, 5), datetime.date(2025, 9, 6)]
+
+
+def test_invalid_timezone_falls_back_to_utc():
+    offsets = DaySelection(type='offsets', values=[0])
+    windows = local_time_windows("Not/AZone", offsets, MORNING, now=FRIDAY_NIGHT_SAO_PAULO)
+    assert windows == [(
+        datetime.datetime(2025, 9, 6, 6, 0, tzinfo=datetime.timezone.utc),
+        datetime.datetime(2025, 9, 6, 10, 0, tzinfo=datetime.timezone.utc),
+        datetime.date(2025, 9, 6),
+    )]
@@ -0,0 +1,157 @@
+import asyncio
+import datetime
+
+import numpy as np
+import pytest
+
+from src.db import queries
+from src.services import forecast_window, score_store
+from src.services.scoring_service import (
+    SURF_LEVELS,
+    calculate_overall_score,
+    calculate_spot_condition_matrices,
+    compile_spot_profile,
+    tide_type_code,
+)
+
+SPOTS = [
+    {"spot_id": 1, "timezone": "UTC", "ideal_swell_direction": [110.0], "ideal_wind_direction": [0.0, 300.0], "ideal_sea_level": 0.5, "ideal_tide_flow": ["high"]},
+    {"spot_id": 4, "timezone": "America/Sao_Paulo", "ideal_swell_direction": [180.0, 200.0], "ideal_wind_direction": [], "ideal_sea_level": 1.0, "ideal_tide_flow": []},
+    {"spot_id": 7, "timezone": "Australia/Sydney", "ideal_swell_direction": [90.0], "ideal_wind_direction": [270.0], "ideal_sea_level": 0.2, "ideal_tide_flow": ["low", "high"]},
+]
+N_HOURS = 96
+START = datetime.datetime(2026, 3, 1, tzinfo=datetime.timezone.utc)
+TIDES = ("low", "high")
+RANGES = {
+    "swell_height_sg": (0.2, 3.0), "swell_period_sg": (5.0, 16.0), "wind_speed_sg": (0.0, 12.0),
+    "air_temperature_sg": (15.0, 32.0), "water_temperature_sg": (15.0, 28.0), "sea_level_sg": (-0.5, 1.5),
+}
+
+
+def _random_values(rng, shape, missing=0.1):
+    values = {}
+    for name in queries.FORECAST_CONDITION_FIELDS:
+        low, high = RANGES.get(name, (0.0, 360.0))
+        values[name] = rng.uniform(low, high, shape)
+        # Horas sem previsão
+        values[name][rng.random(shape) < missing] = np.nan
+    return values
+
+
+def _window(rng, missing=0.1):
+    spot_ids = np.array([spot["spot_id"] for spot in SPOTS], dtype=np.int64)
+    fields = _random_values(rng, (len(SPOTS), N_HOURS), missing)
+    tide_codes = rng.choice([tide_type_code(tide) for tide in TIDES], (len(SPOTS), N_HOURS))
+    profiles = [compile_spot_profile(spot) for spot in SPOTS]
+    day_index, day_base = forecast_window._local_day_index(SPOTS, START, N_HOURS)
+    level_prefs = {
+        surf_level: {
+            "ideal_swell_height": rng.uniform(0.8, 1.6, len(SPOTS)),
+            "max_swell_height": rng.uniform(2.0, 3.5, len(SPOTS)),
+            "max_wind_speed": rng.uniform(6.0, 12.0, len(SPOTS)),
+            "ideal_water_temperature": rng.uniform(18.0, 25.0, len(SPOTS)),
+            "ideal_air_temperature": rng.uniform(20.0, 28.0, len(SPOTS)),
+        }
+        for surf_level in SURF_LEVELS
+    }
+    return {
+        "generation": 1,
+        "version": 0,
+        "start": START,
+        "n_hours": N_HOURS,
+        "watermark": START,
+        "spots": SPOTS,
+        "spot_ids": spot_ids,
+        "spot_index": {int(spot_id): i for i, spot_id in enumerate(spot_ids)},
+        "spot_profiles": profiles,
+        "fields": fields,
+        "tide_codes": tide_codes,
+        "conditions": calculate_spot_condition_matrices(fields, tide_codes, profiles),
+        "level_prefs": level_prefs,
+        "day_index": day_index,
+        "day_base": day_base,
+        "n_days": int(day_index.max()) + 1,
+    }
+
+
+def _change_rows(rng, window, n_cells):
+    """Linhas no formato de get_forecast_window_rows: valores novos, NaN, marés trocadas e linhas regravadas sem mudança."""
+    cells = rng.choice(len(SPOTS) * N_HOURS, n_cells, replace=False)
+    values = _random_values(rng, n_cells)
+    modified_at = START + datetime.timedelta(hours=1)
+    rows = []
+    for i, cell in enumerate(cells.tolist()):
+        row, hour = divmod(cell, N_HOURS)
+        unchanged = i % 5 == 0
+        if unchanged:
+            fields = [window["fields"][name][row, hour] for name in queries.FORECAST_CONDITION_FIELDS]
+            tide = TIDES[[tide_type_code(t) for t in TIDES].index(window["tide_codes"][row, hour])]
+        else:
+            fields = [values[name][i] for name in queries.FORECAST_CONDITION_FIELDS]
+            tide = TIDES[int(rng.integers(len(TIDES)))]
+        rows.append((SPOTS[row]["spot_id"], START + datetime.timedelta(hours=hour), tide, *fields, modified_at))
+    # Hora fora da janela: ignorada
+    rows.append((SPOTS[0]["spot_id"], START + datetime.timedelta(hours=N_HOURS), "low", *rows[0][3:-1], modified_at))
+    return rows
+
+
+@pytest.mark.parametrize("seed, n_cells", [(3, 12), (5, 40), (9, 200)])
+def test_incremental_changes_match_a_fresh_build(seed, n_cells):
+    rng = np.random.default_rng(seed)
+    window = _window(rng)
+    store = score_store._build_store(window)
+    for _ in range(3):
+        changes = forecast_window._apply_changes(window, _change_rows(rng, window, n_cells))
+        score_store._apply_cell_changes(store, *changes)
+
+    fresh_window = {**window, "conditions": calculate_spot_condition_matrices(window["fields"], window["tide_codes"], window["spot_profiles"])}
+    for name, matrix in fresh_window["conditions"].items():
+        np.testing.assert_array_equal(window["conditions"][name], matrix)
+    fresh = score_store._build_store(fresh_window)
+    for surf_level in SURF_LEVELS:
+        for name, matrix in fresh["levels"][surf_level].items():
+            np.testing.assert_array_equal(store["levels"][surf_level][name], matrix, err_msg=f"{surf_level}/{name}")
+        np.testing.assert_array_equal(store["daily_best"][surf_level]["column"], fresh["daily_best"][surf_level]["column"])
+        np.testing.assert_array_equal(store["daily_best"][surf_level]["score"], fresh["daily_best"][surf_level]["score"])
+    assert store["version"] == window["version"] == 3
+
+
+# Os dois caminhos usam a mesma tabela de direção do swell (quantizada em 0,1°), então a
+# quantização não gera diferença entre eles. Sobra a ordem das operações em ponto flutuante
+# antes de arredondar cada sub-score e o score geral em 2 casas: no máximo um passo de 0,01.
+SCORE_TOLERANCE = 0.01
+
+
+def _scalar_scores(window, surf_level, row, first, last):
+    prefs = {field: float(values[row]) for field, values in window["level_prefs"][surf_level].items()}
+
+    async def scores():
+        return [
+            (await calculate_overall_score(forecast_window.forecast_conditions_at(window, row, column), prefs, SPOTS[row], {"surf_level": surf_level}))["overall_score"]
+            for column in range(first, last + 1)
+        ]
+
+    return np.array(asyncio.run(scores()))
+
+
+@pytest.mark.parametrize("surf_level", SURF_LEVELS)
+def test_best_hours_between_matches_the_scalar_score(surf_level):
+    rng = np.random.default_rng(17)
+    window = _window(rng, missing=0.0)
+    store = score_store._build_store(window)
+    for row, spot in enumerate(SPOTS):
+        day_columns = np.flatnonzero(window["day_index"][row] == window["day_index"][row, 30])
+        # Um dia local inteiro (melhor hora já mantida) e um intervalo qualquer (busca na fatia)
+        for first, last in ((int(day_columns[0]), int(day_columns[-1])), (7, 40)):
+            start_utc = forecast_window.column_timestamp(window, first)
+            end_utc = forecast_window.column_timestamp(window, last)
+            [best] = score_store.best_hours_between(store, surf_level, spot["spot_id"], start_utc, end_utc, -1.0)
+
+            scalar = _scalar_scores(window, surf_level, row, first, last)
+            chosen = (best["timestamp_utc"] - start_utc) // datetime.timedelta(hours=1)
+            assert best["overall_score"] == pytest.approx(scalar[chosen], abs=SCORE_TOLERANCE)
+            assert scalar[chosen] >= scalar.max() - SCORE_TOLERANCE
+            # Sem empate dentro da tolerância, a hora escolhida é a mesma
+            runner_up = np.sort(scalar)[-2]
+            if scalar.max() - runner_up > 2 * SCORE_TOLERANCE:
+                assert chosen == int(scalar.argmax())
@@ -0,0 +1,74 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from src.services.scoring_service import (
+    calculate_overall_score,
+    calculate_score_matrices,
+    calculate_spot_condition_matrices,
+    compile_spot_profile,
+)
+
+PREFS = {
+    "ideal_swell_height": 1.5, "max_swell_height": 2.5, "max_wind_speed": 8.0,
+    "ideal_water_temperature": 22.0, "ideal_air_temperature": 25.0,
+}
+FORECAST = {
+    "swell_height_sg": 1.4, "swell_period_sg": 11.0, "swell_direction_sg": 120.0,
+    "wind_speed_sg": 3.0, "sea_level_sg": 0.6, "air_temperature_sg": 24.0,
+    "water_temperature_sg": 21.0, "tide_type": "high",
+}
+# Ventos em torno do corte de 45 graus das duas direções ideais (0 e 300 graus)
+WIND_DIRECTIONS = [44.9, 44.95, 44.99, 45.0, 45.01, 45.04, 45.05, 45.06, 45.1,
+                   314.9, 314.95, 315.0, 315.04, 315.05, 315.1, 254.95, 255.0, 255.05]
+
+
+def _spot():
+    return {"spot_id": None, "ideal_swell_direction": [110.0], "ideal_wind_direction": [0.0, 300.0],
+            "ideal_sea_level": 0.5, "ideal_tide_flow": ["high"]}
+
+
+def _baseline_is_terral(wind_direction, ideal_directions):
+    # Regra original do cálculo escalar: menor diferença angular <= 45 graus
+    min_diff = 360
+    for ideal_dir in ideal_directions:
+        diff = abs(wind_direction - ideal_dir)
+        min_diff = min(min_diff, diff, 360 - diff)
+    return min_diff <= 45
+
+
+def _matrix_scores(spot, forecasts, surf_level):
+    names = ("swell_height_sg", "swell_period_sg", "swell_direction_sg", "wind_speed_sg",
+             "wind_direction_sg", "sea_level_sg", "air_temperature_sg", "water_temperature_sg")
+    fields = {name: np.array([[f[name] for f in forecasts]], dtype=np.float64) for name in names}
+    from src.services.scoring_service import tide_type_code
+    tide_codes = np.array([[tide_type_code(f["tide_type"]) for f in forecasts]], dtype=np.int64)
+    conditions = calculate_spot_condition_matrices(fields, tide_codes, [compile_spot_profile(spot)])
+    prefs = {name: np.array([value]) for name, value in PREFS.items()}
+    return calculate_score_matrices(fields, conditions, prefs, surf_level)
+
+
+@pytest.mark.parametrize("wind_direction", WIND_DIRECTIONS)
+def test_scalar_wind_score_uses_exact_45_degree_boundary(wind_direction):
+    spot = _spot()
+    forecast = {**FORECAST, "wind_direction_sg": wind_direction}
+    result = asyncio.run(calculate_overall_score(forecast, PREFS, spot, {"surf_level": "pro"}))
+    factor = 100 if _baseline_is_terral(wind_direction, spot["ideal_wind_direction"]) else 75
+    assert result["detailed_scores"]["wind_score"] == pytest.approx(factor * (1 - 3.0 / 8.0))
+
+
+def test_matrix_path_matches_scalar_path_near_45_degree_boundary():
+    spot = _spot()
+    forecasts = [{**FORECAST, "wind_direction_sg": d} for d in WIND_DIRECTIONS]
+    matrices = _matrix_scores(spot, forecasts, "pro")
+    for column, forecast in enumerate(forecasts):
+        scalar = asyncio.run(calculate_overall_score(forecast, PREFS, spot, {"surf_level": "pro"}))
+        assert matrices["wind_score"][0, column] == pytest.approx(scalar["detailed_scores"]["wind_score"])
+        assert matrices["overall_score"][0, column] == pytest.approx(scalar["overall_score"], abs=0.011)
+
+
+def test_spot_without_ideal_wind_direction_is_neutral():
+    spot = {**_spot(), "ideal_wind_direction": []}
+    matrices = _matrix_scores(spot, [{**FORECAST, "wind_direction_sg": 10.0}], "pro")
+    assert matrices["wind_score"][0, 0] == 75.0
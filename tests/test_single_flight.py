@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from src.core import deadline
+from src.core.config import settings
+from src.services.single_flight import SingleFlight
+
+
+async def _with_budget(seconds, coro):
+    token = deadline.start(seconds)
+    try:
+        return await asyncio.ensure_future(coro)
+    finally:
+        deadline.reset(token)
+
+
+def test_shared_task_uses_the_longest_waiter_deadline(monkeypatch):
+    monkeypatch.setattr(settings, "REQUEST_DEADLINE_GRACE_SECONDS", 0.0)
+
+    async def scenario():
+        flight = SingleFlight("test_longest")
+        seen = []
+
+        async def compute():
+            await asyncio.sleep(0.1)
+            seen.append(deadline.remaining())
+            return "done"
+
+        short = asyncio.ensure_future(_with_budget(0.05, flight.do("key", compute)))
+        await asyncio.sleep(0)
+        long = asyncio.ensure_future(_with_budget(5.0, flight.do("key", compute)))
+        results = await asyncio.gather(short, long, return_exceptions=True)
+        return results, seen, flight.stats
+
+    (short, long), seen, stats = asyncio.run(scenario())
+    assert isinstance(short, deadline.DeadlineExceeded)
+    assert long == "done"
+    assert seen[0] > 4
+    assert stats["executions"] == 1
+
+
+def test_shared_task_without_deadline_when_a_waiter_has_none():
+    async def scenario():
+        flight = SingleFlight("test_unbounded")
+
+        async def compute():
+            await asyncio.sleep(0)
+            return deadline.remaining()
+
+        starter = asyncio.ensure_future(_with_budget(1.0, flight.do("key", compute)))
+        await asyncio.sleep(0)
+        background = asyncio.ensure_future(flight.do("key", compute))
+        return await asyncio.gather(starter, background)
+
+    assert asyncio.run(scenario()) == [None, None]
+
+
+def test_detached_task_drops_the_request_deadline():
+    async def scenario():
+        async def compute():
+            return deadline.remaining()
+
+        token = deadline.start(1.0)
+        try:
+            return await deadline.detached(compute())
+        finally:
+            deadline.reset(token)
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_expired_waiter_raises_deadline_exceeded():
+    async def scenario():
+        flight = SingleFlight("test_expired")
+        return await _with_budget(0.01, flight.do("key", lambda: asyncio.sleep(1)))
+
+    with pytest.raises(deadline.DeadlineExceeded):
+        asyncio.run(scenario())
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from src.core.config import settings
+from src.services import user_context
+
+
+@pytest.fixture
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(user_context, "_contexts", {})
+    monkeypatch.setattr(user_context, "_invalidated_at", {})
+    monkeypatch.setattr(user_context, "_invalidation_clock", 0)
+    monkeypatch.setattr(user_context, "_pruned_up_to", 0)
+    monkeypatch.setattr(user_context, "_ensure_subscribed", lambda: None)
+
+
+def _slow_queries(monkeypatch, proceed: asyncio.Event):
+    async def get_profile_by_id(user_id):
+        await proceed.wait()
+        return {"id": user_id, "surf_level": "pro"}
+
+    async def get_active_user_spot_preferences(user_id):
+        return {}
+
+    monkeypatch.setattr(user_context.queries, "get_profile_by_id", get_profile_by_id)
+    monkeypatch.setattr(user_context.queries, "get_active_user_spot_preferences", get_active_user_spot_preferences)
+
+
+def _load_with_invalidation(monkeypatch, invalidated_user: str) -> dict:
+    async def scenario():
+        proceed = asyncio.Event()
+        _slow_queries(monkeypatch, proceed)
+        load = asyncio.create_task(user_context.get_user_context("a"))
+        await asyncio.sleep(0.01)
+        user_context.invalidate(invalidated_user)
+        proceed.set()
+        await load
+        return user_context._contexts
+
+    return asyncio.run(scenario())
+
+
+def test_invalidation_of_another_user_does_not_discard_the_load(fresh_cache, monkeypatch):
+    assert "a" in _load_with_invalidation(monkeypatch, "b")
+
+
+def test_invalidation_of_the_same_user_discards_the_load(fresh_cache, monkeypatch):
+    assert "a" not in _load_with_invalidation(monkeypatch, "a")
+
+
+def test_pruned_invalidations_stay_conservative(fresh_cache, monkeypatch):
+    monkeypatch.setattr(settings, "USER_CONTEXT_MAX_ENTRIES", 2)
+    for user_id in ("a", "b", "c"):
+        user_context.invalidate(user_id)
+    assert list(user_context._invalidated_at) == ["b", "c"]
+    assert user_context._last_invalidation("a") == 1